@@ -0,0 +1,45 @@
+"""Text extraction and first-page thumbnails for uploaded newsletters/documents.
+
+Runs inside a spawned worker process (see server.process_uploaded_file), so it
+must not import server.py or touch the database: paths in, plain dict out.
+"""
+try:
+    import fitz  # PyMuPDF
+except ImportError:  # processing is optional; uploads still work without it
+    fitz = None
+
+THUMBNAIL_WIDTH = 320  # px
+
+def extract_file(path, thumbnail_path, max_chars):
+    """Returns {"status", "page_count", "text", "thumbnail"} for the file at path"""
+    suffix = path.rsplit(".", 1)[-1].lower()
+    if suffix == "txt":
+        with open(path, encoding="utf-8", errors="replace") as f:
+            return {"status": "ready", "page_count": None, "text": f.read(max_chars), "thumbnail": False}
+    if suffix != "pdf":
+        return {"status": "unsupported", "page_count": None, "text": "", "thumbnail": False}
+    if fitz is None:
+        return {"status": "unavailable", "page_count": None, "text": "", "thumbnail": False}
+
+    with fitz.open(path) as pdf:
+        parts, length = [], 0
+        for page in pdf:
+            if length >= max_chars:
+                break
+            text = page.get_text()
+            parts.append(text)
+            length += len(text)
+
+        thumbnail = False
+        if pdf.page_count:
+            first_page = pdf[0]
+            zoom = THUMBNAIL_WIDTH / first_page.rect.width
+            first_page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False).save(thumbnail_path)
+            thumbnail = True
+
+        return {
+            "status": "ready",
+            "page_count": pdf.page_count,
+            "text": "".join(parts)[:max_chars],
+            "thumbnail": thumbnail
+        }
@@ -0,0 +1,316 @@
+"""In-memory full-text search: BM25 over impact-ordered postings.
+
+Kept free of app imports (no database, no settings) so search_benchmark.py
+can load it on its own.
+"""
+import bisect
+import heapq
+import math
+import re
+from typing import Dict, List, Tuple
+
+SEARCH_TOKEN_RE = re.compile(r"[a-z0-9]+")
+SEARCH_STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "in", "is",
+    "it", "of", "on", "or", "that", "the", "to", "was", "with"
+}
+
+def tokenize(text):
+    """Lowercase a piece of text and split it into index terms"""
+    if not text:
+        return []
+    return [t for t in SEARCH_TOKEN_RE.findall(text.lower()) if t not in SEARCH_STOPWORDS]
+
+class SearchIndex:
+    """In-memory inverted index with BM25 ranking and prefix matching.
+
+    Documents are keyed by "<doc_type>:<id>". Postings map each term to
+    {doc_type: {doc_key: term_frequency}}; a sorted term list backs prefix
+    expansion. Each term also keeps its doc keys per type ordered by impact
+    (the BM25 score contribution before idf, tf / (tf + norm)), so a query
+    walks the best postings first and stops once no unseen document can reach
+    the requested page (Fagin's threshold algorithm) instead of scoring every
+    match.
+
+    Length norms use a snapshot of the average document length, refreshed
+    when the real average drifts by more than AVG_LENGTH_DRIFT. A refresh
+    re-ranks each term the next time a query touches it; the bigger the
+    index, the rarer (and the more expensive) that is.
+    """
+
+    K1 = 1.2
+    B = 0.75
+    MAX_PREFIX_EXPANSIONS = 10
+    AVG_LENGTH_DRIFT = 0.1
+    # Documents scored per query before the page is taken from those seen so far
+    MAX_SCANNED_POSTINGS = 1000
+    SCAN_BLOCK = 32
+    # Postings summed over the query's terms; above this, total is a lower bound
+    EXACT_TOTAL_LIMIT = 10000
+
+    def __init__(self):
+        self.postings: Dict[str, Dict[str, Dict[str, int]]] = {}
+        self.ranked: Dict[str, Tuple[int, Dict[str, List[str]]]] = {}  # term -> (epoch, {doc_type: keys})
+        self.doc_terms: Dict[str, Dict[str, int]] = {}
+        self.doc_lengths: Dict[str, int] = {}
+        self.doc_norms: Dict[str, float] = {}  # BM25 length normalisation against avg_length
+        self.doc_meta: Dict[str, Dict] = {}
+        self.sorted_terms: List[str] = []
+        self.total_length = 0
+        self.avg_length = 0.0  # snapshot the rankings were built against
+        self.epoch = 0
+
+    def __len__(self):
+        return len(self.doc_lengths)
+
+    def norm(self, length):
+        return self.K1 * (1 - self.B + self.B * length / self.avg_length)
+
+    def rank_key(self, tfs):
+        """Sort key for one term's doc keys of one type: highest impact first"""
+        doc_norms = self.doc_norms
+        return lambda key: -tfs[key] / (tfs[key] + doc_norms[key])
+
+    def refresh_avg_length(self):
+        if not self.doc_lengths:
+            return
+        avg_length = self.total_length / len(self.doc_lengths)
+        if abs(avg_length - self.avg_length) > self.AVG_LENGTH_DRIFT * self.avg_length:
+            self.avg_length = avg_length
+            self.epoch += 1
+            self.doc_norms = {key: self.norm(length) for key, length in self.doc_lengths.items()}
+
+    def current_ranking(self, term):
+        """The term's ranked keys if still valid for this epoch; a stale ranking is dropped"""
+        entry = self.ranked.get(term)
+        if entry is None:
+            return None
+        if entry[0] != self.epoch:
+            del self.ranked[term]
+            return None
+        return entry[1]
+
+    def ranking(self, term):
+        """The term's ranked keys per type, built on first use after a change of epoch"""
+        ranked = self.current_ranking(term)
+        if ranked is None:
+            ranked = {
+                doc_type: sorted(tfs, key=self.rank_key(tfs))
+                for doc_type, tfs in self.postings[term].items()
+            }
+            self.ranked[term] = (self.epoch, ranked)
+        return ranked
+
+    def rank_common_terms(self, min_postings=200):
+        """Rank long posting lists up front (after a bulk build) so no query pays for the sort"""
+        for term, by_type in self.postings.items():
+            if sum(len(tfs) for tfs in by_type.values()) >= min_postings:
+                self.ranking(term)
+
+    def add(self, doc_type, doc_id, fields, title, snippet=""):
+        """Index (or re-index) a document. `fields` is a list of (text, weight) pairs."""
+        key = f"{doc_type}:{doc_id}"
+        self.remove(doc_type, doc_id)
+
+        term_freqs: Dict[str, int] = {}
+        length = 0
+        for text, weight in fields:
+            for term in tokenize(text):
+                term_freqs[term] = term_freqs.get(term, 0) + weight
+                length += weight
+        if not term_freqs:
+            return
+
+        self.doc_terms[key] = term_freqs
+        self.doc_lengths[key] = length
+        self.total_length += length
+        self.refresh_avg_length()
+        self.doc_norms[key] = self.norm(length)
+        for term, tf in term_freqs.items():
+            by_type = self.postings.get(term)
+            if by_type is None:
+                by_type = self.postings[term] = {}
+                bisect.insort(self.sorted_terms, term)
+            tfs = by_type.setdefault(doc_type, {})
+            tfs[key] = tf
+            ranked = self.current_ranking(term)
+            if ranked is not None:
+                bisect.insort(ranked.setdefault(doc_type, []), key, key=self.rank_key(tfs))
+
+        self.doc_meta[key] = {
+            "type": doc_type,
+            "id": doc_id,
+            "title": title,
+            "snippet": (snippet or "")[:200]
+        }
+
+    def remove(self, doc_type, doc_id):
+        """Drop a document from the index if present"""
+        key = f"{doc_type}:{doc_id}"
+        term_freqs = self.doc_terms.pop(key, None)
+        if term_freqs is None:
+            return
+        for term in term_freqs:
+            by_type = self.postings.get(term)
+            tfs = by_type.get(doc_type) if by_type else None
+            if not tfs or key not in tfs:
+                continue
+            ranked = self.current_ranking(term)
+            if ranked is not None:
+                keys = ranked.get(doc_type, [])
+                rank_key = self.rank_key(tfs)
+                # Equal impacts keep insertion order, so look for the key among its ties
+                rank = rank_key(key)
+                lo = bisect.bisect_left(keys, rank, key=rank_key)
+                hi = bisect.bisect_right(keys, rank, lo, key=rank_key)
+                try:
+                    del keys[keys.index(key, lo, hi)]
+                    if not keys:
+                        del ranked[doc_type]
+                except ValueError:
+                    del self.ranked[term]  # out of step; rebuilt on the next query
+            del tfs[key]
+            if not tfs:
+                del by_type[doc_type]
+            if not by_type:
+                del self.postings[term]
+                self.ranked.pop(term, None)
+                pos = bisect.bisect_left(self.sorted_terms, term)
+                if pos < len(self.sorted_terms) and self.sorted_terms[pos] == term:
+                    del self.sorted_terms[pos]
+        self.total_length -= self.doc_lengths.pop(key, 0)
+        self.doc_norms.pop(key, None)
+        self.doc_meta.pop(key, None)
+        self.refresh_avg_length()
+
+    def expand(self, term, prefix):
+        """Return the indexed terms matching `term`, optionally as a prefix"""
+        if not prefix:
+            return [term] if term in self.postings else []
+        matches = []
+        pos = bisect.bisect_left(self.sorted_terms, term)
+        while pos < len(self.sorted_terms) and len(matches) < self.MAX_PREFIX_EXPANSIONS:
+            candidate = self.sorted_terms[pos]
+            if not candidate.startswith(term):
+                break
+            matches.append(candidate)
+            pos += 1
+        return matches
+
+    def search(self, query, doc_types=None, limit=20, skip=0):
+        """Rank documents for `query` with BM25. Returns (total, total_exact, hits).
+
+        Each query term adds its score once per document; the last term is
+        a prefix and scores with the document's best expansion of it.
+
+        The walk down the ranked postings stops when the page is provably
+        final, or after MAX_SCANNED_POSTINGS documents: several near-universal
+        terms barely lower the bound, and past the budget the page is ranked
+        from the documents that score best on at least one term.
+        """
+        terms = tokenize(query)
+        if not terms or not self.doc_lengths:
+            return 0, True, []
+
+        doc_terms, doc_norms = self.doc_terms, self.doc_norms
+        n_docs = len(doc_norms)
+
+        def contribution(cursor):
+            """What the posting at a ranked list's position adds to a score, before (k1 + 1)"""
+            _, _, idf, keys, tfs, position = cursor
+            if position >= len(keys):
+                return 0.0
+            key = keys[position]
+            tf = tfs[key]
+            return idf * tf / (tf + doc_norms[key])
+
+        groups = []  # per query term: [(indexed term, idf)]
+        cursors = []  # per ranked list: [bound, group, idf, keys, tfs, position]
+        matched = {}  # indexed term -> {allowed doc_type: {key: tf}}
+        for i, term in enumerate(terms):
+            # Only the last term is treated as a prefix so "alum" matches
+            # "alumni" while typing, without blowing up earlier terms.
+            prefix = i == len(terms) - 1
+            group, first_cursor = [], len(cursors)
+            for expanded in self.expand(term, prefix):
+                by_type = self.postings[expanded]
+                df = sum(len(tfs) for tfs in by_type.values())
+                idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+                group.append((expanded, idf))
+                for doc_type, keys in self.ranking(expanded).items():
+                    if doc_types and doc_type not in doc_types:
+                        continue
+                    cursor = [0.0, len(groups), idf, keys, by_type[doc_type], 0]
+                    cursor[0] = contribution(cursor)
+                    cursors.append(cursor)
+                    matched.setdefault(expanded, {})[doc_type] = by_type[doc_type]
+            if len(cursors) > first_cursor:
+                groups.append(group)
+        if not cursors:
+            return 0, True, []
+
+        single = [group[0] if len(group) == 1 else None for group in groups]
+
+        def score(key):
+            tfs, norm = doc_terms[key], doc_norms[key]
+            total = 0.0
+            for group, only in zip(groups, single):
+                if only is not None:
+                    tf = tfs.get(only[0])
+                    if tf:
+                        total += only[1] * tf / (tf + norm)
+                    continue
+                best = 0.0
+                for term, idf in group:
+                    tf = tfs.get(term)
+                    if tf and idf * tf / (tf + norm) > best:
+                        best = idf * tf / (tf + norm)
+                total += best
+            return total
+
+        # Advance the ranked list with the highest bound one block at a time.
+        # An unseen document can score at most, per query term, the best bound
+        # among that term's lists, so once the page's lowest score reaches the
+        # sum of those the page is final.
+        wanted = skip + limit
+        budget = max(self.MAX_SCANNED_POSTINGS, 2 * wanted)
+        top: List[Tuple[float, str]] = []  # min-heap of the best `wanted`
+        seen = set()
+        while True:
+            cursor = max(cursors, key=lambda cursor: cursor[0])
+            if cursor[0] <= 0.0:
+                break  # every list walked to the end
+            keys, position = cursor[3], cursor[5]
+            for key in keys[position:position + self.SCAN_BLOCK]:
+                if key in seen:
+                    continue
+                seen.add(key)
+                entry = (score(key), key)
+                if len(top) < wanted:
+                    heapq.heappush(top, entry)
+                elif entry[0] > top[0][0]:
+                    heapq.heapreplace(top, entry)
+            cursor[5] = position + self.SCAN_BLOCK
+            cursor[0] = contribution(cursor)
+            if len(top) == wanted:
+                bounds = [0.0] * len(groups)
+                for bound, group, *_ in cursors:
+                    if bound > bounds[group]:
+                        bounds[group] = bound
+                if top[0][0] >= sum(bounds) or len(seen) >= budget:
+                    break
+
+        # Counting the union of very common terms would cost more than ranking
+        # them (a term's postings of different types never overlap)
+        sizes = [sum(len(tfs) for tfs in slices.values()) for slices in matched.values()]
+        if len(sizes) == 1:
+            total, total_exact = sizes[0], True
+        elif sum(sizes) <= self.EXACT_TOTAL_LIMIT:
+            total, total_exact = len(set().union(*(tfs for slices in matched.values() for tfs in slices.values()))), True
+        else:
+            total, total_exact = max(len(seen), max(sizes)), False
+
+        hits = sorted(top, key=lambda entry: (-entry[0], entry[1]))[skip:]
+        return total, total_exact, [
+            dict(self.doc_meta[key], score=round(score * (self.K1 + 1), 4)) for score, key in hits
+        ]
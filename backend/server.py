@@ -1,25 +1,287 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Request, Depends, UploadFile, File
-from fastapi.responses import HTMLResponse, FileResponse
+from fastapi import FastAPI, APIRouter, HTTPException, Request, Depends, UploadFile, File, Form, Header, BackgroundTasks
+from fastapi.responses import HTMLResponse, FileResponse, Response, StreamingResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReturnDocument, UpdateOne, monitoring
+from pymongo.errors import DuplicateKeyError, BulkWriteError
 import socketio
 import os
+import json
+import smtplib
+from email.message import EmailMessage
+from urllib.parse import quote
+import csv
+import io
+import contextvars
+import functools
+import zlib
+import time
 import logging
+import logging.handlers
+import queue
+import random
+import sys
+import threading
 from pathlib import Path
-from pydantic import BaseModel, Field, EmailStr
+from pydantic import BaseModel, Field, EmailStr, TypeAdapter, ValidationError
 from typing import List, Optional, Dict
+from collections import Counter, OrderedDict, deque
 import uuid
-from datetime import datetime, timezone
+from datetime import datetime, timezone, timedelta
+from cachetools import LRUCache
 import shutil
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import re
+import bisect
+import asyncio
+import secrets
+import hmac
+import hashlib
+import jwt
+from document_processing import extract_file
+from wire_format import encode_compact, msgpack
+from search_index import SearchIndex
 from emergentintegrations.payments.stripe.checkout import StripeCheckout, CheckoutSessionResponse, CheckoutStatusResponse, CheckoutSessionRequest
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
+# The HTTP request or socket event currently being handled. Motor runs PyMongo
+# calls on an executor with a copy of this context, so the command listener
+# below sees the same OperationStats object the handler created.
+class OperationStats:
+    __slots__ = ("kind", "name", "scope", "mongo_commands")
+    
+    def __init__(self, kind, name, scope=None):
+        self.kind = kind
+        self.name = name
+        self.scope = scope
+        self.mongo_commands = 0
+    
+    @property
+    def label(self):
+        # HTTP requests are attributed to their route template once routing has run
+        if self.scope is not None:
+            route = self.scope.get("route")
+            return f"{self.scope['method']} {route.path if route is not None else self.name}"
+        return f"{self.kind}:{self.name}"
+
+current_operation = contextvars.ContextVar("current_operation", default=None)
+
+# Query profiling: slow commands are logged, and every new query shape is
+# explained once in the background to catch collection scans early.
+PROFILE_SLOW_MS = float(os.environ.get('PROFILE_SLOW_MS', '100'))
+PROFILE_LARGE_SKIP = int(os.environ.get('PROFILE_LARGE_SKIP', '1000'))
+PROFILE_EXPLAIN = os.environ.get('PROFILE_EXPLAIN', '1') == '1'
+PROFILE_REEXPLAIN_SECONDS = 300
+PROFILED_COMMANDS = {"find", "aggregate", "count", "distinct", "update", "delete", "findAndModify"}
+EXPLAIN_STRIP_FIELDS = {
+    "lsid", "$db", "$clusterTime", "$readPreference", "txnNumber", "autocommit",
+    "startTransaction", "readConcern", "writeConcern", "cursor", "batchSize", "singleBatch"
+}
+
+def query_shape(value):
+    """Replace literal values so queries differing only in parameters group together"""
+    if isinstance(value, dict):
+        return {key: query_shape(item) for key, item in sorted(value.items())}
+    if isinstance(value, list):
+        # Every distinct element shape is kept, so $or/$and branches stay apart while
+        # literal lists ($in, $all) of any length collapse to a single marker
+        shapes = []
+        for item in value:
+            shape = query_shape(item)
+            if shape not in shapes:
+                shapes.append(shape)
+        return shapes
+    return 1
+
+def command_filter(command_name, command):
+    if command_name in ("find", "count", "distinct"):
+        return command.get("filter") or command.get("query") or {}
+    if command_name == "aggregate":
+        pipeline = command.get("pipeline") or [{}]
+        return pipeline[0].get("$match", {})
+    if command_name == "findAndModify":
+        return command.get("query", {})
+    statements = command.get("updates") or command.get("deletes") or [{}]
+    return statements[0].get("q", {})
+
+def command_skip(command_name, command):
+    if command_name == "aggregate":
+        return max((stage["$skip"] for stage in command.get("pipeline", []) if "$skip" in stage), default=0)
+    return command.get("skip") or 0
+
+def find_in_explain(document, key):
+    """Depth-first search of an explain document for the first value under key"""
+    if isinstance(document, dict):
+        if key in document:
+            return document[key]
+        items = document.values()
+    elif isinstance(document, list):
+        items = document
+    else:
+        return None
+    for item in items:
+        found = find_in_explain(item, key)
+        if found is not None:
+            return found
+    return None
+
+def plan_stages(plan, stages=None):
+    """Flatten a winning plan into ["FETCH", "IXSCAN users_cohort_1", ...]"""
+    stages = [] if stages is None else stages
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            stages.append(f"{plan['stage']} {plan['indexName']}" if "indexName" in plan else plan["stage"])
+        for child_key in ("inputStage", "queryPlan"):
+            if child_key in plan:
+                plan_stages(plan[child_key], stages)
+        for child in plan.get("inputStages", []):
+            plan_stages(child, stages)
+    return stages
+
+class MongoCommandProfiler(monitoring.CommandListener):
+    """Attributes Mongo commands to the current request or socket event.
+    
+    Callbacks run on Motor's executor threads, so shared state is guarded by a lock
+    and explains are handed back to the event loop.
+    """
+    def __init__(self):
+        self.loop = None  # set at startup; explains are skipped until then
+        self.lock = threading.Lock()
+        self.pending = {}  # request_id -> (key, command, database, skip)
+        self.shapes = {}  # (operation, collection, command, shape) -> stats
+    
+    def started(self, event):
+        operation = current_operation.get()
+        if operation is not None:
+            operation.mongo_commands += 1
+        if event.command_name not in PROFILED_COMMANDS:
+            return
+        command = event.command
+        collection = command.get(event.command_name)
+        shape = json.dumps(query_shape(command_filter(event.command_name, command)), separators=(',', ':'))
+        label = operation.label if operation is not None else "background"
+        key = (label, collection, event.command_name, shape)
+        self.pending[event.request_id] = (key, command, event.database_name, command_skip(event.command_name, command))
+    
+    def succeeded(self, event):
+        pending = self.pending.pop(event.request_id, None)
+        if pending is None:
+            return
+        key, command, database, skip = pending
+        elapsed_ms = event.duration_micros / 1000
+        reply = event.reply
+        cursor = reply.get("cursor")
+        returned = len(cursor.get("firstBatch", ())) if cursor else reply.get("n", 0)
+        
+        now = time.monotonic()
+        with self.lock:
+            stats = self.shapes.get(key)
+            if stats is None:
+                stats = self.shapes[key] = {
+                    "count": 0, "total_ms": 0.0, "max_ms": 0.0, "returned": 0,
+                    "max_skip": 0, "explained_at": None, "plan": None
+                }
+            stats["count"] += 1
+            stats["total_ms"] += elapsed_ms
+            stats["max_ms"] = max(stats["max_ms"], elapsed_ms)
+            stats["returned"] += returned
+            stats["max_skip"] = max(stats["max_skip"], skip)
+            slow = elapsed_ms >= PROFILE_SLOW_MS
+            explain = PROFILE_EXPLAIN and self.loop is not None and (
+                stats["explained_at"] is None
+                or (slow and now - stats["explained_at"] >= PROFILE_REEXPLAIN_SECONDS)
+            )
+            if explain:
+                stats["explained_at"] = now
+        
+        if slow:
+            logger.warning(
+                f"Slow Mongo {key[2]} on {key[1]} from {key[0]}: {elapsed_ms:.0f} ms, filter {key[3]}",
+                extra={"event": "mongo.slow", "collection": key[1], "duration_ms": round(elapsed_ms, 1)}
+            )
+        if skip >= PROFILE_LARGE_SKIP:
+            logger.warning(
+                f"Large skip ({skip}) in Mongo {key[2]} on {key[1]} from {key[0]}",
+                extra={"event": "mongo.large_skip", "collection": key[1]}
+            )
+        if explain:
+            self.loop.call_soon_threadsafe(asyncio.ensure_future, self.explain(key, command, database))
+    
+    def failed(self, event):
+        self.pending.pop(event.request_id, None)
+    
+    async def explain(self, key, command, database):
+        if key[2] == "aggregate" and any("$out" in stage or "$merge" in stage for stage in command.get("pipeline", [])):
+            return
+        explain_command = {field: value for field, value in command.items() if field not in EXPLAIN_STRIP_FIELDS}
+        try:
+            result = await client[database].command({"explain": explain_command, "verbosity": "executionStats"})
+        except Exception as e:
+            logger.debug(f"Explain failed for {key}: {e}")
+            return
+        
+        plan = plan_stages(find_in_explain(result, "winningPlan"))
+        execution = find_in_explain(result, "executionStats") or {}
+        summary = {
+            "stages": plan,
+            "collscan": "COLLSCAN" in plan,
+            "docs_examined": execution.get("totalDocsExamined"),
+            "keys_examined": execution.get("totalKeysExamined"),
+            "n_returned": execution.get("nReturned")
+        }
+        with self.lock:
+            if key in self.shapes:
+                self.shapes[key]["plan"] = summary
+        if summary["collscan"]:
+            logger.warning(
+                f"COLLSCAN in Mongo {key[2]} on {key[1]} from {key[0]}, filter {key[3]}",
+                extra={"event": "mongo.collscan", "collection": key[1]}
+            )
+    
+    def report(self, limit, sort):
+        with self.lock:
+            rows = [
+                dict(stats, operation=key[0], collection=key[1], command=key[2], shape=key[3])
+                for key, stats in self.shapes.items()
+            ]
+        for row in rows:
+            row.pop("explained_at")
+            plan = row["plan"] or {}
+            row["avg_ms"] = round(row["total_ms"] / row["count"], 2)
+            row["total_ms"] = round(row["total_ms"], 2)
+            row["max_ms"] = round(row["max_ms"], 2)
+            row["collscan"] = plan.get("collscan", False)
+            row["large_skip"] = row["max_skip"] >= PROFILE_LARGE_SKIP
+            examined, returned = plan.get("docs_examined"), plan.get("n_returned")
+            row["examined_per_returned"] = round(examined / max(returned, 1), 1) if examined is not None else None
+        
+        sort_keys = {
+            "total_ms": lambda row: row["total_ms"],
+            "max_ms": lambda row: row["max_ms"],
+            "count": lambda row: row["count"],
+            "examined": lambda row: row["examined_per_returned"] or 0
+        }
+        rows.sort(key=sort_keys[sort], reverse=True)
+        return {
+            "queries": rows[:limit],
+            "collscans": [row for row in rows if row["collscan"]],
+            "large_skips": [row for row in rows if row["large_skip"]]
+        }
+    
+    def reset(self):
+        with self.lock:
+            self.shapes.clear()
+
+mongo_profiler = MongoCommandProfiler()
+
 # MongoDB connection
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+client = AsyncIOMotorClient(mongo_url, event_listeners=[mongo_profiler])
 db = client[os.environ['DB_NAME']]
 
 # Create the main app without a prefix
@@ -37,21 +299,267 @@ app = socketio.ASGIApp(sio, fastapi_app)
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
 
+# Request metrics, exposed in Prometheus text format at /metrics
+SLOW_REQUEST_SECONDS = float(os.environ.get('SLOW_REQUEST_SECONDS', '0.5'))
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+ROUND_TRIP_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+def format_labels(labels):
+    if not labels:
+        return ""
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"') for value in labels.values())
+    return "{" + ",".join(f'{key}="{value}"' for key, value in zip(labels, escaped)) + "}"
+
+class MetricCounter:
+    def __init__(self, name, help_text, label_names):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.values = {}
+    
+    def inc(self, *labels, amount=1):
+        self.values[labels] = self.values.get(labels, 0) + amount
+    
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        for labels, value in sorted(self.values.items()):
+            lines.append(f"{self.name}{format_labels(dict(zip(self.label_names, labels)))} {value}")
+        return lines
+
+class MetricHistogram:
+    def __init__(self, name, help_text, label_names, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        self.values = {}  # labels -> [per-bucket counts..., +Inf count, sum]
+    
+    def observe(self, value, *labels):
+        series = self.values.get(labels)
+        if series is None:
+            series = self.values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect.bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+    
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for labels, series in sorted(self.values.items()):
+            label_dict = dict(zip(self.label_names, labels))
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), series):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{format_labels(dict(label_dict, le=bound))} {cumulative}")
+            lines.append(f"{self.name}_sum{format_labels(label_dict)} {series[-1]}")
+            lines.append(f"{self.name}_count{format_labels(label_dict)} {cumulative}")
+        return lines
+
+http_requests_total = MetricCounter(
+    "http_requests_total", "HTTP requests by route and status", ("method", "route", "status")
+)
+http_request_duration = MetricHistogram(
+    "http_request_duration_seconds", "HTTP request latency", ("method", "route"), LATENCY_BUCKETS
+)
+http_request_mongo_round_trips = MetricHistogram(
+    "http_request_mongo_round_trips", "Mongo commands issued per HTTP request", ("method", "route"), ROUND_TRIP_BUCKETS
+)
+http_bytes_total = MetricCounter(
+    "http_bytes_total", "HTTP body bytes received and sent", ("route", "direction")
+)
+socketio_events_total = MetricCounter(
+    "socketio_events_total", "Socket.IO events handled", ("event", "outcome")
+)
+socketio_event_duration = MetricHistogram(
+    "socketio_event_duration_seconds", "Socket.IO handler latency", ("event",), LATENCY_BUCKETS
+)
+socketio_event_mongo_round_trips = MetricHistogram(
+    "socketio_event_mongo_round_trips", "Mongo commands issued per Socket.IO event", ("event",), ROUND_TRIP_BUCKETS
+)
+METRICS = (
+    http_requests_total, http_request_duration, http_request_mongo_round_trips, http_bytes_total,
+    socketio_events_total, socketio_event_duration, socketio_event_mongo_round_trips
+)
+
+class RequestMetricsMiddleware:
+    """ASGI middleware timing each request and counting its Mongo round trips and body bytes"""
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        operation = OperationStats("http", scope["path"], scope)
+        token = current_operation.set(operation)
+        state = {"status": 500, "in": 0, "out": 0}
+        
+        async def counting_receive():
+            message = await receive()
+            if message["type"] == "http.request":
+                state["in"] += len(message.get("body", b""))
+            return message
+        
+        async def counting_send(message):
+            if message["type"] == "http.response.start":
+                state["status"] = message["status"]
+            elif message["type"] == "http.response.body":
+                state["out"] += len(message.get("body", b""))
+            await send(message)
+        
+        start = time.perf_counter()
+        try:
+            await self.app(scope, counting_receive, counting_send)
+        finally:
+            elapsed = time.perf_counter() - start
+            current_operation.reset(token)
+            # Label by route template, not raw path, to keep series bounded
+            route = scope.get("route")
+            route_label = route.path if route is not None else "unmatched"
+            method = scope["method"]
+            http_requests_total.inc(method, route_label, str(state["status"]))
+            http_request_duration.observe(elapsed, method, route_label)
+            http_request_mongo_round_trips.observe(operation.mongo_commands, method, route_label)
+            http_bytes_total.inc(route_label, "in", amount=state["in"])
+            http_bytes_total.inc(route_label, "out", amount=state["out"])
+            if elapsed >= SLOW_REQUEST_SECONDS:
+                logger.warning(
+                    f"Slow request {method} {scope['path']} took {elapsed * 1000:.0f} ms "
+                    f"with {operation.mongo_commands} Mongo round trips",
+                    extra={
+                        "event": "http.slow", "route": route_label, "status": state["status"],
+                        "duration_ms": round(elapsed * 1000, 1), "mongo_round_trips": operation.mongo_commands
+                    }
+                )
+
+def instrumented(event):
+    """Record latency, outcome and Mongo round trips of a Socket.IO handler"""
+    def decorator(handler):
+        @functools.wraps(handler)
+        async def wrapper(sid, *args):
+            operation = OperationStats("sio", event)
+            token = current_operation.set(operation)
+            outcome = "ok"
+            start = time.perf_counter()
+            try:
+                return await handler(sid, *args)
+            except Exception:
+                outcome = "error"
+                raise
+            finally:
+                elapsed = time.perf_counter() - start
+                current_operation.reset(token)
+                socketio_events_total.inc(event, outcome)
+                socketio_event_duration.observe(elapsed, event)
+                socketio_event_mongo_round_trips.observe(operation.mongo_commands, event)
+                if elapsed >= SLOW_REQUEST_SECONDS:
+                    logger.warning(
+                        f"Slow socket event {event} took {elapsed * 1000:.0f} ms "
+                        f"with {operation.mongo_commands} Mongo round trips",
+                        extra={
+                            "event": "sio.slow", "sio_event": event, "sid": sid,
+                            "duration_ms": round(elapsed * 1000, 1), "mongo_round_trips": operation.mongo_commands
+                        }
+                    )
+        return wrapper
+    return decorator
+
 # Stripe integration
 stripe_api_key = os.environ.get('STRIPE_API_KEY')
 
+# Chat session tokens (HS256 JWTs verified locally, no DB round trip), issued for an
+# email and password. SESSION_SECRET is required: startup fails without it unless
+# APP_ENV=development, where a per-process random secret is used instead (tokens
+# then stop verifying across workers and restarts).
+APP_ENV = os.environ.get('APP_ENV', 'production')
+SESSION_SECRET = os.environ.get('SESSION_SECRET') or (secrets.token_urlsafe(32) if APP_ENV == "development" else None)
+SESSION_ALGORITHM = "HS256"
+# Users allowed to run admin operations, on top of a valid session token (there is
+# no admin role on users yet)
+ADMIN_USER_IDS = {user_id.strip() for user_id in os.environ.get('ADMIN_USER_IDS', '').split(',') if user_id.strip()}
+SESSION_TTL_SECONDS = int(os.environ.get('SESSION_TTL_SECONDS', '3600'))
+
+# Chat rooms are cached per worker for access checks; changes made through other
+# workers show up within this long
+CHAT_ROOM_DIRECTORY_TTL_SECONDS = float(os.environ.get('CHAT_ROOM_DIRECTORY_TTL_SECONDS', '30'))
+
+# Warm room history: most recent messages kept per room, and a cap across all rooms
+HISTORY_CACHE_MESSAGES = int(os.environ.get('HISTORY_CACHE_MESSAGES', '50'))
+HISTORY_CACHE_MAX_BYTES = int(os.environ.get('HISTORY_CACHE_MAX_BYTES', str(64 * 1024 * 1024)))
+# Messages sent through other workers reach this worker's cached pages within this long
+HISTORY_CACHE_TTL_SECONDS = float(os.environ.get('HISTORY_CACHE_TTL_SECONDS', '5'))
+
+# Offline delivery: how much a reconnect sync returns per room / DM log, and how
+# long DM delivery log entries are kept
+SYNC_MAX_MESSAGES = int(os.environ.get('SYNC_MAX_MESSAGES', '200'))
+DELIVERY_LOG_TTL_DAYS = int(os.environ.get('DELIVERY_LOG_TTL_DAYS', '30'))
+
+# Chat archiving: messages older than ARCHIVE_AFTER_DAYS move to compressed monthly
+# segments in message_archive. The archiver runs every ARCHIVE_INTERVAL_HOURS
+# (0 = only on demand through the archive endpoint).
+ARCHIVE_AFTER_DAYS = int(os.environ.get('ARCHIVE_AFTER_DAYS', '365'))
+ARCHIVE_INTERVAL_HOURS = float(os.environ.get('ARCHIVE_INTERVAL_HOURS', '0'))
+ARCHIVE_SEGMENT_MAX = 1000  # messages per segment, keeps documents far below 16MB
+
+# Newsletter delivery
+NEWSLETTER_TRANSPORT = os.environ.get('NEWSLETTER_TRANSPORT', 'smtp')  # "smtp" or "memory"
+NEWSLETTER_FROM = os.environ.get('NEWSLETTER_FROM', 'ICAA Newsletter <newsletter@icaa.org>')
+NEWSLETTER_SEND_CONCURRENCY = int(os.environ.get('NEWSLETTER_SEND_CONCURRENCY', '10'))
+NEWSLETTER_MAX_ATTEMPTS = 3
+NEWSLETTER_BATCH_SIZE = 200
+NEWSLETTER_LEASE_SECONDS = 120
+WORKER_ID = str(uuid.uuid4())  # identifies this process in send job leases
+PUBLIC_BASE_URL = os.environ.get('PUBLIC_BASE_URL', 'https://alumni-community.preview.emergentagent.com')
+# Signs unsubscribe links. No random fallback: links already emailed must keep working
+# across restarts and workers, so send jobs refuse to start without it
+UNSUBSCRIBE_SECRET = os.environ.get('UNSUBSCRIBE_SECRET')
+SMTP_HOST = os.environ.get('SMTP_HOST', 'localhost')
+SMTP_PORT = int(os.environ.get('SMTP_PORT', '1025'))  # e.g. `python -m aiosmtpd -n -l localhost:1025` locally
+SMTP_USER = os.environ.get('SMTP_USER')
+SMTP_PASSWORD = os.environ.get('SMTP_PASSWORD')
+SMTP_STARTTLS = os.environ.get('SMTP_STARTTLS', '0') == '1'
+
+# Chat flood control: (tokens refilled per second, burst size)
+CHAT_RATE_LIMITS = {
+    "sid": (5.0, 10),
+    "user": (8.0, 15)
+}
+# Per-room limits by room type; cohort and track rooms are far bigger than custom ones.
+# Override with e.g. CHAT_ROOM_RATE_LIMITS='{"cohort": [50, 100]}'
+CHAT_ROOM_RATE_LIMITS = {
+    "cohort": (30.0, 60),
+    "program_track": (30.0, 60),
+    "custom": (10.0, 20),
+    "direct": (5.0, 10)
+}
+CHAT_ROOM_RATE_LIMITS.update({
+    room_type: tuple(limit)
+    for room_type, limit in json.loads(os.environ.get('CHAT_ROOM_RATE_LIMITS', '{}')).items()
+})
+
 # Ensure uploads directory exists
 UPLOAD_DIR = ROOT_DIR / "uploads" / "newsletters"
 DOCUMENTS_DIR = ROOT_DIR / "uploads" / "documents"
+THUMBNAILS_DIR = ROOT_DIR / "uploads" / "thumbnails"
 UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
 DOCUMENTS_DIR.mkdir(parents=True, exist_ok=True)
+THUMBNAILS_DIR.mkdir(parents=True, exist_ok=True)
+
+# Uploaded file processing (text extraction + first-page thumbnail) in worker processes
+FILE_PROCESSING_WORKERS = int(os.environ.get('FILE_PROCESSING_WORKERS', '2'))
+FILE_PROCESSING_TIMEOUT_SECONDS = float(os.environ.get('FILE_PROCESSING_TIMEOUT_SECONDS', '120'))
+FILE_PROCESSING_RESUME_LIMIT = int(os.environ.get('FILE_PROCESSING_RESUME_LIMIT', '50'))  # per startup
+EXTRACTED_TEXT_MAX_CHARS = 100_000  # per file, bounds the search index and document size
+
+# Default document listings are cached per worker for at most this long
+DOCUMENT_LISTING_TTL_SECONDS = float(os.environ.get('DOCUMENT_LISTING_TTL_SECONDS', '30'))
+DOCUMENT_CATEGORIES = ("bylaws", "policies", "forms", "reports", "other")
 
 # Define Models
 class User(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     name: str
     email: EmailStr
-    password_hash: Optional[str] = None  # For future auth implementation
+    password_hash: Optional[str] = Field(default=None, exclude=True)  # never serialized into responses
     bio: Optional[str] = None
     interests: Optional[List[str]] = None
     birthday: Optional[str] = None  # ISO date string
@@ -67,7 +575,7 @@ class User(BaseModel):
 class UserCreate(BaseModel):
     name: str
     email: EmailStr
-    password: Optional[str] = None
+    password: Optional[str] = Field(default=None, min_length=8)
     bio: Optional[str] = None
     interests: Optional[List[str]] = None
     birthday: Optional[str] = None
@@ -100,6 +608,18 @@ class ChatRoom(BaseModel):
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
+class ChatSessionRequest(BaseModel):
+    email: EmailStr
+    password: str
+
+class ChatSessionResponse(BaseModel):
+    token: str
+    expires_at: datetime
+    user_id: str
+
+class ChatRoomParticipantsUpdate(BaseModel):
+    user_ids: List[str]
+
 class ChatRoomCreate(BaseModel):
     name: str
     description: Optional[str] = None
@@ -118,6 +638,7 @@ class Message(BaseModel):
     image_url: Optional[str] = None
     file_url: Optional[str] = None
     reply_to: Optional[str] = None  # Message ID if this is a reply
+    seq: Optional[int] = None  # Monotonic per-room sequence assigned at persist time
     is_edited: bool = False
     is_deleted: bool = False
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
@@ -131,6 +652,20 @@ class MessageCreate(BaseModel):
     file_url: Optional[str] = None
     reply_to: Optional[str] = None
 
+class MessageBulkDelete(BaseModel):
+    message_ids: List[str]
+
+class MessagePurgeUser(BaseModel):
+    user_id: str
+
+class ArchiveRunRequest(BaseModel):
+    older_than_days: int = ARCHIVE_AFTER_DAYS
+
+class ArchiveRehydrateRequest(BaseModel):
+    kind: str  # "room" or "dm"
+    scope: str  # room_id or DM conversation key
+    month: Optional[str] = None  # "2024-03"; all months when omitted
+
 class DirectMessage(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     sender_id: str
@@ -143,6 +678,7 @@ class DirectMessage(BaseModel):
     file_url: Optional[str] = None
     is_read: bool = False
     is_deleted: bool = False
+    seq: Optional[int] = None  # Monotonic per-conversation sequence assigned at persist time
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
 class DirectMessageCreate(BaseModel):
@@ -225,6 +761,21 @@ class Document(BaseModel):
     uploaded_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     is_current_version: bool = True
     file_size: Optional[int] = None
+    version_number: Optional[int] = None  # of the current version, see /documents/{id}/versions
+    page_count: Optional[int] = None
+    thumbnail_url: Optional[str] = None
+    processing_status: Optional[str] = None  # "processing", "ready", "unsupported", "unavailable", "failed"
+
+class DocumentVersion(BaseModel):
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    document_id: str
+    version_number: int  # 1, 2, 3... in upload order
+    version: str  # display label, e.g. "2.1"
+    filename: str
+    file_size: Optional[int] = None
+    uploaded_by: str = "ICAA Admin"
+    uploaded_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    is_current_version: bool = True
 
 class DocumentCreate(BaseModel):
     title: str
@@ -331,10 +882,18 @@ class NewsletterSubscriber(BaseModel):
     email: EmailStr
     subscribed_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     is_active: bool = True
+    unsubscribed_at: Optional[datetime] = None
 
 class NewsletterSubscriberCreate(BaseModel):
     email: EmailStr
 
+class SubscriberImportResult(BaseModel):
+    imported: int
+    already_subscribed: int
+    reactivated: int
+    invalid: int
+    invalid_rows: List[Dict]  # first SUBSCRIBER_IMPORT_MAX_ERRORS rejected rows
+
 class Newsletter(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     title: str
@@ -344,6 +903,21 @@ class Newsletter(BaseModel):
     pdf_url: Optional[str] = None
     uploaded_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     is_published: bool = True
+    page_count: Optional[int] = None
+    thumbnail_url: Optional[str] = None
+    processing_status: Optional[str] = None
+
+class NewsletterSendJob(BaseModel):
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    newsletter_id: str
+    status: str = "pending"  # "pending", "running", "completed", "cancelled", "failed"
+    sent: int = 0
+    failed: int = 0
+    skipped: int = 0  # already delivered before a resume
+    last_error: Optional[str] = None
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    completed_at: Optional[datetime] = None
 
 class NewsletterCreate(BaseModel):
     title: str
@@ -382,6 +956,49 @@ class ShopCheckoutRequest(BaseModel):
     customer_address: str
     items: List[Dict]
 
+class DirectoryUser(BaseModel):
+    id: str
+    name: str
+    cohort: Optional[str] = None
+    program_track: Optional[str] = None
+    interests: Optional[List[str]] = None
+    profile_photo_url: Optional[str] = None
+    is_verified_alumni: bool = False
+    membership_tier: str = "free"
+
+class DirectoryResults(BaseModel):
+    total: int
+    limit: int
+    skip: int
+    results: List[DirectoryUser]
+    facets: Dict[str, Dict[str, int]]
+
+class MessageSearchHit(BaseModel):
+    message: Dict
+    context_before: List[Dict]
+    context_after: List[Dict]
+    cursor: int  # Pass as `cursor` to the history endpoint to open history at this message
+    score: float
+
+class MessageSearchResults(BaseModel):
+    query: str
+    results: List[MessageSearchHit]
+
+class SearchHit(BaseModel):
+    type: str  # "news", "event", "document", "product", "newsletter"
+    id: str
+    title: str
+    snippet: str = ""
+    score: float
+
+class SearchResults(BaseModel):
+    query: str
+    total: int
+    total_exact: bool = True  # False: total is a lower bound (very common terms aren't counted in full)
+    limit: int
+    skip: int
+    results: List[SearchHit]
+
 # Membership pricing
 MEMBERSHIP_PRICES = {
     "free": 0.0,
@@ -390,6 +1007,12 @@ MEMBERSHIP_PRICES = {
     "lifetime": 1200.0
 }
 
+# Fields returned by directory list views; bio, birthday, email etc. stay server-side
+DIRECTORY_PROJECTION = {
+    "_id": 0, "id": 1, "name": 1, "cohort": 1, "program_track": 1, "interests": 1,
+    "profile_photo_url": 1, "is_verified_alumni": 1, "membership_tier": 1
+}
+
 # Helper function to prepare data for MongoDB
 def prepare_for_mongo(data):
     if isinstance(data, dict):
@@ -419,11 +1042,639 @@ def parse_from_mongo(item):
         return parsed
     return item
 
+def conversation_key(user_a, user_b):
+    """Order-independent key identifying the DM conversation between two users"""
+    return ":".join(sorted([user_a, user_b]))
+
+def tombstone_update(deleted_by):
+    """Soft-delete a message down to a tombstone: flag it and drop its payload"""
+    return {"$set": {
+        "is_deleted": True,
+        "content": "",
+        "image_url": None,
+        "file_url": None,
+        "deleted_by": deleted_by,
+        "updated_at": datetime.now(timezone.utc).isoformat()
+    }}
+
 def generate_order_number():
     """Generate a unique order number"""
     import time
     return f"ICAA-{int(time.time())}-{str(uuid.uuid4())[:8].upper()}"
 
+# Full-text search index
+search_index = SearchIndex()
+
+def index_news_post(post):
+    if not post.get("is_published", True):
+        search_index.remove("news", post["id"])
+        return
+    search_index.add(
+        "news", post["id"],
+        [(post.get("title"), 3), (post.get("excerpt"), 2), (post.get("content"), 1)],
+        post.get("title"), post.get("excerpt")
+    )
+
+def index_event(event):
+    if not event.get("is_active", True):
+        search_index.remove("event", event["id"])
+        return
+    search_index.add(
+        "event", event["id"],
+        [(event.get("title"), 3), (event.get("description"), 1)],
+        event.get("title"), event.get("description")
+    )
+
+def index_document(document):
+    # Search has no caller identity, so only public documents are searchable
+    if document.get("access_level", "public") != "public":
+        search_index.remove("document", document["id"])
+        return
+    search_index.add(
+        "document", document["id"],
+        [(document.get("title"), 3), (document.get("description"), 1), (document.get("text_content"), 1)],
+        document.get("title"), document.get("description")
+    )
+
+def index_newsletter(newsletter):
+    if not newsletter.get("is_published", True):
+        search_index.remove("newsletter", newsletter["id"])
+        return
+    search_index.add(
+        "newsletter", newsletter["id"],
+        [(newsletter.get("title"), 3), (newsletter.get("description"), 2), (newsletter.get("text_content"), 1)],
+        newsletter.get("title"), newsletter.get("description")
+    )
+
+def index_product(product):
+    if not product.get("is_active", True):
+        search_index.remove("product", product["id"])
+        return
+    search_index.add(
+        "product", product["id"],
+        [(product.get("name"), 3), (product.get("description"), 1)],
+        product.get("name"), product.get("description")
+    )
+
+async def next_sequence(name, count=1):
+    """Atomically reserve `count` numbers from a named counter; returns the last one"""
+    counter = await db.counters.find_one_and_update(
+        {"_id": name},
+        {"$inc": {"seq": count}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+    return counter["seq"]
+
+async def backfill_sequences(collection, scope_field, counter_prefix):
+    """One-off: number messages stored before seq existed, in created_at order per scope"""
+    marker = f"migration:{collection.name}_seq"
+    if await db.counters.find_one({"_id": marker}):
+        return
+    for scope in await collection.distinct(scope_field, {"seq": {"$exists": False}}):
+        ids = [
+            doc["id"] async for doc in collection.find(
+                {scope_field: scope, "seq": {"$exists": False}}, {"_id": 0, "id": 1}
+            ).sort("created_at", 1)
+        ]
+        if not ids:
+            continue
+        first = await next_sequence(f"{counter_prefix}:{scope}", len(ids)) - len(ids) + 1
+        await collection.bulk_write([
+            UpdateOne({"id": message_id, "seq": {"$exists": False}}, {"$set": {"seq": first + n}})
+            for n, message_id in enumerate(ids)
+        ], ordered=False)
+    await db.counters.update_one({"_id": marker}, {"$set": {"done": True}}, upsert=True)
+
+async def dedupe_default_rooms():
+    """Collapse duplicate cohort/track rooms left behind by the old check-then-insert"""
+    for field in ("cohort", "program_track"):
+        pipeline = [
+            {"$match": {"room_type": field, "is_active": True}},
+            {"$sort": {"created_at": 1}},
+            {"$group": {"_id": f"${field}", "ids": {"$push": "$id"}, "count": {"$sum": 1}}},
+            {"$match": {"count": {"$gt": 1}}}
+        ]
+        async for group in db.chat_rooms.aggregate(pipeline):
+            keep, *duplicates = group["ids"]
+            await db.messages.update_many({"room_id": {"$in": duplicates}}, {"$set": {"room_id": keep}})
+            await db.chat_rooms.update_many(
+                {"id": {"$in": duplicates}},
+                {"$set": {"is_active": False, "updated_at": datetime.now(timezone.utc).isoformat()}}
+            )
+            logger.warning(f"Merged {len(duplicates)} duplicate {field} rooms for {group['_id']} into {keep}")
+
+USER_PROFILE_FIELDS = ("bio", "interests", "birthday", "profile_photo_url", "cohort", "program_track")
+
+async def merge_duplicate_users(email, users):
+    """Keep the verified (else oldest) account, fill its gaps from the others and
+    move their room memberships and room messages over"""
+    keep = next((user for user in users if user.get("is_verified_alumni")), users[0])
+    merged = {
+        field: next(user[field] for user in users if user.get(field))
+        for field in USER_PROFILE_FIELDS
+        if not keep.get(field) and any(user.get(field) for user in users)
+    }
+    if any(user.get("is_verified_alumni") for user in users):
+        merged["is_verified_alumni"] = True
+    if merged:
+        await db.users.update_one({"id": keep["id"]}, {"$set": merged})
+    
+    for duplicate in users:
+        if duplicate["id"] == keep["id"]:
+            continue
+        # DM conversations are keyed and numbered by user pair; leave those accounts
+        # in place under a non-colliding email for manual review
+        if await db.direct_messages.find_one({"$or": [{"sender_id": duplicate["id"]}, {"receiver_id": duplicate["id"]}]}):
+            await db.users.update_one(
+                {"id": duplicate["id"]}, {"$set": {"email": f"duplicate-{duplicate['id']}+{email}"}}
+            )
+            logger.warning(f"Duplicate user {duplicate['id']} for {email} has direct messages; email retired, not merged")
+            continue
+        for field in ("participants", "admins"):
+            await db.chat_rooms.update_many({field: duplicate["id"]}, {"$addToSet": {field: keep["id"]}})
+            await db.chat_rooms.update_many({field: duplicate["id"]}, {"$pull": {field: duplicate["id"]}})
+        await db.messages.update_many({"sender_id": duplicate["id"]}, {"$set": {"sender_id": keep["id"]}})
+        await db.user_status.delete_many({"user_id": duplicate["id"]})
+        await db.users.delete_one({"id": duplicate["id"]})
+    logger.warning(f"Merged {len(users) - 1} duplicate users for {email} into {keep['id']}")
+
+async def merge_duplicate_members(email, members):
+    """Keep the paid-up (else oldest) membership record"""
+    keep = next((member for member in members if member.get("payment_status") == "active"), members[0])
+    await db.members.delete_many({"email": email, "id": {"$ne": keep["id"]}})
+    logger.warning(f"Merged {len(members) - 1} duplicate members for {email} into {keep['id']}")
+
+async def merge_duplicate_subscribers(email, subscribers):
+    """Keep the oldest subscription, active if any copy was"""
+    keep = subscribers[0]
+    if any(subscriber.get("is_active") for subscriber in subscribers) and not keep.get("is_active"):
+        await db.newsletter_subscribers.update_one({"id": keep["id"]}, {"$set": {"is_active": True}})
+    await db.newsletter_subscribers.delete_many({"email": email, "id": {"$ne": keep["id"]}})
+
+async def dedupe_emails(collection, merge):
+    """Collapse records sharing an email, left behind by the old check-then-insert"""
+    pipeline = [
+        {"$sort": {"_id": 1}},  # insertion order, oldest first
+        {"$group": {"_id": "$email", "docs": {"$push": "$$ROOT"}, "count": {"$sum": 1}}},
+        {"$match": {"count": {"$gt": 1}}}
+    ]
+    async for group in collection.aggregate(pipeline, allowDiskUse=True):
+        await merge(group["_id"], group["docs"])
+
+async def ensure_indexes():
+    """Create the MongoDB indexes the API relies on (idempotent)"""
+    # One account / membership / subscription per email, enforced by Mongo. The
+    # duplicate scan is one-off: once the indexes exist no new duplicates can appear.
+    marker = "migration:unique_emails"
+    if not await db.counters.find_one({"_id": marker}):
+        await dedupe_emails(db.users, merge_duplicate_users)
+        await dedupe_emails(db.members, merge_duplicate_members)
+        await dedupe_emails(db.newsletter_subscribers, merge_duplicate_subscribers)
+    await db.users.create_index("email", unique=True)
+    await db.members.create_index("email", unique=True)
+    await db.newsletter_subscribers.create_index("email", unique=True)
+    await db.counters.update_one({"_id": marker}, {"$set": {"done": True}}, upsert=True)
+    
+    # One active cohort / program track room per value, enforced by Mongo
+    await dedupe_default_rooms()
+    await db.chat_rooms.create_index(
+        [("room_type", 1), ("cohort", 1)],
+        unique=True,
+        name="unique_active_cohort_room",
+        partialFilterExpression={"room_type": "cohort", "is_active": True}
+    )
+    await db.chat_rooms.create_index(
+        [("room_type", 1), ("program_track", 1)],
+        unique=True,
+        name="unique_active_program_track_room",
+        partialFilterExpression={"room_type": "program_track", "is_active": True}
+    )
+
+    # Member directory: equality filters first, then name_search for sort + prefix range
+    await db.users.create_index([("name_search", 1)])
+    await db.users.create_index([("cohort", 1), ("program_track", 1), ("name_search", 1)])
+    await db.users.create_index([("program_track", 1), ("name_search", 1)])
+    await db.users.create_index([("interests", 1), ("name_search", 1)])  # multikey
+    await db.users.create_index([("membership_tier", 1), ("is_verified_alumni", 1), ("name_search", 1)])
+
+    # Chat history and message search. Text indexes carry an equality prefix so a
+    # search is always scoped to one room / one DM conversation.
+    # Ordering is by per-room seq; messages from before seq existed are backfilled below
+    await db.messages.create_index(
+        [("room_id", 1), ("seq", 1)], unique=True, partialFilterExpression={"seq": {"$exists": True}}
+    )
+    # History reads filter is_deleted: False; keeping it in the key means tombstones
+    # are skipped inside the index instead of being fetched and discarded
+    await db.messages.create_index([("room_id", 1), ("is_deleted", 1), ("seq", -1)])
+    await db.messages.create_index([("room_id", 1), ("sender_id", 1)])
+    await db.messages.create_index([("room_id", 1), ("content", "text")], name="room_content_text")
+    await db.direct_messages.create_index(
+        [("conversation_key", 1), ("seq", 1)], unique=True, partialFilterExpression={"seq": {"$exists": True}}
+    )
+    await db.direct_messages.create_index([("conversation_key", 1), ("is_deleted", 1), ("seq", -1)])
+    await db.direct_messages.create_index(
+        [("conversation_key", 1), ("content", "text")], name="conversation_content_text"
+    )
+    await db.direct_messages.update_many(
+        {"conversation_key": {"$exists": False}},
+        [{"$set": {"conversation_key": {"$cond": {
+            "if": {"$lt": ["$sender_id", "$receiver_id"]},
+            "then": {"$concat": ["$sender_id", ":", "$receiver_id"]},
+            "else": {"$concat": ["$receiver_id", ":", "$sender_id"]}
+        }}}}]
+    )
+    await backfill_sequences(db.messages, "room_id", "room")
+    await backfill_sequences(db.direct_messages, "conversation_key", "dm")
+
+    await db.message_archive.create_index([("kind", 1), ("scope", 1), ("last_seq", -1)])
+
+    # Per-user DM delivery log for sync-on-reconnect. created_at is stored as a real
+    # date (not an ISO string) so the TTL index can expire old entries.
+    await db.delivery_log.create_index([("user_id", 1), ("seq", 1)], unique=True)
+    await db.delivery_log.create_index("created_at", expireAfterSeconds=DELIVERY_LOG_TTL_DAYS * 86400)
+    
+    # Document listing reads current versions only; history lives in document_versions
+    await db.documents.create_index(
+        [("uploaded_at", -1)], name="current_documents_by_date",
+        partialFilterExpression={"is_current_version": True}
+    )
+    await db.documents.create_index(
+        [("category", 1), ("uploaded_at", -1)], name="current_documents_by_category",
+        partialFilterExpression={"is_current_version": True}
+    )
+    await db.documents.create_index(
+        [("access_level", 1), ("category", 1), ("uploaded_at", -1)], name="current_documents_by_access",
+        partialFilterExpression={"is_current_version": True}
+    )
+    await db.document_versions.create_index([("document_id", 1), ("version_number", -1)], unique=True)
+    await db.document_versions.create_index(
+        [("document_id", 1)], unique=True, name="one_current_version",
+        partialFilterExpression={"is_current_version": True}
+    )
+    await backfill_document_versions()
+    
+    # Newsletter sends: one delivery record per job and recipient makes resumes idempotent
+    await db.newsletter_deliveries.create_index([("job_id", 1), ("email", 1)], unique=True)
+    await db.newsletter_send_jobs.create_index([("newsletter_id", 1), ("status", 1)])
+    # At most one pending/running job per newsletter; "active" is cleared on every terminal status
+    await db.newsletter_send_jobs.update_many(
+        {"status": {"$in": ["pending", "running"]}, "active": {"$exists": False}}, {"$set": {"active": True}}
+    )
+    await db.newsletter_send_jobs.create_index(
+        [("newsletter_id", 1)], unique=True, name="one_active_send_job",
+        partialFilterExpression={"active": True}
+    )
+
+    # Backfill the lowercase name used for prefix search on users created before it existed
+    await db.users.update_many(
+        {"name_search": {"$exists": False}},
+        [{"$set": {"name_search": {"$toLower": "$name"}}}]
+    )
+
+SEARCH_SOURCES = [
+    ("news_posts", {"is_published": True}, index_news_post),
+    ("events", {"is_active": True}, index_event),
+    ("documents", {}, index_document),
+    ("products", {"is_active": True}, index_product),
+    ("newsletters", {"is_published": True}, index_newsletter),
+]
+
+async def build_search_index():
+    """Populate the search index from MongoDB on startup"""
+    projection = {
+        "_id": 0, "id": 1, "title": 1, "name": 1, "content": 1, "excerpt": 1,
+        "description": 1, "is_published": 1, "is_active": 1, "text_content": 1, "access_level": 1
+    }
+    for collection, query, indexer in SEARCH_SOURCES:
+        async for doc in db[collection].find(query, projection):
+            indexer(doc)
+    search_index.rank_common_terms()
+
+# Uploaded file processing. Parsing runs in spawned worker processes so it never
+# blocks the event loop (spawn, not fork: the parent has Motor and logging threads).
+file_processing_pool = None
+
+def get_file_processing_pool():
+    global file_processing_pool
+    if file_processing_pool is None:
+        file_processing_pool = ProcessPoolExecutor(
+            max_workers=FILE_PROCESSING_WORKERS, mp_context=multiprocessing.get_context("spawn")
+        )
+    return file_processing_pool
+
+def discard_file_processing_pool(pool):
+    """Drop a broken or hung pool so the next upload gets fresh workers"""
+    global file_processing_pool
+    if file_processing_pool is pool:
+        file_processing_pool = None
+    # A hung parse never returns, so its worker has to be stopped rather than waited for.
+    # ProcessPoolExecutor has no public handle on its workers: _processes (pid -> Process)
+    # is a CPython implementation detail, re-check it when upgrading Python.
+    for process in list((getattr(pool, "_processes", None) or {}).values()):
+        process.terminate()
+    pool.shutdown(wait=False, cancel_futures=True)
+
+async def run_file_extraction(file_path, thumbnail_path):
+    for attempt in range(2):
+        pool = get_file_processing_pool()
+        try:
+            return await asyncio.wait_for(
+                asyncio.get_running_loop().run_in_executor(
+                    pool, extract_file, str(file_path), str(thumbnail_path), EXTRACTED_TEXT_MAX_CHARS
+                ),
+                FILE_PROCESSING_TIMEOUT_SECONDS
+            )
+        except BrokenProcessPool:
+            # A worker died, on this file or another one in flight; retry once on fresh workers
+            discard_file_processing_pool(pool)
+            if attempt:
+                raise
+        except asyncio.TimeoutError:
+            discard_file_processing_pool(pool)
+            raise TimeoutError(f"Processing took longer than {FILE_PROCESSING_TIMEOUT_SECONDS:.0f}s")
+
+FILE_PROCESSING_TARGETS = {
+    # kind: (collection, filename field, upload directory, indexer, thumbnail URL template)
+    "document": ("documents", "filename", DOCUMENTS_DIR, index_document, "/api/documents/{id}/thumbnail"),
+    "newsletter": ("newsletters", "pdf_filename", UPLOAD_DIR, index_newsletter, "/api/newsletters/{id}/thumbnail"),
+}
+
+async def process_uploaded_file(kind, item_id, filename, file_path):
+    """Extract text, page count and a thumbnail for a fresh upload, then refresh search"""
+    collection_name, filename_field, _, indexer, thumbnail_template = FILE_PROCESSING_TARGETS[kind]
+    collection = db[collection_name]
+    # Named after the upload, so a slow job for an older upload cannot overwrite a newer thumbnail
+    thumbnail_filename = f"{kind}_{Path(filename).stem}.png"
+    # Only the upload that is still current may write its results
+    current = {"id": item_id, filename_field: filename}
+    
+    try:
+        result = await run_file_extraction(file_path, THUMBNAILS_DIR / thumbnail_filename)
+    except Exception as e:
+        logger.exception(f"Processing {kind} {item_id} failed")
+        await collection.update_one(current, {"$set": {"processing_status": "failed", "processing_error": str(e)}})
+        return
+    
+    updated = await collection.find_one_and_update(
+        current,
+        {"$set": {
+            "processing_status": result["status"],
+            "page_count": result["page_count"],
+            "text_content": result["text"],
+            "thumbnail_url": thumbnail_template.format(id=item_id) if result["thumbnail"] else None,
+            "thumbnail_filename": thumbnail_filename if result["thumbnail"] else None,
+            "processed_at": datetime.now(timezone.utc).isoformat()
+        }},
+        projection={"_id": 0},
+        return_document=ReturnDocument.AFTER
+    )
+    if updated:
+        indexer(updated)
+        if kind == "document":
+            document_listing_cache.invalidate()
+
+async def resume_file_processing():
+    """Re-run processing for uploads a restart interrupted (still marked "processing").
+    
+    At most FILE_PROCESSING_RESUME_LIMIT per startup, so a large backlog doesn't keep a
+    worker busy for long; anything left stays "processing" for the next startup.
+    """
+    remaining = FILE_PROCESSING_RESUME_LIMIT
+    query = {"processing_status": "processing"}
+    for kind, (collection_name, filename_field, upload_dir, _, _) in FILE_PROCESSING_TARGETS.items():
+        if remaining > 0:
+            items = await db[collection_name].find(query, {"_id": 0, "id": 1, filename_field: 1}).limit(remaining).to_list(remaining)
+            remaining -= len(items)
+            for item in items:
+                filename = item.get(filename_field)
+                if filename:
+                    await process_uploaded_file(kind, item["id"], filename, upload_dir / filename)
+        if remaining <= 0:
+            left = await db[collection_name].count_documents(query)
+            if left:
+                logger.warning(f"{left} interrupted {kind} uploads left for the next startup")
+
+def file_thumbnail_response(kind, item):
+    if not item or not item.get("thumbnail_url"):
+        raise HTTPException(status_code=404, detail="Thumbnail not found")
+    # Thumbnails made before they were named after the upload are keyed by item id
+    thumbnail_path = THUMBNAILS_DIR / (item.get("thumbnail_filename") or f"{kind}_{item['id']}.png")
+    if not thumbnail_path.exists():
+        raise HTTPException(status_code=404, detail="Thumbnail file not found on server")
+    return FileResponse(path=thumbnail_path, media_type="image/png")
+
+# Document access. Anonymous callers see public documents; a session token (issued
+# after a password sign-in) of a verified alumnus also sees members documents;
+# ADMIN_USER_IDS see everything.
+DOCUMENT_ACCESS_LEVELS = {
+    "public": ("public",),
+    "members": ("public", "members"),
+    "admin": ("public", "members", "admin")
+}
+
+def document_role(user_info):
+    if not user_info:
+        return "public"
+    if user_info['user_id'] in ADMIN_USER_IDS:
+        return "admin"
+    return "members" if user_info['is_verified_alumni'] else "public"
+
+def require_document_access(document, user_info):
+    if document.get("access_level", "public") not in DOCUMENT_ACCESS_LEVELS[document_role(user_info)]:
+        raise HTTPException(status_code=403, detail="Access denied")
+
+class DocumentListingCache:
+    """Pre-encoded JSON of each role's default document listing, per category.
+    
+    Per worker: a document change here clears it, and entries expire after
+    DOCUMENT_LISTING_TTL_SECONDS so changes made through other workers show up
+    within that. Only DOCUMENT_CATEGORIES (and "all") are cached, so there are
+    at most roles x categories entries.
+    """
+    
+    def __init__(self, ttl_seconds):
+        self.ttl_seconds = ttl_seconds
+        self.entries = {}  # (role, category) -> (expires_at, bytes)
+        self.generation = 0  # guards fills racing an invalidation
+    
+    def cacheable(self, category):
+        return category is None or category in DOCUMENT_CATEGORIES
+    
+    def get(self, role, category):
+        entry = self.entries.get((role, category))
+        if entry is None or entry[0] < time.monotonic():
+            return None
+        return entry[1]
+    
+    def fill(self, role, category, body, generation):
+        if generation == self.generation:
+            self.entries[(role, category)] = (time.monotonic() + self.ttl_seconds, body)
+    
+    def invalidate(self):
+        self.generation += 1
+        self.entries.clear()
+
+document_listing_cache = DocumentListingCache(DOCUMENT_LISTING_TTL_SECONDS)
+
+# Document versions
+transactions_supported = None
+
+async def supports_transactions():
+    """Multi-document transactions need a replica set or sharded cluster"""
+    global transactions_supported
+    if transactions_supported is None:
+        hello = await db.command("hello")
+        transactions_supported = "setName" in hello or hello.get("msg") == "isdbgrid"
+    return transactions_supported
+
+async def publish_document_version(version_obj, document_update):
+    """Make the new version current, unless a higher version_number already is.
+    
+    Concurrent uploads can finish in any order; the highest version_number wins
+    both in document_versions and on the document row (what listings read), so the
+    two always point at the same file. One transaction where available. Otherwise
+    the steps are ordered so the one_current_version index is never violated and
+    the document row changes in a single conditional update.
+    """
+    prepared_version = prepare_for_mongo(version_obj.dict())
+    document_id = version_obj.document_id
+    version_number = version_obj.version_number
+    older_current = {"document_id": document_id, "is_current_version": True, "version_number": {"$lt": version_number}}
+    newer_current = {"document_id": document_id, "is_current_version": True, "version_number": {"$gt": version_number}}
+    # Matches documents without an uploaded version yet (version_number missing or null)
+    document_filter = {"id": document_id, "version_number": {"$not": {"$gte": version_number}}}
+    
+    if await supports_transactions():
+        async def publish(session):
+            await db.document_versions.update_many(older_current, {"$set": {"is_current_version": False}}, session=session)
+            newer = await db.document_versions.find_one(newer_current, {"_id": 0, "id": 1}, session=session)
+            await db.document_versions.insert_one(dict(prepared_version, is_current_version=not newer), session=session)
+            await db.documents.update_one(document_filter, {"$set": document_update}, session=session)
+        
+        async with await client.start_session() as session:
+            # Retries the whole transaction on TransientTransactionError (e.g. a write
+            # conflict with a concurrent upload) and the commit on unknown outcomes
+            await session.with_transaction(publish)
+        return
+    
+    prepared_version["is_current_version"] = False
+    await db.document_versions.insert_one(prepared_version)
+    for attempt in range(3):
+        # A newer upload is current: this one stays in the history only
+        if await db.document_versions.find_one(newer_current, {"_id": 0, "id": 1}):
+            break
+        await db.document_versions.update_many(older_current, {"$set": {"is_current_version": False}})
+        try:
+            await db.document_versions.update_one({"id": version_obj.id}, {"$set": {"is_current_version": True}})
+            break
+        except DuplicateKeyError:
+            # Another upload became current in between; look again
+            if attempt == 2:
+                raise
+    await db.documents.update_one(document_filter, {"$set": document_update})
+
+async def backfill_document_versions():
+    """One-off: record the file each pre-versioning document already had as version 1"""
+    marker = "migration:document_versions"
+    if await db.counters.find_one({"_id": marker}):
+        return
+    async for document in db.documents.find({"filename": {"$nin": ["", None]}}, {"_id": 0}):
+        if await db.document_versions.find_one({"document_id": document["id"]}):
+            continue
+        version_obj = DocumentVersion(
+            document_id=document["id"],
+            version_number=1,
+            version=document.get("version", "1"),
+            filename=document["filename"],
+            file_size=document.get("file_size"),
+            uploaded_by=document.get("uploaded_by", "ICAA Admin"),
+            uploaded_at=parse_from_mongo(document).get("uploaded_at") or datetime.now(timezone.utc)
+        )
+        await db.document_versions.insert_one(prepare_for_mongo(version_obj.dict()))
+        await db.counters.update_one({"_id": f"docversion:{document['id']}"}, {"$max": {"seq": 1}}, upsert=True)
+    await db.documents.update_many({"is_current_version": {"$exists": False}}, {"$set": {"is_current_version": True}})
+    await db.counters.insert_one({"_id": marker, "done": True})
+
+# Passwords and chat session tokens
+PASSWORD_SCRYPT_PARAMS = {"n": 2 ** 14, "r": 8, "p": 1}
+SESSION_USER_PROJECTION = {
+    "_id": 0, "id": 1, "name": 1, "cohort": 1, "program_track": 1, "is_verified_alumni": 1, "password_hash": 1
+}
+
+def hash_password(password):
+    """scrypt hash with a random salt, stored as scrypt$<salt hex>$<hash hex>"""
+    salt = secrets.token_bytes(16)
+    digest = hashlib.scrypt(password.encode(), salt=salt, **PASSWORD_SCRYPT_PARAMS)
+    return f"scrypt${salt.hex()}${digest.hex()}"
+
+def verify_password(password, password_hash):
+    """False for users without a password (accounts created before sign-in existed)"""
+    scheme, _, rest = (password_hash or "").partition("$")
+    salt, _, expected = rest.partition("$")
+    if scheme != "scrypt" or not salt or not expected:
+        return False
+    digest = hashlib.scrypt(password.encode(), salt=bytes.fromhex(salt), **PASSWORD_SCRYPT_PARAMS)
+    return hmac.compare_digest(digest.hex(), expected)
+
+def issue_session_token(user):
+    """Sign a chat session token carrying the claims access checks need"""
+    now = datetime.now(timezone.utc)
+    expires_at = now + timedelta(seconds=SESSION_TTL_SECONDS)
+    claims = {
+        "sub": user["id"],
+        "name": user["name"],
+        "cohort": user.get("cohort"),
+        "track": user.get("program_track"),
+        "verified": user.get("is_verified_alumni", False),
+        "iat": now,
+        "exp": expires_at
+    }
+    return jwt.encode(claims, SESSION_SECRET, algorithm=SESSION_ALGORITHM), expires_at
+
+def decode_session_token(token):
+    """Verify a session token locally; returns the user info it carries, or None"""
+    try:
+        claims = jwt.decode(token, SESSION_SECRET, algorithms=[SESSION_ALGORITHM])
+    except jwt.PyJWTError:
+        return None
+    return {
+        'user_id': claims['sub'],
+        'user_name': claims['name'],
+        'cohort': claims.get('cohort'),
+        'program_track': claims.get('track'),
+        'is_verified_alumni': claims.get('verified', False)
+    }
+
+async def chat_session(authorization: Optional[str] = Header(None)):
+    """Resolve the chat caller from the bearer session token; the token is the only identity"""
+    if not authorization or not authorization.lower().startswith("bearer "):
+        raise HTTPException(status_code=401, detail="Session token required")
+    user_info = decode_session_token(authorization[7:])
+    if not user_info:
+        raise HTTPException(status_code=401, detail="Invalid or expired session token")
+    return user_info
+
+async def verified_chat_session(user_info: Dict = Depends(chat_session)):
+    if not user_info['is_verified_alumni']:
+        raise HTTPException(status_code=403, detail="Access denied")
+    return user_info
+
+async def admin_session(user_info: Dict = Depends(chat_session)):
+    """Admin operations: a session token of a user listed in ADMIN_USER_IDS"""
+    if user_info['user_id'] not in ADMIN_USER_IDS:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return user_info
+
+async def document_viewer(authorization: Optional[str] = Header(None)):
+    """Optional bearer session token; None for anonymous callers"""
+    if not authorization or not authorization.lower().startswith("bearer "):
+        return None
+    user_info = decode_session_token(authorization[7:])
+    if not user_info:
+        raise HTTPException(status_code=401, detail="Invalid or expired session token")
+    return user_info
+
 # Routes
 @api_router.get("/")
 async def root():
@@ -436,10 +1687,18 @@ async def create_document(doc: DocumentCreate):
     doc_obj = Document(**doc_dict, filename="", file_url="")
     prepared_data = prepare_for_mongo(doc_obj.dict())
     await db.documents.insert_one(prepared_data)
+    index_document(doc_obj.dict())
+    document_listing_cache.invalidate()
     return doc_obj
 
 @api_router.post("/documents/{document_id}/upload")
-async def upload_document(document_id: str, file: UploadFile = File(...)):
+async def upload_document(
+    document_id: str,
+    background_tasks: BackgroundTasks,
+    file: UploadFile = File(...),
+    version: Optional[str] = Form(None),
+    uploaded_by: Optional[str] = Form(None)
+):
     # Validate file type
     allowed_extensions = ['.pdf', '.doc', '.docx', '.txt']
     file_extension = '.' + file.filename.split('.')[-1].lower()
@@ -460,39 +1719,79 @@ async def upload_document(document_id: str, file: UploadFile = File(...)):
         with open(file_path, "wb") as buffer:
             shutil.copyfileobj(file.file, buffer)
         
-        # Update document in database
+        # Record the upload as a new version and make it current
         file_url = f"/api/documents/{document_id}/file"
         file_size = file_path.stat().st_size
+        version_number = await next_sequence(f"docversion:{document_id}")
+        version_obj = DocumentVersion(
+            document_id=document_id,
+            version_number=version_number,
+            # The first upload carries the version given at creation; later ones need a label
+            version=version or (document.get("version") if version_number == 1 else f"v{version_number}"),
+            filename=unique_filename,
+            file_size=file_size,
+            uploaded_by=uploaded_by or document.get("uploaded_by", "ICAA Admin")
+        )
         update_data = {
             "filename": unique_filename,
             "file_url": file_url,
             "file_size": file_size,
+            "version": version_obj.version,
+            "version_number": version_number,
+            "uploaded_by": version_obj.uploaded_by,
+            "uploaded_at": version_obj.uploaded_at.isoformat(),
+            "is_current_version": True,
+            "processing_status": "processing",
             "updated_at": datetime.now(timezone.utc).isoformat()
         }
-        await db.documents.update_one(
-            {"id": document_id},
-            {"$set": update_data}
-        )
+        await publish_document_version(version_obj, update_data)
+        document_listing_cache.invalidate()
+        background_tasks.add_task(process_uploaded_file, "document", document_id, unique_filename, file_path)
         
-        return {"message": "Document uploaded successfully", "file_url": file_url}
+        return {
+            "message": "Document uploaded successfully",
+            "file_url": file_url,
+            "version": version_obj.version,
+            "version_number": version_number
+        }
     
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to upload document: {str(e)}")
 
 @api_router.get("/documents", response_model=List[Document])
-async def get_documents(category: Optional[str] = None):
-    query = {}
+async def get_documents(
+    category: Optional[str] = None,
+    limit: int = 1000,
+    skip: int = 0,
+    user_info: Optional[Dict] = Depends(document_viewer)
+):
+    role = document_role(user_info)
+    cached = limit == 1000 and skip == 0 and document_listing_cache.cacheable(category)
+    if cached:
+        body = document_listing_cache.get(role, category)
+        if body is not None:
+            return Response(content=body, media_type="application/json")
+        generation = document_listing_cache.generation
+    
+    # is_current_version in the filter lets the partial indexes serve the query
+    query = {"is_current_version": True, "access_level": {"$in": list(DOCUMENT_ACCESS_LEVELS[role])}}
     if category:
         query["category"] = category
     
-    documents = await db.documents.find(query).sort("uploaded_at", -1).to_list(1000)
-    return [Document(**parse_from_mongo(doc)) for doc in documents]
+    documents = await db.documents.find(query, {"text_content": 0}).sort("uploaded_at", -1).skip(skip).limit(limit).to_list(limit)
+    models = [Document(**parse_from_mongo(doc)) for doc in documents]
+    if cached:
+        document_listing_cache.fill(
+            role, category, b"[" + b",".join(model.model_dump_json().encode() for model in models) + b"]", generation
+        )
+    return models
 
 @api_router.get("/documents/{document_id}/file")
-async def get_document_file(document_id: str):
+async def get_document_file(document_id: str, user_info: Optional[Dict] = Depends(document_viewer)):
     document = await db.documents.find_one({"id": document_id})
     if not document or not document.get('filename'):
         raise HTTPException(status_code=404, detail="Document file not found")
+    require_document_access(document, user_info)
     
     file_path = DOCUMENTS_DIR / document['filename']
     if not file_path.exists():
@@ -504,6 +1803,48 @@ async def get_document_file(document_id: str):
         filename=document.get('title', 'document') + Path(document['filename']).suffix
     )
 
+@api_router.get("/documents/{document_id}/versions", response_model=List[DocumentVersion])
+async def get_document_versions(document_id: str, user_info: Optional[Dict] = Depends(document_viewer)):
+    document = await db.documents.find_one({"id": document_id}, {"_id": 0, "access_level": 1})
+    if not document:
+        raise HTTPException(status_code=404, detail="Document not found")
+    require_document_access(document, user_info)
+    versions = await db.document_versions.find({"document_id": document_id}).sort("version_number", -1).to_list(1000)
+    return [DocumentVersion(**parse_from_mongo(version)) for version in versions]
+
+@api_router.get("/documents/{document_id}/versions/{version_number}/file")
+async def get_document_version_file(
+    document_id: str,
+    version_number: int,
+    user_info: Optional[Dict] = Depends(document_viewer)
+):
+    document, version = await asyncio.gather(
+        db.documents.find_one({"id": document_id}, {"_id": 0, "title": 1, "access_level": 1}),
+        db.document_versions.find_one({"document_id": document_id, "version_number": version_number})
+    )
+    if not document or not version:
+        raise HTTPException(status_code=404, detail="Document version not found")
+    require_document_access(document, user_info)
+    
+    file_path = DOCUMENTS_DIR / version['filename']
+    if not file_path.exists():
+        raise HTTPException(status_code=404, detail="Document file not found on server")
+    
+    return FileResponse(
+        path=file_path,
+        media_type='application/octet-stream',
+        filename=f"{document.get('title', 'document')} ({version['version']}){Path(version['filename']).suffix}"
+    )
+
+@api_router.get("/documents/{document_id}/thumbnail")
+async def get_document_thumbnail(document_id: str, user_info: Optional[Dict] = Depends(document_viewer)):
+    document = await db.documents.find_one(
+        {"id": document_id}, {"_id": 0, "id": 1, "thumbnail_url": 1, "thumbnail_filename": 1, "access_level": 1}
+    )
+    if document:
+        require_document_access(document, user_info)
+    return file_thumbnail_response("document", document)
+
 # Product/Shop endpoints
 @api_router.post("/products", response_model=Product)
 async def create_product(product: ProductCreate):
@@ -511,6 +1852,7 @@ async def create_product(product: ProductCreate):
     product_obj = Product(**product_dict)
     prepared_data = prepare_for_mongo(product_obj.dict())
     await db.products.insert_one(prepared_data)
+    index_product(product_obj.dict())
     return product_obj
 
 @api_router.get("/products", response_model=List[Product])
@@ -545,6 +1887,7 @@ async def update_product(product_id: str, product_update: ProductCreate):
         raise HTTPException(status_code=404, detail="Product not found")
     
     updated_product = await db.products.find_one({"id": product_id})
+    index_product(updated_product)
     return Product(**parse_from_mongo(updated_product))
 
 @api_router.delete("/products/{product_id}")
@@ -555,6 +1898,7 @@ async def delete_product(product_id: str):
     )
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Product not found")
+    search_index.remove("product", product_id)
     return {"message": "Product deleted successfully"}
 
 # Cart endpoints
@@ -673,6 +2017,7 @@ async def create_event(event: EventCreate):
     event_obj = Event(**event_dict)
     prepared_data = prepare_for_mongo(event_obj.dict())
     await db.events.insert_one(prepared_data)
+    index_event(event_obj.dict())
     return event_obj
 
 @api_router.get("/events", response_model=List[Event])
@@ -754,6 +2099,7 @@ async def delete_event(event_id: str):
     )
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Event not found")
+    search_index.remove("event", event_id)
     return {"message": "Event deleted successfully"}
 
 # News & Updates endpoints (existing code)
@@ -763,6 +2109,7 @@ async def create_news_post(post: NewsPostCreate):
     news_obj = NewsPost(**news_dict)
     prepared_data = prepare_for_mongo(news_obj.dict())
     await db.news_posts.insert_one(prepared_data)
+    index_news_post(news_obj.dict())
     return news_obj
 
 @api_router.get("/news", response_model=List[NewsPost])
@@ -784,15 +2131,16 @@ async def create_newsletter(newsletter: NewsletterCreate):
     newsletter_obj = Newsletter(**newsletter_dict)
     prepared_data = prepare_for_mongo(newsletter_obj.dict())
     await db.newsletters.insert_one(prepared_data)
+    index_newsletter(newsletter_obj.dict())
     return newsletter_obj
 
 @api_router.get("/newsletters", response_model=List[Newsletter])
 async def get_newsletters():
-    newsletters = await db.newsletters.find({"is_published": True}).sort("month", -1).to_list(1000)
+    newsletters = await db.newsletters.find({"is_published": True}, {"text_content": 0}).sort("month", -1).to_list(1000)
     return [Newsletter(**parse_from_mongo(newsletter)) for newsletter in newsletters]
 
 @api_router.post("/newsletters/{newsletter_id}/upload-pdf")
-async def upload_newsletter_pdf(newsletter_id: str, file: UploadFile = File(...)):
+async def upload_newsletter_pdf(newsletter_id: str, background_tasks: BackgroundTasks, file: UploadFile = File(...)):
     # Validate file type
     if not file.filename.endswith('.pdf'):
         raise HTTPException(status_code=400, detail="Only PDF files are allowed")
@@ -817,12 +2165,14 @@ async def upload_newsletter_pdf(newsletter_id: str, file: UploadFile = File(...)
         update_data = {
             "pdf_filename": unique_filename,
             "pdf_url": pdf_url,
+            "processing_status": "processing",
             "updated_at": datetime.now(timezone.utc).isoformat()
         }
         await db.newsletters.update_one(
             {"id": newsletter_id},
             {"$set": update_data}
         )
+        background_tasks.add_task(process_uploaded_file, "newsletter", newsletter_id, unique_filename, file_path)
         
         return {"message": "PDF uploaded successfully", "pdf_url": pdf_url}
     
@@ -845,6 +2195,323 @@ async def get_newsletter_pdf(newsletter_id: str):
         filename=newsletter.get('title', 'newsletter') + '.pdf'
     )
 
+@api_router.get("/newsletters/{newsletter_id}/thumbnail")
+async def get_newsletter_thumbnail(newsletter_id: str):
+    newsletter = await db.newsletters.find_one(
+        {"id": newsletter_id}, {"_id": 0, "id": 1, "thumbnail_url": 1, "thumbnail_filename": 1}
+    )
+    return file_thumbnail_response("newsletter", newsletter)
+
+# Newsletter delivery
+class PermanentDeliveryError(Exception):
+    """The recipient was rejected; retrying will not help"""
+
+class SmtpTransport:
+    """Delivers through an SMTP server (a local stand-in such as aiosmtpd in development)"""
+    async def send(self, message):
+        await asyncio.to_thread(self.send_blocking, message)
+    
+    def send_blocking(self, message):
+        try:
+            with smtplib.SMTP(SMTP_HOST, SMTP_PORT, timeout=30) as smtp:
+                if SMTP_STARTTLS:
+                    smtp.starttls()
+                if SMTP_USER:
+                    smtp.login(SMTP_USER, SMTP_PASSWORD)
+                smtp.send_message(message)
+        except smtplib.SMTPRecipientsRefused as e:
+            raise PermanentDeliveryError(str(e))
+
+class MemoryTransport:
+    """Keeps messages in memory, for tests and dry runs"""
+    def __init__(self):
+        self.sent = []
+    
+    async def send(self, message):
+        self.sent.append(message)
+
+MAIL_TRANSPORTS = {"smtp": SmtpTransport, "memory": MemoryTransport}
+mail_transport = MAIL_TRANSPORTS[NEWSLETTER_TRANSPORT]()
+newsletter_send_tasks = {}  # job_id -> task running in this worker
+
+def unsubscribe_token(email):
+    """Per-recipient signature that lets an emailed link unsubscribe exactly that address"""
+    return hmac.new(UNSUBSCRIBE_SECRET.encode(), f"unsubscribe:{email}".encode(), hashlib.sha256).hexdigest()
+
+def require_unsubscribe_secret():
+    if not UNSUBSCRIBE_SECRET:
+        raise HTTPException(status_code=503, detail="UNSUBSCRIBE_SECRET is not set; newsletters cannot be sent")
+
+def render_newsletter_message(newsletter, email):
+    """Build the per-recipient message, including their personal unsubscribe link"""
+    unsubscribe_url = (
+        f"{PUBLIC_BASE_URL}/api/newsletter/unsubscribe?email={quote(email)}&token={unsubscribe_token(email)}"
+    )
+    message = EmailMessage()
+    message["From"] = NEWSLETTER_FROM
+    message["To"] = email
+    message["Subject"] = newsletter["title"]
+    message["List-Unsubscribe"] = f"<{unsubscribe_url}>"
+    message["List-Unsubscribe-Post"] = "List-Unsubscribe=One-Click"  # RFC 8058, POSTs to the same URL
+    pdf_link = f"{PUBLIC_BASE_URL}{newsletter['pdf_url']}" if newsletter.get("pdf_url") else None
+    lines = [newsletter["title"], "", newsletter["description"], ""]
+    if pdf_link:
+        lines += [f"Read this month's newsletter: {pdf_link}", ""]
+    lines += [f"You are receiving this because {email} is subscribed to the ICAA newsletter.",
+              f"Unsubscribe: {unsubscribe_url}"]
+    message.set_content("\n".join(lines))
+    return message
+
+async def deliver_newsletter(job_id, newsletter, email, semaphore):
+    """Send to one recipient with retries; returns True when delivered"""
+    async with semaphore:
+        attempts, error = 0, None
+        while attempts < NEWSLETTER_MAX_ATTEMPTS:
+            attempts += 1
+            try:
+                await mail_transport.send(render_newsletter_message(newsletter, email))
+                error = None
+                break
+            except PermanentDeliveryError as e:
+                error = str(e)
+                break
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+                if attempts < NEWSLETTER_MAX_ATTEMPTS:
+                    await asyncio.sleep(2 ** (attempts - 1))
+    
+    await db.newsletter_deliveries.update_one(
+        {"job_id": job_id, "email": email},
+        {"$set": {
+            "status": "failed" if error else "sent",
+            "attempts": attempts,
+            "error": error,
+            "updated_at": datetime.now(timezone.utc).isoformat()
+        }},
+        upsert=True
+    )
+    return error is None, error
+
+async def claim_send_job(job_id):
+    """Take (or renew) the lease on a job so only one worker sends it"""
+    now = datetime.now(timezone.utc)
+    return await db.newsletter_send_jobs.find_one_and_update(
+        {
+            "id": job_id,
+            "status": {"$in": ["pending", "running"]},
+            "$or": [{"lease_owner": WORKER_ID}, {"lease_until": {"$lt": now.isoformat()}}, {"lease_until": None}]
+        },
+        {"$set": {
+            "status": "running",
+            "lease_owner": WORKER_ID,
+            "lease_until": (now + timedelta(seconds=NEWSLETTER_LEASE_SECONDS)).isoformat(),
+            "updated_at": now.isoformat()
+        }},
+        return_document=ReturnDocument.AFTER
+    )
+
+async def keep_send_job_lease(job_id):
+    """Renew the lease while a batch is in flight (slow SMTP can outlast one lease)"""
+    while True:
+        await asyncio.sleep(NEWSLETTER_LEASE_SECONDS / 3)
+        if not await claim_send_job(job_id):
+            return
+
+async def run_newsletter_send_job(job_id):
+    """Stream active subscribers past the checkpoint in _id order, one batch at a time.
+    
+    The checkpoint only advances after a whole batch is recorded, and recipients already
+    sent to are skipped, so a job resumed after a crash never double-sends. A batch in
+    which every delivery fails (mail server down) stops the job without advancing the
+    checkpoint, so resuming it retries those recipients.
+    """
+    try:
+        job = await claim_send_job(job_id)
+        if not job:
+            return
+        newsletter = await db.newsletters.find_one({"id": job["newsletter_id"]})
+        if not newsletter:
+            await db.newsletter_send_jobs.update_one(
+                {"id": job_id}, {"$set": {"status": "failed", "active": False, "last_error": "Newsletter not found"}}
+            )
+            return
+        
+        semaphore = asyncio.Semaphore(NEWSLETTER_SEND_CONCURRENCY)
+        checkpoint = job.get("checkpoint")
+        while True:
+            query = {"is_active": True}
+            if checkpoint is not None:
+                query["_id"] = {"$gt": checkpoint}
+            batch = await db.newsletter_subscribers.find(query, {"_id": 1, "email": 1}).sort("_id", 1).limit(
+                NEWSLETTER_BATCH_SIZE
+            ).to_list(NEWSLETTER_BATCH_SIZE)
+            if not batch:
+                break
+            
+            emails = [subscriber["email"] for subscriber in batch]
+            delivered = {
+                delivery["email"] async for delivery in db.newsletter_deliveries.find(
+                    {"job_id": job_id, "email": {"$in": emails}, "status": "sent"}, {"_id": 0, "email": 1}
+                )
+            }
+            pending = [email for email in emails if email not in delivered]
+            lease_keeper = asyncio.ensure_future(keep_send_job_lease(job_id))
+            try:
+                results = await asyncio.gather(*(
+                    deliver_newsletter(job_id, newsletter, email, semaphore) for email in pending
+                ))
+            finally:
+                lease_keeper.cancel()
+            
+            errors = [error for ok, error in results if not ok]
+            if errors and len(errors) == len(results):
+                await db.newsletter_send_jobs.update_one(
+                    {"id": job_id, "status": "running"},
+                    {"$set": {
+                        "status": "failed",
+                        "active": False,
+                        "last_error": f"Every delivery in a batch failed, last: {errors[-1]}",
+                        "lease_until": None,
+                        "updated_at": datetime.now(timezone.utc).isoformat()
+                    }}
+                )
+                return
+            
+            checkpoint = batch[-1]["_id"]
+            update = {
+                "$set": {"checkpoint": checkpoint, "updated_at": datetime.now(timezone.utc).isoformat()},
+                "$inc": {"sent": len(results) - len(errors), "failed": len(errors), "skipped": len(delivered)}
+            }
+            if errors:
+                update["$set"]["last_error"] = errors[-1]
+            await db.newsletter_send_jobs.update_one({"id": job_id}, update)
+            
+            # Renew the lease; stop if the job was cancelled or taken over
+            if not await claim_send_job(job_id):
+                return
+        
+        await db.newsletter_send_jobs.update_one(
+            {"id": job_id, "status": "running"},
+            {"$set": {
+                "status": "completed",
+                "active": False,
+                "lease_until": None,
+                "completed_at": datetime.now(timezone.utc).isoformat(),
+                "updated_at": datetime.now(timezone.utc).isoformat()
+            }}
+        )
+    except Exception as e:
+        logger.exception(f"Newsletter send job {job_id} stopped")
+        # Resumable from its checkpoint through the resume endpoint
+        await db.newsletter_send_jobs.update_one(
+            {"id": job_id, "status": "running"},
+            {"$set": {
+                "status": "failed", "active": False, "last_error": f"{type(e).__name__}: {e}", "lease_until": None
+            }}
+        )
+    finally:
+        newsletter_send_tasks.pop(job_id, None)
+
+def start_newsletter_send_job(job_id):
+    if job_id not in newsletter_send_tasks:
+        newsletter_send_tasks[job_id] = asyncio.ensure_future(run_newsletter_send_job(job_id))
+
+async def resume_newsletter_send_jobs():
+    """Restart jobs interrupted by a shutdown or crash; the lease keeps workers from doubling up"""
+    if not UNSUBSCRIBE_SECRET:
+        if await db.newsletter_send_jobs.find_one({"status": {"$in": ["pending", "running"]}}, {"_id": 1}):
+            logger.error("UNSUBSCRIBE_SECRET is not set; interrupted newsletter send jobs were not resumed")
+        return
+    async for job in db.newsletter_send_jobs.find({"status": {"$in": ["pending", "running"]}}, {"id": 1}):
+        start_newsletter_send_job(job["id"])
+
+# Sending mails the whole list: admins only
+@api_router.post("/newsletters/{newsletter_id}/send", response_model=NewsletterSendJob)
+async def send_newsletter(newsletter_id: str, user_info: Dict = Depends(admin_session)):
+    require_unsubscribe_secret()
+    newsletter = await db.newsletters.find_one({"id": newsletter_id})
+    if not newsletter:
+        raise HTTPException(status_code=404, detail="Newsletter not found")
+    
+    job_obj = NewsletterSendJob(newsletter_id=newsletter_id)
+    prepared_data = prepare_for_mongo(job_obj.dict())
+    prepared_data["active"] = True
+    try:
+        await db.newsletter_send_jobs.insert_one(prepared_data)
+    except DuplicateKeyError:
+        # one_active_send_job index: a concurrent request got there first
+        active_job = await db.newsletter_send_jobs.find_one({"newsletter_id": newsletter_id, "active": True})
+        raise HTTPException(
+            status_code=400, detail=f"Newsletter is already being sent (job {(active_job or {}).get('id')})"
+        )
+    start_newsletter_send_job(job_obj.id)
+    return job_obj
+
+@api_router.get("/newsletter-send-jobs/{job_id}", response_model=NewsletterSendJob)
+async def get_newsletter_send_job(job_id: str):
+    job = await db.newsletter_send_jobs.find_one({"id": job_id}, {"_id": 0, "checkpoint": 0})
+    if not job:
+        raise HTTPException(status_code=404, detail="Send job not found")
+    return NewsletterSendJob(**parse_from_mongo(job))
+
+@api_router.post("/newsletter-send-jobs/{job_id}/resume", response_model=NewsletterSendJob)
+async def resume_newsletter_send_job(job_id: str, user_info: Dict = Depends(admin_session)):
+    """Restart a cancelled or failed job from its checkpoint"""
+    require_unsubscribe_secret()
+    try:
+        result = await db.newsletter_send_jobs.update_one(
+            {"id": job_id, "status": {"$in": ["cancelled", "failed"]}},
+            {"$set": {
+                "status": "pending", "active": True, "lease_until": None,
+                "updated_at": datetime.now(timezone.utc).isoformat()
+            }}
+        )
+    except DuplicateKeyError:
+        raise HTTPException(status_code=400, detail="Another send of this newsletter is in progress")
+    if not result.matched_count:
+        raise HTTPException(status_code=400, detail="Only cancelled or failed jobs can be resumed")
+    start_newsletter_send_job(job_id)
+    return await get_newsletter_send_job(job_id)
+
+@api_router.post("/newsletter-send-jobs/{job_id}/cancel", response_model=NewsletterSendJob)
+async def cancel_newsletter_send_job(job_id: str, user_info: Dict = Depends(admin_session)):
+    # The runner notices at its next lease renewal, after the current batch
+    result = await db.newsletter_send_jobs.update_one(
+        {"id": job_id, "status": {"$in": ["pending", "running"]}},
+        {"$set": {
+            "status": "cancelled", "active": False, "lease_until": None,
+            "updated_at": datetime.now(timezone.utc).isoformat()
+        }}
+    )
+    if not result.matched_count:
+        raise HTTPException(status_code=400, detail="Job is not pending or running")
+    return await get_newsletter_send_job(job_id)
+
+# Search endpoints
+@api_router.get("/search", response_model=SearchResults)
+async def search(q: str, types: Optional[str] = None, limit: int = 20, skip: int = 0):
+    if limit < 1 or limit > 100:
+        raise HTTPException(status_code=400, detail="limit must be between 1 and 100")
+    if skip < 0:
+        raise HTTPException(status_code=400, detail="skip must be non-negative")
+
+    doc_types = None
+    if types:
+        doc_types = {t.strip() for t in types.split(",") if t.strip()}
+        unknown = doc_types - {"news", "event", "document", "product", "newsletter"}
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown search types: {', '.join(sorted(unknown))}")
+
+    total, total_exact, hits = search_index.search(q, doc_types=doc_types, limit=limit, skip=skip)
+    return SearchResults(
+        query=q,
+        total=total,
+        total_exact=total_exact,
+        limit=limit,
+        skip=skip,
+        results=[SearchHit(**hit) for hit in hits]
+    )
+
 # Contact form endpoints (existing code)
 @api_router.post("/contact")
 async def submit_contact_form(form: ContactFormCreate):
@@ -862,39 +2529,191 @@ async def get_contact_forms():
 # Newsletter subscription endpoints (existing code)
 @api_router.post("/newsletter/subscribe")
 async def subscribe_newsletter(subscriber: NewsletterSubscriberCreate):
-    # Check if already subscribed
-    existing = await db.newsletter_subscribers.find_one({"email": subscriber.email})
-    if existing:
-        return {"message": "Already subscribed to newsletter"}
-    
     subscriber_dict = subscriber.dict()
     subscriber_obj = NewsletterSubscriber(**subscriber_dict)
     prepared_data = prepare_for_mongo(subscriber_obj.dict())
-    await db.newsletter_subscribers.insert_one(prepared_data)
+    try:
+        await db.newsletter_subscribers.insert_one(prepared_data)
+    except DuplicateKeyError:
+        # Unique email index; someone who unsubscribed earlier is signed back up
+        result = await db.newsletter_subscribers.update_one(
+            {"email": subscriber.email, "is_active": False},
+            {"$set": {"is_active": True, "subscribed_at": prepared_data["subscribed_at"], "unsubscribed_at": None}}
+        )
+        if result.modified_count:
+            return {"message": "Successfully subscribed to newsletter"}
+        return {"message": "Already subscribed to newsletter"}
     return {"message": "Successfully subscribed to newsletter", "id": subscriber_obj.id}
 
+async def unsubscribe_with_token(email, token):
+    if not UNSUBSCRIBE_SECRET:
+        logger.error("UNSUBSCRIBE_SECRET is not set; unsubscribe links cannot be verified")
+        raise HTTPException(status_code=503, detail="Unsubscribe is temporarily unavailable")
+    if not hmac.compare_digest(token, unsubscribe_token(email)):
+        raise HTTPException(status_code=403, detail="Invalid unsubscribe link")
+    # Idempotent, so following the link twice is not an error
+    await db.newsletter_subscribers.update_one(
+        {"email": email, "is_active": True},
+        {"$set": {"is_active": False, "unsubscribed_at": datetime.now(timezone.utc).isoformat()}}
+    )
+
+@api_router.get("/newsletter/unsubscribe", response_class=HTMLResponse)
+async def unsubscribe_newsletter_link(email: str, token: str):
+    """Target of the link in every newsletter email"""
+    await unsubscribe_with_token(email, token)
+    return HTMLResponse(
+        "<html><body><h1>You have been unsubscribed</h1>"
+        "<p>You will no longer receive the ICAA newsletter.</p></body></html>"
+    )
+
+@api_router.post("/newsletter/unsubscribe")
+async def unsubscribe_newsletter(email: str, token: str):
+    """One-click unsubscribe (List-Unsubscribe-Post) from mail clients"""
+    await unsubscribe_with_token(email, token)
+    return {"message": "Successfully unsubscribed from newsletter"}
+
 @api_router.get("/newsletter/subscribers", response_model=List[NewsletterSubscriber])
-async def get_newsletter_subscribers():
-    subscribers = await db.newsletter_subscribers.find({"is_active": True}).to_list(1000)
+async def get_newsletter_subscribers(email: Optional[str] = None, limit: int = 1000, skip: int = 0):
+    # Full lists go through the CSV export below
+    query = {"is_active": True}
+    if email:
+        query["email"] = email  # served by the unique email index
+    subscribers = await db.newsletter_subscribers.find(query).sort("_id", 1).skip(skip).limit(limit).to_list(limit)
     return [NewsletterSubscriber(**parse_from_mongo(sub)) for sub in subscribers]
 
+# Bulk subscriber import/export (CSV with an "email" column, or emails in the first column)
+SUBSCRIBER_BATCH_SIZE = 1000
+SUBSCRIBER_IMPORT_MAX_ERRORS = 100
+email_adapter = TypeAdapter(EmailStr)
+
+async def import_subscriber_batch(batch, reactivate, result):
+    """Validate, dedupe against the collection with one $in query, insert the rest unordered"""
+    emails = {}
+    for row_number, raw_email in batch:
+        try:
+            email = email_adapter.validate_python(raw_email)
+        except ValidationError:
+            result["invalid"] += 1
+            if len(result["invalid_rows"]) < SUBSCRIBER_IMPORT_MAX_ERRORS:
+                result["invalid_rows"].append({"row": row_number, "email": raw_email})
+            continue
+        if email in emails:
+            result["already_subscribed"] += 1
+        else:
+            emails[email] = row_number
+    if not emails:
+        return
+    
+    existing = {}
+    async for subscriber in db.newsletter_subscribers.find(
+        {"email": {"$in": list(emails)}}, {"_id": 0, "email": 1, "is_active": 1}
+    ):
+        existing[subscriber["email"]] = subscriber["is_active"]
+    
+    inactive = [email for email, is_active in existing.items() if not is_active]
+    if reactivate and inactive:
+        update = await db.newsletter_subscribers.update_many(
+            {"email": {"$in": inactive}, "is_active": False},
+            {"$set": {"is_active": True, "subscribed_at": datetime.now(timezone.utc).isoformat(), "unsubscribed_at": None}}
+        )
+        result["reactivated"] += update.modified_count
+        result["already_subscribed"] += len(existing) - update.modified_count
+    else:
+        result["already_subscribed"] += len(existing)
+    
+    new_documents = [
+        prepare_for_mongo(NewsletterSubscriber(email=email).dict()) for email in emails if email not in existing
+    ]
+    if not new_documents:
+        return
+    try:
+        await db.newsletter_subscribers.insert_many(new_documents, ordered=False)
+        result["imported"] += len(new_documents)
+    except BulkWriteError as e:
+        # Emails inserted concurrently since the $in check hit the unique index
+        duplicates = sum(1 for error in e.details.get("writeErrors", []) if error["code"] == 11000)
+        if duplicates != len(e.details.get("writeErrors", [])):
+            raise
+        result["imported"] += e.details.get("nInserted", 0)
+        result["already_subscribed"] += duplicates
+
+@api_router.post("/newsletter/subscribers/import", response_model=SubscriberImportResult)
+async def import_newsletter_subscribers(file: UploadFile = File(...), reactivate: bool = False):
+    """Import a subscriber CSV in batches; with reactivate=true, unsubscribed emails are signed back up"""
+    result = {"imported": 0, "already_subscribed": 0, "reactivated": 0, "invalid": 0, "invalid_rows": []}
+    reader = csv.reader(io.TextIOWrapper(file.file, encoding="utf-8-sig", newline=""))
+    
+    header = next(reader, None)
+    column = 0
+    batch = []
+    if header:
+        lowered = [cell.strip().lower() for cell in header]
+        if "email" in lowered:
+            column = lowered.index("email")
+        else:
+            batch.append((1, header[0].strip()))
+    
+    for row_number, row in enumerate(reader, start=2):
+        if not row or not any(cell.strip() for cell in row):
+            continue
+        batch.append((row_number, row[column].strip() if len(row) > column else ""))
+        if len(batch) >= SUBSCRIBER_BATCH_SIZE:
+            await import_subscriber_batch(batch, reactivate, result)
+            batch = []
+    if batch:
+        await import_subscriber_batch(batch, reactivate, result)
+    
+    return SubscriberImportResult(**result)
+
+@api_router.get("/newsletter/subscribers/export")
+async def export_newsletter_subscribers(active_only: bool = True):
+    """Stream subscribers as CSV straight from a cursor, one batch in memory at a time"""
+    query = {"is_active": True} if active_only else {}
+    projection = {"_id": 0, "email": 1, "subscribed_at": 1, "is_active": 1, "unsubscribed_at": 1}
+    
+    async def rows():
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(["email", "subscribed_at", "is_active", "unsubscribed_at"])
+        cursor = db.newsletter_subscribers.find(query, projection).sort("_id", 1).batch_size(SUBSCRIBER_BATCH_SIZE)
+        count = 0
+        async for subscriber in cursor:
+            writer.writerow([
+                subscriber["email"], subscriber.get("subscribed_at", ""),
+                subscriber.get("is_active", True), subscriber.get("unsubscribed_at") or ""
+            ])
+            count += 1
+            if count % SUBSCRIBER_BATCH_SIZE == 0:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+    
+    filename = f"newsletter_subscribers_{datetime.now(timezone.utc).strftime('%Y%m%d')}.csv"
+    return StreamingResponse(
+        rows(), media_type="text/csv", headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
 # Member endpoints (existing code)
 @api_router.post("/members", response_model=Member)
 async def create_member(member: MemberCreate):
-    # Check if member already exists
-    existing = await db.members.find_one({"email": member.email})
-    if existing:
-        raise HTTPException(status_code=400, detail="Member with this email already exists")
-    
     member_dict = member.dict()
     member_obj = Member(**member_dict)
     prepared_data = prepare_for_mongo(member_obj.dict())
-    await db.members.insert_one(prepared_data)
+    try:
+        await db.members.insert_one(prepared_data)
+    except DuplicateKeyError:
+        # Unique email index
+        raise HTTPException(status_code=400, detail="Member with this email already exists")
     return member_obj
 
 @api_router.get("/members", response_model=List[Member])
-async def get_members():
-    members = await db.members.find().to_list(1000)
+async def get_members(email: Optional[str] = None):
+    query = {}
+    if email:
+        query["email"] = email  # served by the unique email index
+    
+    members = await db.members.find(query).to_list(1000)
     return [Member(**parse_from_mongo(member)) for member in members]
 
 @api_router.get("/members/{member_id}", response_model=Member)
@@ -907,19 +2726,20 @@ async def get_member(member_id: str):
 # User Profile endpoints
 @api_router.post("/users", response_model=User)
 async def create_user(user: UserCreate):
-    # Check if user already exists
-    existing = await db.users.find_one({"email": user.email})
-    if existing:
-        raise HTTPException(status_code=400, detail="User with this email already exists")
-    
     user_dict = user.dict()
-    # For now, skip password hashing - will implement proper auth later
-    if 'password' in user_dict:
-        user_dict.pop('password')
+    password = user_dict.pop('password', None)
     
     user_obj = User(**user_dict)
     prepared_data = prepare_for_mongo(user_obj.dict())
-    await db.users.insert_one(prepared_data)
+    prepared_data["name_search"] = user_obj.name.lower()
+    if password:
+        # scrypt is deliberately slow; keep it off the event loop
+        prepared_data["password_hash"] = await asyncio.to_thread(hash_password, password)
+    try:
+        await db.users.insert_one(prepared_data)
+    except DuplicateKeyError:
+        # Unique email index
+        raise HTTPException(status_code=400, detail="User with this email already exists")
     return user_obj
 
 @api_router.get("/users", response_model=List[User])
@@ -927,6 +2747,73 @@ async def get_users():
     users = await db.users.find().to_list(1000)
     return [User(**parse_from_mongo(user)) for user in users]
 
+@api_router.get("/users/directory", response_model=DirectoryResults)
+async def get_user_directory(
+    q: Optional[str] = None,
+    cohort: Optional[str] = None,
+    program_track: Optional[str] = None,
+    interest: Optional[str] = None,
+    verified: Optional[bool] = None,
+    membership_tier: Optional[str] = None,
+    limit: int = 50,
+    skip: int = 0
+):
+    if limit < 1 or limit > 200:
+        raise HTTPException(status_code=400, detail="limit must be between 1 and 200")
+    if skip < 0:
+        raise HTTPException(status_code=400, detail="skip must be non-negative")
+
+    # Filters shared by every facet; cohort/track are applied per facet so each
+    # facet's counts show what selecting a different value would return.
+    base_match = {}
+    if q:
+        base_match["name_search"] = {"$regex": "^" + re.escape(q.strip().lower())}
+    if interest:
+        base_match["interests"] = interest
+    if verified is not None:
+        base_match["is_verified_alumni"] = verified
+    if membership_tier:
+        base_match["membership_tier"] = membership_tier
+
+    cohort_match = {"cohort": cohort} if cohort else {}
+    track_match = {"program_track": program_track} if program_track else {}
+    full_match = {**cohort_match, **track_match}
+
+    results_cursor = db.users.find({**base_match, **full_match}, DIRECTORY_PROJECTION)
+    results_cursor = results_cursor.sort("name_search", 1).skip(skip).limit(limit)
+    facet_pipeline = [
+        {"$match": base_match},
+        {"$facet": {
+            "total": [{"$match": full_match}, {"$count": "count"}],
+            "cohort": [
+                {"$match": track_match},
+                {"$group": {"_id": "$cohort", "count": {"$sum": 1}}}
+            ],
+            "program_track": [
+                {"$match": cohort_match},
+                {"$group": {"_id": "$program_track", "count": {"$sum": 1}}}
+            ]
+        }}
+    ]
+
+    users, facet_result = await asyncio.gather(
+        results_cursor.to_list(limit),
+        db.users.aggregate(facet_pipeline).to_list(1)
+    )
+    facet_result = facet_result[0]
+    total = facet_result["total"][0]["count"] if facet_result["total"] else 0
+    facets = {
+        name: {bucket["_id"]: bucket["count"] for bucket in facet_result[name] if bucket["_id"]}
+        for name in ("cohort", "program_track")
+    }
+    return DirectoryResults(
+        total=total,
+        limit=limit,
+        skip=skip,
+        results=[DirectoryUser(**user) for user in users],
+        facets=facets
+    )
+
 @api_router.get("/users/{user_id}", response_model=User)
 async def get_user(user_id: str):
     user = await db.users.find_one({"id": user_id})
@@ -939,6 +2826,8 @@ async def update_user(user_id: str, user_update: UserUpdate):
     update_data = user_update.dict(exclude_unset=True)
     if update_data:
         update_data["updated_at"] = datetime.now(timezone.utc).isoformat()
+        if update_data.get("name"):
+            update_data["name_search"] = update_data["name"].lower()
         
         result = await db.users.update_one(
             {"id": user_id},
@@ -1003,60 +2892,283 @@ async def upload_profile_photo(user_id: str, file: UploadFile = File(...)):
     
     return {"message": "Profile photo uploaded successfully", "photo_url": photo_url}
 
+# Chat access caches
+class RoomDirectory:
+    """In-process cache of active chat rooms used for access checks.
+
+    Rooms are few and change rarely, so the active set is loaded on startup and
+    kept current by the handlers that create rooms or change participants.
+    Changes made through other workers arrive with a full reload once the
+    snapshot is ttl_seconds old. Participant and admin lists are held as sets
+    so membership checks are O(1).
+    """
+
+    def __init__(self, ttl_seconds=CHAT_ROOM_DIRECTORY_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self.rooms: Dict[str, Dict] = {}
+        self.cohort_rooms: Dict[str, str] = {}
+        self.track_rooms: Dict[str, str] = {}
+        self.participant_rooms: Dict[str, set] = {}
+        self.loaded = False
+        self.loaded_at = 0.0
+        self.reload_lock = asyncio.Lock()
+        self.pending = None  # changes made here while a load is in flight, replayed onto it
+
+    async def load(self):
+        """Load the active rooms into a new snapshot; readers keep the old one until it is complete"""
+        fresh = RoomDirectory(self.ttl_seconds)
+        self.pending = []
+        try:
+            async for room in db.chat_rooms.find({"is_active": True}, {"_id": 0}):
+                fresh.put(room)
+        finally:
+            pending, self.pending = self.pending, None
+        # The cursor may have read a room before a change this worker made to it
+        for action, arg in pending:
+            getattr(fresh, action)(arg)
+        self.rooms, self.cohort_rooms, self.track_rooms, self.participant_rooms = (
+            fresh.rooms, fresh.cohort_rooms, fresh.track_rooms, fresh.participant_rooms
+        )
+        self.loaded = True
+        self.loaded_at = time.monotonic()
+
+    async def ensure_fresh(self):
+        """Reload a snapshot older than ttl_seconds; concurrent callers share one reload"""
+        if not self.loaded or time.monotonic() - self.loaded_at < self.ttl_seconds:
+            return
+        async with self.reload_lock:
+            if time.monotonic() - self.loaded_at >= self.ttl_seconds:
+                await self.load()
+
+    def put(self, room):
+        """Insert or replace a room from its Mongo document"""
+        if self.pending is not None:
+            self.pending.append(("put", room))
+        self.remove(room["id"])
+        if not room.get("is_active", True):
+            return
+        entry = parse_from_mongo(room)
+        entry["participants"] = set(room.get("participants") or [])
+        entry["admins"] = set(room.get("admins") or [])
+        self.rooms[entry["id"]] = entry
+
+        if entry["room_type"] == "cohort" and entry.get("cohort"):
+            self.cohort_rooms[entry["cohort"]] = entry["id"]
+        elif entry["room_type"] == "program_track" and entry.get("program_track"):
+            self.track_rooms[entry["program_track"]] = entry["id"]
+        for user_id in entry["participants"]:
+            self.participant_rooms.setdefault(user_id, set()).add(entry["id"])
+
+    def remove(self, room_id):
+        if self.pending is not None:
+            self.pending.append(("remove", room_id))
+        entry = self.rooms.pop(room_id, None)
+        if entry is None:
+            return
+        if self.cohort_rooms.get(entry.get("cohort")) == room_id:
+            del self.cohort_rooms[entry["cohort"]]
+        if self.track_rooms.get(entry.get("program_track")) == room_id:
+            del self.track_rooms[entry["program_track"]]
+        for user_id in entry["participants"]:
+            user_rooms = self.participant_rooms.get(user_id)
+            if user_rooms is not None:
+                user_rooms.discard(room_id)
+                if not user_rooms:
+                    del self.participant_rooms[user_id]
+
+    async def refresh(self, room_id):
+        """Reload one room after it changed in Mongo; None once it is gone or inactive"""
+        room = await db.chat_rooms.find_one({"id": room_id}, {"_id": 0})
+        if room:
+            self.put(room)
+        else:
+            self.remove(room_id)
+        return self.rooms.get(room_id)
+
+    async def get(self, room_id):
+        """Return the cached room, falling back to Mongo for rooms created by another worker"""
+        await self.ensure_fresh()
+        room = self.rooms.get(room_id)
+        if room is None:
+            doc = await db.chat_rooms.find_one({"id": room_id, "is_active": True}, {"_id": 0})
+            if doc:
+                self.put(doc)
+                room = self.rooms[room_id]
+        return room
+
+    def rooms_for_user(self, user_info):
+        """Cohort room, program track room, then custom rooms the user participates in"""
+        room_ids = []
+        if user_info.get('cohort') in self.cohort_rooms:
+            room_ids.append(self.cohort_rooms[user_info['cohort']])
+        if user_info.get('program_track') in self.track_rooms:
+            room_ids.append(self.track_rooms[user_info['program_track']])
+        for room_id in self.participant_rooms.get(user_info['user_id'], ()):
+            if self.rooms[room_id]["room_type"] == "custom":
+                room_ids.append(room_id)
+        return [self.rooms[room_id] for room_id in room_ids]
+
+    @staticmethod
+    def to_model(room):
+        return ChatRoom(**{**room, "participants": sorted(room["participants"]), "admins": sorted(room["admins"])})
+
+class RoomHistoryCache:
+    """Ring buffer of each room's most recent messages, pre-encoded as JSON.
+
+    Serves the first page of history without a Mongo query or model
+    validation. Only this worker's sends are appended, so an entry is
+    reloaded from Mongo once it is ttl_seconds old. Rooms are evicted
+    least-recently-used once the total encoded size passes max_bytes.
+
+    Each change stamps the room with the next value of a cache-wide clock,
+    and a fill is dropped if the room's stamp moved while it was loading.
+    Stamps of rooms that are no longer cached are pruned; an unstamped room
+    reads as `floor`, which is raised past every pruned stamp so a fill that
+    started before the prune can't match.
+    """
+
+    def __init__(self, per_room=HISTORY_CACHE_MESSAGES, max_bytes=HISTORY_CACHE_MAX_BYTES,
+                 ttl_seconds=HISTORY_CACHE_TTL_SECONDS):
+        self.per_room = per_room
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.rooms: "OrderedDict[str, dict]" = OrderedDict()  # {room_id: {"frames": deque of (seq, json), "complete": bool, "filled_at": float}}
+        self.generations: Dict[str, int] = {}  # room_id -> clock value of its last change
+        self.clock = 0
+        self.floor = 0
+        self.size = 0
+
+    def generation(self, room_id):
+        return self.generations.get(room_id, self.floor)
+
+    def touch(self, room_id):
+        """Stamp a change to the room, invalidating fills already in flight"""
+        self.clock += 1
+        self.generations[room_id] = self.clock
+        # Rooms messaged while uncached leave stamps behind; sweep them once they
+        # outnumber the cached rooms
+        if len(self.generations) > 2 * len(self.rooms) + 1024:
+            self.generations = {room_id: self.generations[room_id] for room_id in self.rooms if room_id in self.generations}
+            self.floor = self.clock
+
+    def get_page(self, room_id, limit):
+        """Encoded JSON array of the newest `limit` messages (oldest first), or None on a miss"""
+        limit = max(1, limit)  # list(frames)[-0:] would be the whole buffer
+        entry = self.rooms.get(room_id)
+        if entry is None:
+            return None
+        if time.monotonic() - entry["filled_at"] > self.ttl_seconds:
+            self.drop(room_id)
+            return None
+        frames = entry["frames"]
+        if limit > len(frames) and not entry["complete"]:
+            return None
+        self.rooms.move_to_end(room_id)
+        page = list(frames)[-limit:] if limit < len(frames) else frames
+        return b"[" + b",".join(frame for _, frame in page) + b"]"
+
+    def fill(self, room_id, frames, complete, generation):
+        """Install a room loaded from Mongo, unless it changed while loading"""
+        if generation != self.generation(room_id):
+            return
+        self.invalidate(room_id)
+        buffer = deque(frames[-self.per_room:])
+        self.rooms[room_id] = {
+            "frames": buffer,
+            "complete": complete and len(frames) <= self.per_room,
+            "filled_at": time.monotonic()
+        }
+        self.size += sum(len(frame) for _, frame in buffer)
+        self.evict()
+
+    def append(self, room_id, seq, frame):
+        self.touch(room_id)
+        entry = self.rooms.get(room_id)
+        if entry is None:
+            return
+        frames = entry["frames"]
+        if len(frames) >= self.per_room:
+            self.size -= len(frames.popleft()[1])
+            entry["complete"] = False
+        # Concurrent sends can persist out of seq order; keep the buffer sorted
+        position = len(frames)
+        while position and frames[position - 1][0] > seq:
+            position -= 1
+        frames.insert(position, (seq, frame))
+        self.size += len(frame)
+        self.rooms.move_to_end(room_id)
+        self.evict()
+
+    def invalidate(self, room_id):
+        self.touch(room_id)
+        self.drop(room_id)
+
+    def drop(self, room_id):
+        entry = self.rooms.pop(room_id, None)
+        if entry is not None:
+            self.size -= sum(len(frame) for _, frame in entry["frames"])
+
+    def evict(self):
+        while self.size > self.max_bytes and self.rooms:
+            room_id, entry = self.rooms.popitem(last=False)
+            self.size -= sum(len(frame) for _, frame in entry["frames"])
+            stamp = self.generations.pop(room_id, None)
+            if stamp is not None:
+                self.floor = max(self.floor, stamp)
+
+def encode_message(message):
+    """JSON bytes for a Message, identical to what the response_model would produce"""
+    return message.model_dump_json().encode()
+
+room_directory = RoomDirectory()
+room_history_cache = RoomHistoryCache()
+
+async def authorize_room_access(user_info, room_id):
+    """Resolve the room from cache and enforce can_access_room for the caller"""
+    room = await room_directory.get(room_id)
+    if not room:
+        raise HTTPException(status_code=404, detail="Room not found")
+
+    if not can_access_room(user_info, room):
+        raise HTTPException(status_code=403, detail="Access denied to this room")
+    return user_info, room
+
+# Chat session endpoints
+@api_router.post("/chat/session", response_model=ChatSessionResponse)
+async def create_chat_session(request: ChatSessionRequest):
+    # Read the user fresh so the token reflects the current verified flag, cohort and track
+    user = await db.users.find_one({"email": request.email}, SESSION_USER_PROJECTION)
+    if not user or not await asyncio.to_thread(verify_password, request.password, user.get("password_hash")):
+        raise HTTPException(status_code=401, detail="Invalid email or password")
+    if not user.get('is_verified_alumni', False):
+        raise HTTPException(status_code=403, detail="Access denied. Verified alumni only.")
+    
+    token, expires_at = issue_session_token(user)
+    return ChatSessionResponse(token=token, expires_at=expires_at, user_id=user["id"])
+
 # Chat Room endpoints
 @api_router.get("/chat-rooms", response_model=List[ChatRoom])
-async def get_user_chat_rooms(user_id: str):
-    user = await db.users.find_one({"id": user_id})
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    
-    if not user.get('is_verified_alumni', False):
+async def get_user_chat_rooms(user_info: Dict = Depends(chat_session)):
+    if not user_info['is_verified_alumni']:
         raise HTTPException(status_code=403, detail="Access denied. Verified alumni only.")
     
-    # Get rooms user can access
-    rooms = []
-    
-    # Cohort room
-    if user.get('cohort'):
-        cohort_room = await db.chat_rooms.find_one({
-            "room_type": "cohort",
-            "cohort": user['cohort'],
-            "is_active": True
-        })
-        if cohort_room:
-            rooms.append(ChatRoom(**parse_from_mongo(cohort_room)))
-    
-    # Program track room  
-    if user.get('program_track'):
-        track_room = await db.chat_rooms.find_one({
-            "room_type": "program_track", 
-            "program_track": user['program_track'],
-            "is_active": True
-        })
-        if track_room:
-            rooms.append(ChatRoom(**parse_from_mongo(track_room)))
-    
-    # Custom rooms where user is participant
-    custom_rooms = await db.chat_rooms.find({
-        "room_type": "custom",
-        "participants": user_id,
-        "is_active": True
-    }).to_list(100)
-    
-    for room in custom_rooms:
-        rooms.append(ChatRoom(**parse_from_mongo(room)))
-    
-    return rooms
+    await room_directory.ensure_fresh()
+    if room_directory.loaded:
+        return [RoomDirectory.to_model(room) for room in room_directory.rooms_for_user(user_info)]
+    
+    # Directory not warmed yet: fetch cohort, track and custom rooms in one query
+    clauses = [{"room_type": "custom", "participants": user_info['user_id']}]
+    if user_info.get('cohort'):
+        clauses.append({"room_type": "cohort", "cohort": user_info['cohort']})
+    if user_info.get('program_track'):
+        clauses.append({"room_type": "program_track", "program_track": user_info['program_track']})
+    
+    rooms = await db.chat_rooms.find({"is_active": True, "$or": clauses}, {"_id": 0}).to_list(100)
+    return [ChatRoom(**parse_from_mongo(room)) for room in rooms]
 
 @api_router.post("/chat-rooms", response_model=ChatRoom)
-async def create_chat_room(room: ChatRoomCreate, creator_id: str):
-    # Verify creator exists and is verified alumni
-    creator = await db.users.find_one({"id": creator_id})
-    if not creator:
-        raise HTTPException(status_code=404, detail="Creator not found")
-    
-    if not creator.get('is_verified_alumni', False):
-        raise HTTPException(status_code=403, detail="Access denied. Verified alumni only.")
+async def create_chat_room(room: ChatRoomCreate, user_info: Dict = Depends(verified_chat_session)):
+    creator_id = user_info['user_id']
     
     # Create room
     room_dict = room.dict()
@@ -1068,55 +3180,185 @@ async def create_chat_room(room: ChatRoomCreate, creator_id: str):
     
     prepared_data = prepare_for_mongo(room_obj.dict())
     await db.chat_rooms.insert_one(prepared_data)
+    room_directory.put(room_obj.dict())
     return room_obj
 
-@api_router.get("/chat-rooms/{room_id}/messages", response_model=List[Message])
-async def get_room_messages(room_id: str, user_id: str, limit: int = 50, skip: int = 0):
-    # Verify user has access to room
-    user = await db.users.find_one({"id": user_id})
-    if not user or not user.get('is_verified_alumni', False):
-        raise HTTPException(status_code=403, detail="Access denied")
+@api_router.post("/chat-rooms/{room_id}/participants", response_model=ChatRoom)
+async def add_room_participants(
+    room_id: str,
+    update: ChatRoomParticipantsUpdate,
+    user_info: Dict = Depends(verified_chat_session)
+):
+    room = await room_directory.get(room_id)
+    if not room:
+        raise HTTPException(status_code=404, detail="Room not found")
+    if user_info['user_id'] not in room["admins"]:
+        raise HTTPException(status_code=403, detail="Only room admins can change participants")
     
-    room = await db.chat_rooms.find_one({"id": room_id, "is_active": True})
+    await db.chat_rooms.update_one(
+        {"id": room_id},
+        {
+            "$addToSet": {"participants": {"$each": update.user_ids}},
+            "$set": {"updated_at": datetime.now(timezone.utc).isoformat()}
+        }
+    )
+    room = await room_directory.refresh(room_id)
+    if not room:
+        raise HTTPException(status_code=404, detail="Room not found")  # deactivated meanwhile
+    return RoomDirectory.to_model(room)
+
+@api_router.delete("/chat-rooms/{room_id}/participants/{participant_id}")
+async def remove_room_participant(
+    room_id: str,
+    participant_id: str,
+    user_info: Dict = Depends(verified_chat_session)
+):
+    room = await room_directory.get(room_id)
     if not room:
         raise HTTPException(status_code=404, detail="Room not found")
+    if user_info['user_id'] not in room["admins"]:
+        raise HTTPException(status_code=403, detail="Only room admins can change participants")
     
-    # Check access
-    user_info = {
-        'user_id': user_id,
-        'cohort': user.get('cohort'),
-        'program_track': user.get('program_track')
-    }
+    await db.chat_rooms.update_one(
+        {"id": room_id},
+        {
+            "$pull": {"participants": participant_id},
+            "$set": {"updated_at": datetime.now(timezone.utc).isoformat()}
+        }
+    )
+    await room_directory.refresh(room_id)
     
-    if not can_access_room(user_info, room):
-        raise HTTPException(status_code=403, detail="Access denied to this room")
+    # Drop the live socket subscription too, otherwise the removed user keeps receiving messages
+    if participant_id in user_sessions:
+        await leave_chat_room(user_sessions[participant_id], room_id)
     
-    # Get messages
-    messages = await db.messages.find({
+    return {"message": "Participant removed successfully"}
+
+@api_router.post("/chat-rooms/{room_id}/moderation/delete")
+async def bulk_delete_room_messages(
+    room_id: str,
+    request: MessageBulkDelete,
+    user_info: Dict = Depends(verified_chat_session)
+):
+    await require_room_admin(user_info, room_id)
+    
+    # Only ids that are live messages in this room go into the update and the patch event
+    live = {"room_id": room_id, "id": {"$in": request.message_ids}, "is_deleted": False}
+    ids = [doc["id"] for doc in await db.messages.find(live, {"_id": 0, "id": 1}).to_list(len(request.message_ids))]
+    if not ids:
+        return {"message": "Messages deleted", "deleted_count": 0}
+    
+    result = await db.messages.update_many(
+        {**live, "id": {"$in": ids}},
+        tombstone_update(user_info['user_id'])
+    )
+    if result.modified_count:
+        room_history_cache.invalidate(room_id)
+        await broadcast_chat_event('message_patch', {
+            'room_id': room_id,
+            'op': 'delete',
+            'ids': ids
+        }, room_id)
+    return {"message": "Messages deleted", "deleted_count": result.modified_count}
+
+@api_router.post("/chat-rooms/{room_id}/moderation/purge-user")
+async def purge_user_messages(
+    room_id: str,
+    request: MessagePurgeUser,
+    user_info: Dict = Depends(verified_chat_session)
+):
+    await require_room_admin(user_info, room_id)
+    
+    # One bulk update; clients drop the sender's messages from the single patch event
+    result = await db.messages.update_many(
+        {"room_id": room_id, "sender_id": request.user_id, "is_deleted": False},
+        tombstone_update(user_info['user_id'])
+    )
+    if result.modified_count:
+        room_history_cache.invalidate(room_id)
+        await broadcast_chat_event('message_patch', {
+            'room_id': room_id,
+            'op': 'purge',
+            'sender_id': request.user_id
+        }, room_id)
+    return {"message": "User messages purged", "deleted_count": result.modified_count}
+
+async def require_room_admin(user_info, room_id):
+    room = await room_directory.get(room_id)
+    if not room:
+        raise HTTPException(status_code=404, detail="Room not found")
+    if user_info['user_id'] not in room["admins"]:
+        raise HTTPException(status_code=403, detail="Only room admins can moderate messages")
+    return room
+
+@api_router.get("/chat-rooms/{room_id}/messages", response_model=List[Message])
+async def get_room_messages(
+    room_id: str,
+    limit: int = 50,
+    skip: int = 0,
+    cursor: Optional[int] = None,
+    user_info: Dict = Depends(verified_chat_session)
+):
+    # Verify user has access to room
+    await authorize_room_access(user_info, room_id)
+    limit = max(1, limit)
+    
+    # The newest page is served straight from the warm cache when possible
+    first_page = skip == 0 and cursor is None
+    if first_page:
+        page = room_history_cache.get_page(room_id, limit)
+        if page is not None:
+            return Response(content=page, media_type="application/json")
+        generation = room_history_cache.generation(room_id)
+    
+    # Get messages, optionally the page ending at a search-hit cursor
+    query = {
         "room_id": room_id,
         "is_deleted": False
-    }).sort("created_at", -1).skip(skip).limit(limit).to_list(limit)
+    }
+    if cursor is not None:
+        query["seq"] = {"$lte": cursor}
+    fetch_limit = max(limit, room_history_cache.per_room) if first_page else limit
+    messages = await db.messages.find(query).sort("seq", -1).skip(skip).limit(fetch_limit).to_list(fetch_limit)
+    
+    # Past the hot window: continue from the archive
+    if len(messages) < fetch_limit:
+        messages += await read_archive_page("room", room_id, db.messages, query, messages, fetch_limit, skip, cursor)
     
     # Reverse to show oldest first
     messages.reverse()
+    models = [Message(**parse_from_mongo(msg)) for msg in messages]
+    
+    if first_page:
+        # Lazily warm the cache on a first-page miss
+        room_history_cache.fill(
+            room_id, [(model.seq, encode_message(model)) for model in models], len(messages) < fetch_limit, generation
+        )
     
-    return [Message(**parse_from_mongo(msg)) for msg in messages]
+    return models[-limit:] if len(models) > limit else models
 
 @api_router.get("/direct-messages", response_model=List[DirectMessage])
-async def get_direct_messages(user_id: str, other_user_id: str, limit: int = 50, skip: int = 0):
-    # Verify user exists and is verified alumni
-    user = await db.users.find_one({"id": user_id})
-    if not user or not user.get('is_verified_alumni', False):
-        raise HTTPException(status_code=403, detail="Access denied")
+async def get_direct_messages(
+    other_user_id: str,
+    limit: int = 50,
+    skip: int = 0,
+    cursor: Optional[int] = None,
+    user_info: Dict = Depends(verified_chat_session)
+):
+    user_id = user_info['user_id']
     
-    # Get direct messages between two users
-    messages = await db.direct_messages.find({
-        "$or": [
-            {"sender_id": user_id, "receiver_id": other_user_id},
-            {"sender_id": other_user_id, "receiver_id": user_id}
-        ],
+    # Get direct messages between two users, newest first by conversation seq
+    query = {
+        "conversation_key": conversation_key(user_id, other_user_id),
         "is_deleted": False
-    }).sort("created_at", -1).skip(skip).limit(limit).to_list(limit)
+    }
+    if cursor is not None:
+        query["seq"] = {"$lte": cursor}
+    messages = await db.direct_messages.find(query).sort("seq", -1).skip(skip).limit(limit).to_list(limit)
+    if len(messages) < limit:
+        messages += await read_archive_page(
+            "dm", query["conversation_key"], db.direct_messages, query, messages, limit, skip, cursor
+        )
     
     # Mark messages as read for the requesting user
     await db.direct_messages.update_many(
@@ -1133,12 +3375,73 @@ async def get_direct_messages(user_id: str, other_user_id: str, limit: int = 50,
     
     return [DirectMessage(**parse_from_mongo(msg)) for msg in messages]
 
+@api_router.get("/chat-rooms/{room_id}/messages/search", response_model=MessageSearchResults)
+async def search_room_messages(
+    room_id: str,
+    q: str,
+    limit: int = 20,
+    context: int = 2,
+    user_info: Dict = Depends(verified_chat_session)
+):
+    # Same access rules as get_room_messages
+    await authorize_room_access(user_info, room_id)
+
+    results = await search_messages(db.messages, {"room_id": room_id}, q, limit, context)
+    return MessageSearchResults(query=q, results=results)
+
+@api_router.get("/direct-messages/search", response_model=MessageSearchResults)
+async def search_direct_messages(
+    other_user_id: str,
+    q: str,
+    limit: int = 20,
+    context: int = 2,
+    user_info: Dict = Depends(verified_chat_session)
+):
+    # Scoped to the caller's own conversation, so participants are the only readers
+    scope = {"conversation_key": conversation_key(user_info['user_id'], other_user_id)}
+    results = await search_messages(db.direct_messages, scope, q, limit, context)
+    return MessageSearchResults(query=q, results=results)
+
+async def search_messages(collection, scope, q, limit, context):
+    """Text-search one room/conversation and attach surrounding messages to each hit"""
+    if limit < 1 or limit > 50:
+        raise HTTPException(status_code=400, detail="limit must be between 1 and 50")
+    if context < 0 or context > 10:
+        raise HTTPException(status_code=400, detail="context must be between 0 and 10")
+    if not q.strip():
+        raise HTTPException(status_code=400, detail="Search query required")
+
+    hits = await collection.find(
+        {**scope, "is_deleted": False, "$text": {"$search": q}},
+        {"_id": 0, "score": {"$meta": "textScore"}}
+    ).sort([("score", {"$meta": "textScore"})]).limit(limit).to_list(limit)
+
+    async def with_context(hit):
+        visible = {**scope, "is_deleted": False}
+        before, after = [], []
+        if context:
+            before, after = await asyncio.gather(
+                collection.find({**visible, "seq": {"$lt": hit["seq"]}}, {"_id": 0})
+                .sort("seq", -1).limit(context).to_list(context),
+                collection.find({**visible, "seq": {"$gt": hit["seq"]}}, {"_id": 0})
+                .sort("seq", 1).limit(context).to_list(context)
+            )
+            before.reverse()
+        score = hit.pop("score")
+        return MessageSearchHit(
+            message=parse_from_mongo(hit),
+            context_before=[parse_from_mongo(msg) for msg in before],
+            context_after=[parse_from_mongo(msg) for msg in after],
+            cursor=hit["seq"],
+            score=score
+        )
+
+    return await asyncio.gather(*(with_context(hit) for hit in hits))
+
 @api_router.get("/direct-messages/conversations", response_model=List[Dict])
-async def get_user_conversations(user_id: str):
+async def get_user_conversations(user_info: Dict = Depends(verified_chat_session)):
     # Get list of users this user has had conversations with
-    user = await db.users.find_one({"id": user_id})
-    if not user or not user.get('is_verified_alumni', False):
-        raise HTTPException(status_code=403, detail="Access denied")
+    user_id = user_info['user_id']
     
     # Aggregate to get unique conversation partners and latest message
     pipeline = [
@@ -1151,6 +3454,8 @@ async def get_user_conversations(user_id: str):
                 "is_deleted": False
             }
         },
+        # latest_message is the whole document; its ObjectId would not serialize
+        {"$project": {"_id": 0}},
         {
             "$addFields": {
                 "other_user_id": {
@@ -1208,11 +3513,8 @@ async def get_user_conversations(user_id: str):
     ]
 
 @api_router.post("/chat-images/upload")
-async def upload_chat_image(user_id: str, file: UploadFile = File(...)):
-    # Verify user exists and is verified alumni
-    user = await db.users.find_one({"id": user_id})
-    if not user or not user.get('is_verified_alumni', False):
-        raise HTTPException(status_code=403, detail="Access denied")
+async def upload_chat_image(file: UploadFile = File(...), user_info: Dict = Depends(verified_chat_session)):
+    user_id = user_info['user_id']
     
     # Validate file type
     allowed_extensions = ['.jpg', '.jpeg', '.png', '.gif', '.webp']
@@ -1236,6 +3538,165 @@ async def upload_chat_image(user_id: str, file: UploadFile = File(...)):
     image_url = f"/uploads/chat_images/{filename}"
     return {"message": "Image uploaded successfully", "image_url": image_url}
 
+# Chat archive (cold storage)
+ARCHIVE_SOURCES = {
+    "room": ("messages", "room_id"),
+    "dm": ("direct_messages", "conversation_key")
+}
+
+def decode_segment(data):
+    return [json.loads(line) for line in zlib.decompress(data).decode().split("\n") if line]
+
+async def write_archive_segment(kind, collection, scope_field, key, messages):
+    """Store one compressed segment, then drop its messages from the hot collection"""
+    scope, month = key
+    raw = "\n".join(json.dumps(msg, separators=(',', ':')) for msg in messages).encode()
+    data = zlib.compress(raw, 6)
+    # Deterministic _id: re-running after a crash between these two writes is harmless
+    await db.message_archive.replace_one(
+        {"_id": f"{kind}:{scope}:{month}:{messages[0]['seq']}"},
+        {
+            "kind": kind,
+            "scope": scope,
+            "month": month,
+            "first_seq": messages[0]["seq"],
+            "last_seq": messages[-1]["seq"],
+            "count": len(messages),
+            "raw_bytes": len(raw),
+            "compressed_bytes": len(data),
+            "data": data,
+            "archived_at": datetime.now(timezone.utc).isoformat()
+        },
+        upsert=True
+    )
+    await collection.delete_many({scope_field: scope, "seq": {"$in": [msg["seq"] for msg in messages]}})
+    if kind == "room":
+        room_history_cache.invalidate(scope)
+    return len(messages)
+
+async def archive_old_messages(older_than_days):
+    """Move messages older than the cutoff into per-scope monthly segments"""
+    cutoff = (datetime.now(timezone.utc) - timedelta(days=older_than_days)).isoformat()
+    summary = {}
+    for kind, (collection_name, scope_field) in ARCHIVE_SOURCES.items():
+        collection = db[collection_name]
+        archived = 0
+        batch, batch_key = [], None
+        cursor = collection.find(
+            {"created_at": {"$lt": cutoff}, "seq": {"$exists": True}}, {"_id": 0}
+        ).sort([(scope_field, 1), ("seq", 1)])
+        async for message in cursor:
+            key = (message[scope_field], message["created_at"][:7])
+            if batch and (key != batch_key or len(batch) >= ARCHIVE_SEGMENT_MAX):
+                archived += await write_archive_segment(kind, collection, scope_field, batch_key, batch)
+                batch = []
+            batch_key = key
+            batch.append(message)
+        if batch:
+            archived += await write_archive_segment(kind, collection, scope_field, batch_key, batch)
+        summary[kind] = archived
+    return summary
+
+async def read_archive(kind, scope, before_seq, skip, limit):
+    """Visible archived messages with seq < before_seq, newest first"""
+    query = {"kind": kind, "scope": scope}
+    if before_seq is not None:
+        query["first_seq"] = {"$lt": before_seq}
+    collected = []
+    async for segment in db.message_archive.find(query, {"data": 1}).sort("last_seq", -1):
+        for message in reversed(decode_segment(segment["data"])):
+            if message.get("is_deleted") or (before_seq is not None and message["seq"] >= before_seq):
+                continue
+            if skip:
+                skip -= 1
+                continue
+            collected.append(message)
+            if len(collected) == limit:
+                return collected
+    return collected
+
+async def read_archive_page(kind, scope, collection, query, hot_messages, limit, skip, cursor):
+    """Fill the rest of a short history page (hot_messages newest first) from the archive"""
+    if hot_messages:
+        before_seq, archive_skip = hot_messages[-1]["seq"], 0
+    else:
+        # Paged past everything hot: skip the hot messages the client already saw
+        hot_count, oldest = await asyncio.gather(
+            collection.count_documents(query),
+            collection.find_one(query, {"_id": 0, "seq": 1}, sort=[("seq", 1)])
+        )
+        before_seq = oldest["seq"] if oldest else (cursor + 1 if cursor is not None else None)
+        archive_skip = max(0, skip - hot_count)
+    return await read_archive(kind, scope, before_seq, archive_skip, limit - len(hot_messages))
+
+async def archive_loop():
+    while True:
+        await asyncio.sleep(ARCHIVE_INTERVAL_HOURS * 3600)
+        try:
+            summary = await archive_old_messages(ARCHIVE_AFTER_DAYS)
+            logger.info(f"Archived chat messages: {summary}")
+        except Exception:
+            logger.exception("Chat archive run failed")
+
+# Archive administration; the scheduled archive_loop needs none of these routes
+@api_router.post("/chat/archive/run")
+async def run_chat_archive(request: ArchiveRunRequest, user_info: Dict = Depends(admin_session)):
+    if request.older_than_days < 1:
+        raise HTTPException(status_code=400, detail="older_than_days must be at least 1")
+    summary = await archive_old_messages(request.older_than_days)
+    return {"message": "Archive run complete", "archived": summary}
+
+@api_router.get("/chat/archive/stats")
+async def get_chat_archive_stats(user_info: Dict = Depends(admin_session)):
+    hot = {}
+    for kind, (collection_name, _) in ARCHIVE_SOURCES.items():
+        stats = await db.command("collStats", collection_name)
+        hot[kind] = {
+            "messages": stats.get("count", 0),
+            "data_bytes": stats.get("size", 0),
+            "storage_bytes": stats.get("storageSize", 0),
+            "index_bytes": stats.get("totalIndexSize", 0)
+        }
+    
+    cold = {kind: {"segments": 0, "messages": 0, "raw_bytes": 0, "compressed_bytes": 0} for kind in ARCHIVE_SOURCES}
+    pipeline = [{"$group": {
+        "_id": "$kind",
+        "segments": {"$sum": 1},
+        "messages": {"$sum": "$count"},
+        "raw_bytes": {"$sum": "$raw_bytes"},
+        "compressed_bytes": {"$sum": "$compressed_bytes"}
+    }}]
+    async for group in db.message_archive.aggregate(pipeline):
+        cold[group.pop("_id")] = group
+    
+    return {"hot": hot, "cold": cold, "archive_after_days": ARCHIVE_AFTER_DAYS}
+
+@api_router.post("/chat/archive/rehydrate")
+async def rehydrate_chat_archive(request: ArchiveRehydrateRequest, user_info: Dict = Depends(admin_session)):
+    if request.kind not in ARCHIVE_SOURCES:
+        raise HTTPException(status_code=400, detail="kind must be 'room' or 'dm'")
+    collection_name, _ = ARCHIVE_SOURCES[request.kind]
+    
+    query = {"kind": request.kind, "scope": request.scope}
+    if request.month:
+        query["month"] = request.month
+    
+    restored = 0
+    async for segment in db.message_archive.find(query, {"data": 1}):
+        messages = decode_segment(segment["data"])
+        try:
+            await db[collection_name].insert_many(messages, ordered=False)
+        except BulkWriteError as e:
+            # Messages already back in the hot collection hit the unique seq index; anything else is real
+            if any(error["code"] != 11000 for error in e.details.get("writeErrors", [])):
+                raise
+        restored += len(messages)
+        await db.message_archive.delete_one({"_id": segment["_id"]})
+    
+    if request.kind == "room":
+        room_history_cache.invalidate(request.scope)
+    return {"message": "Archive rehydrated", "restored": restored}
+
 @api_router.get("/users/{user_id}/online-status")
 async def get_user_online_status(user_id: str):
     status = await db.user_status.find_one({"user_id": user_id})
@@ -1257,15 +3718,232 @@ async def get_user_online_status(user_id: str):
 connected_users = {}  # {session_id: user_info}
 user_sessions = {}    # {user_id: session_id}
 
+class TokenBucketLimiter:
+    """Token buckets keyed by "<scope>:<key>". Each check is O(1); the LRU bounds
+    memory, and an evicted bucket simply starts again full."""
+
+    def __init__(self, maxsize=50000):
+        self.buckets = LRUCache(maxsize=maxsize)  # key -> [tokens, last_refill]
+
+    def allow(self, key, rate, burst):
+        """Take one token. Returns (allowed, seconds until a token is available)."""
+        now = time.monotonic()
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = self.buckets[key] = [float(burst), now]
+        else:
+            bucket[0] = min(burst, bucket[0] + (now - bucket[1]) * rate)
+            bucket[1] = now
+        if bucket[0] >= 1:
+            bucket[0] -= 1
+            return True, 0.0
+        return False, (1 - bucket[0]) / rate
+
+    def forget(self, key):
+        self.buckets.pop(key, None)
+
+chat_rate_limiter = TokenBucketLimiter()
+chat_throttle_counts = Counter()  # {"<event>:<scope>": dropped events}
+
+async def allow_chat_event(sid, event, user_id, room_key, room_type):
+    """Apply the per-sid, per-user and per-room buckets; report and drop over-limit events"""
+    room_rate, room_burst = CHAT_ROOM_RATE_LIMITS.get(room_type, CHAT_ROOM_RATE_LIMITS["custom"])
+    checks = (
+        ("sid", sid, *CHAT_RATE_LIMITS["sid"]),
+        ("user", user_id, *CHAT_RATE_LIMITS["user"]),
+        ("room", room_key, room_rate, room_burst)
+    )
+    for scope, key, rate, burst in checks:
+        allowed, retry_after = chat_rate_limiter.allow(f"{scope}:{key}", rate, burst)
+        if not allowed:
+            chat_throttle_counts[f"{event}:{scope}"] += 1
+            await sio.emit('rate_limited', {
+                'event': event,
+                'scope': scope,
+                'retry_after': round(retry_after, 3)
+            }, to=sid)
+            return False
+    return True
+
+class EphemeralHub:
+    """Typing, seen and presence signals. Held only in memory (never written to
+    Mongo) and fanned out by a background flush in at most one emit per room per
+    tick, so bursts of keystrokes never compete with new_message delivery.
+    """
+
+    FLUSH_INTERVAL = 0.5  # seconds between coalesced broadcasts
+    TYPING_TTL = 6.0  # typing expires if the client never sends a stop
+    PRESENCE_AWAY_AFTER = 90.0  # seconds without a heartbeat before a user shows as away
+    MAX_TYPERS_PER_ROOM = 20
+
+    def __init__(self):
+        self.typing: Dict[str, Dict[str, tuple]] = {}  # {room_id: {user_id: (user_name, expires_at)}}
+        self.dirty_typing = set()
+        self.seen: Dict[str, Dict[str, str]] = {}  # {room_id: {user_id: message_id}} pending flush
+        self.presence: Dict[str, tuple] = {}  # {user_id: (status, last_heartbeat)}
+        self.presence_changes: Dict[str, str] = {}  # {user_id: status} pending flush
+
+    def set_typing(self, room_id, user_id, user_name, is_typing):
+        typers = self.typing.get(room_id)
+        if is_typing:
+            expires_at = time.monotonic() + self.TYPING_TTL
+            if typers is None:
+                typers = self.typing[room_id] = {}
+            if user_id in typers:
+                # Already typing: extend the TTL without another broadcast (debounce)
+                typers[user_id] = (user_name, expires_at)
+                return
+            if len(typers) >= self.MAX_TYPERS_PER_ROOM:
+                return
+            typers[user_id] = (user_name, expires_at)
+            self.dirty_typing.add(room_id)
+        elif typers and typers.pop(user_id, None):
+            self.dirty_typing.add(room_id)
+            if not typers:
+                del self.typing[room_id]
+
+    def mark_seen(self, room_id, user_id, message_id):
+        # Only the latest message per user survives until the next flush
+        self.seen.setdefault(room_id, {})[user_id] = message_id
+
+    def heartbeat(self, user_id, status):
+        previous = self.presence.get(user_id)
+        self.presence[user_id] = (status, time.monotonic())
+        if previous is None or previous[0] != status:
+            self.presence_changes[user_id] = status
+
+    def forget_user(self, user_id):
+        for room_id in list(self.typing):
+            self.set_typing(room_id, user_id, None, False)
+        if self.presence.pop(user_id, None):
+            self.presence_changes[user_id] = "offline"
+
+    def expire(self, now):
+        for room_id, typers in list(self.typing.items()):
+            for user_id, (_, expires_at) in list(typers.items()):
+                if expires_at <= now:
+                    self.set_typing(room_id, user_id, None, False)
+        for user_id, (status, last_heartbeat) in self.presence.items():
+            if status == "online" and now - last_heartbeat > self.PRESENCE_AWAY_AFTER:
+                self.presence[user_id] = ("away", last_heartbeat)
+                self.presence_changes[user_id] = "away"
+
+    async def flush(self):
+        self.expire(time.monotonic())
+
+        dirty, self.dirty_typing = self.dirty_typing, set()
+        for room_id in dirty:
+            typers = self.typing.get(room_id, {})
+            await sio.emit('typing_update', {
+                'room_id': room_id,
+                'users': [{'user_id': user_id, 'user_name': name} for user_id, (name, _) in typers.items()]
+            }, room=room_id)
+
+        seen, self.seen = self.seen, {}
+        for room_id, users in seen.items():
+            await sio.emit('seen_update', {'room_id': room_id, 'seen': users}, room=room_id)
+
+        if self.presence_changes:
+            changes, self.presence_changes = self.presence_changes, {}
+            await sio.emit('presence_update', {'statuses': changes})
+
+ephemeral_hub = EphemeralHub()
+
+async def ephemeral_flush_loop():
+    while True:
+        await sio.sleep(EphemeralHub.FLUSH_INTERVAL)
+        try:
+            await ephemeral_hub.flush()
+        except Exception:
+            logger.exception("Ephemeral event flush failed")
+
+# Compact wire format (see wire_format.py), negotiated per connection.
+# Clients that don't opt in keep receiving JSON.
+COMPACT_ROOM_SUFFIX = "#compact"
+compact_sids = set()
+compact_room_members: Dict[str, set] = {}  # {room_id: {sid}} for compact clients only
+
+def negotiate_wire_format(sid, requested):
+    if requested == "msgpack" and msgpack is not None:
+        compact_sids.add(sid)
+        return "msgpack"
+    return "json"
+
+def forget_compact_sid(sid):
+    if sid not in compact_sids:
+        return
+    compact_sids.discard(sid)
+    for room_id in list(compact_room_members):
+        members = compact_room_members[room_id]
+        members.discard(sid)
+        if not members:
+            del compact_room_members[room_id]
+
+async def enter_chat_room(sid, room_id):
+    await sio.enter_room(sid, room_id)
+    if sid in compact_sids:
+        await sio.enter_room(sid, room_id + COMPACT_ROOM_SUFFIX)
+        compact_room_members.setdefault(room_id, set()).add(sid)
+
+async def leave_chat_room(sid, room_id):
+    await sio.leave_room(sid, room_id)
+    if sid in compact_sids:
+        await sio.leave_room(sid, room_id + COMPACT_ROOM_SUFFIX)
+        members = compact_room_members.get(room_id)
+        if members:
+            members.discard(sid)
+
+async def broadcast_chat_event(event, payload, room_id):
+    """Emit to a room, packing once for compact members and sending JSON to the rest"""
+    members = compact_room_members.get(room_id)
+    if not members:
+        await sio.emit(event, payload, room=room_id)
+        return
+    await sio.emit(event, encode_compact(payload), room=room_id + COMPACT_ROOM_SUFFIX)
+    await sio.emit(event, payload, room=room_id, skip_sid=list(members))
+
+async def emit_chat_event(event, payload, sid):
+    await sio.emit(event, encode_compact(payload) if sid in compact_sids else payload, to=sid)
+
+@api_router.get("/chat/throttle-stats")
+async def get_chat_throttle_stats():
+    return {
+        "throttled": dict(chat_throttle_counts),
+        "limits": {"sid": CHAT_RATE_LIMITS["sid"], "user": CHAT_RATE_LIMITS["user"], "room": CHAT_ROOM_RATE_LIMITS}
+    }
+
 @sio.event
-async def connect(sid, environ):
-    print(f"Client {sid} connected")
-    await sio.emit('connected', {'status': 'Connected to ICAA Chat'}, to=sid)
+@instrumented('connect')
+async def connect(sid, environ, auth=None):
+    # Clients holding a session token are authenticated here, without a DB lookup.
+    # Chat events need it: join_user no longer accepts a client-supplied user_id
+    token = (auth or {}).get('token')
+    if token:
+        user_info = decode_session_token(token)
+        if not user_info or not user_info['is_verified_alumni']:
+            raise socketio.exceptions.ConnectionRefusedError('Invalid or expired session token')
+        connected_users[sid] = user_info
+        user_sessions[user_info['user_id']] = sid
+    
+    wire_format = negotiate_wire_format(sid, (auth or {}).get('wire_format'))
+    
+    logger.info("Client connected", extra={
+        "event": "sio.connect", "sid": sid, "user_id": connected_users.get(sid, {}).get('user_id')
+    })
+    await sio.emit('connected', {'status': 'Connected to ICAA Chat', 'wire_format': wire_format}, to=sid)
 
 @sio.event
-async def disconnect(sid):
-    print(f"Client {sid} disconnected")
+@instrumented('disconnect')
+async def disconnect(sid, reason=None):
+    # python-socketio 5.12+ passes the reason; accepting it avoids the one-argument
+    # retry, which would run (and be counted by @instrumented) twice
+    logger.info("Client disconnected", extra={
+        "event": "sio.disconnect", "sid": sid, "reason": reason,
+        "user_id": connected_users.get(sid, {}).get('user_id')
+    })
     # Remove user from connected users and update status
+    chat_rate_limiter.forget(f"sid:{sid}")
+    forget_compact_sid(sid)
     if sid in connected_users:
         user_info = connected_users[sid]
         user_id = user_info['user_id']
@@ -1281,35 +3959,33 @@ async def disconnect(sid):
             upsert=True
         )
         
+        ephemeral_hub.forget_user(user_id)
+        
         # Clean up tracking dictionaries
         del connected_users[sid]
         if user_id in user_sessions:
             del user_sessions[user_id]
 
 @sio.event
+@instrumented('join_user')
 async def join_user(sid, data):
-    user_id = data.get('user_id')
-    user_name = data.get('user_name')
+    data = data or {}
     
-    if not user_id:
-        await sio.emit('error', {'message': 'User ID required'}, to=sid)
+    # Identity comes only from the session token checked at connect time
+    user = connected_users.get(sid)
+    if not user:
+        await sio.emit('error', {'message': 'Session token required'}, to=sid)
         return
-    
-    # Verify user exists and is verified alumni
-    user = await db.users.find_one({"id": user_id})
-    if not user or not user.get('is_verified_alumni', False):
-        await sio.emit('error', {'message': 'Access denied. Verified alumni only.'}, to=sid)
+    if data.get('user_id') and data['user_id'] != user['user_id']:
+        await sio.emit('error', {'message': 'User ID does not match session'}, to=sid)
         return
     
-    # Store user connection info
-    connected_users[sid] = {
-        'user_id': user_id,
-        'user_name': user_name or user['name'],
-        'cohort': user.get('cohort'),
-        'program_track': user.get('program_track')
-    }
+    user_id = user['user_id']
     user_sessions[user_id] = sid
     
+    if data.get('wire_format'):
+        negotiate_wire_format(sid, data['wire_format'])
+    
     # Update user status to online
     await db.user_status.update_one(
         {"user_id": user_id},
@@ -1326,10 +4002,16 @@ async def join_user(sid, data):
     await sio.emit('user_joined', {
         'user_id': user_id,
         'user_name': connected_users[sid]['user_name'],
-        'status': 'online'
+        'status': 'online',
+        'wire_format': "msgpack" if sid in compact_sids else "json"
     }, to=sid)
+    
+    # Reconnecting clients send their last-seen positions and get only what they missed
+    if isinstance(data.get('sync'), dict):
+        await send_sync_batch(sid, connected_users[sid], data['sync'])
 
 @sio.event
+@instrumented('join_room')
 async def join_room(sid, data):
     room_id = data.get('room_id')
     if not room_id:
@@ -1342,7 +4024,7 @@ async def join_room(sid, data):
         return
     
     # Verify room exists and user has access
-    room = await db.chat_rooms.find_one({"id": room_id, "is_active": True})
+    room = await room_directory.get(room_id)
     if not room:
         await sio.emit('error', {'message': 'Room not found'}, to=sid)
         return
@@ -1352,7 +4034,7 @@ async def join_room(sid, data):
         await sio.emit('error', {'message': 'Access denied to this room'}, to=sid)
         return
     
-    await sio.enter_room(sid, room_id)
+    await enter_chat_room(sid, room_id)
     
     # Update user's current room
     await db.user_status.update_one(
@@ -1364,6 +4046,7 @@ async def join_room(sid, data):
     await sio.emit('joined_room', {'room_id': room_id, 'room_name': room['name']}, to=sid)
 
 @sio.event
+@instrumented('send_message')
 async def send_message(sid, data):
     user_info = connected_users.get(sid)
     if not user_info:
@@ -1378,6 +4061,11 @@ async def send_message(sid, data):
         await sio.emit('error', {'message': 'Room ID and content required'}, to=sid)
         return
     
+    room = room_directory.rooms.get(room_id)
+    room_type = room['room_type'] if room else "custom"
+    if not await allow_chat_event(sid, 'send_message', user_info['user_id'], room_id, room_type):
+        return
+    
     # Create message
     message = Message(
         room_id=room_id,
@@ -1387,29 +4075,126 @@ async def send_message(sid, data):
         content=content,
         image_url=data.get('image_url'),
         file_url=data.get('file_url'),
-        reply_to=data.get('reply_to')
+        reply_to=data.get('reply_to'),
+        seq=await next_sequence(f"room:{room_id}")
     )
     
     # Save to database
     prepared_data = prepare_for_mongo(message.dict())
     await db.messages.insert_one(prepared_data)
+    room_history_cache.append(room_id, message.seq, encode_message(message))
     
     # Emit to all users in the room
-    message_data = {
-        'id': message.id,
+    message_data = message_event_payload(prepared_data)
+    
+    await broadcast_chat_event('new_message', message_data, room_id)
+    
+    # Sending a message implicitly ends the sender's typing indicator
+    ephemeral_hub.set_typing(room_id, user_info['user_id'], user_info['user_name'], False)
+
+@sio.event
+@instrumented('edit_message')
+async def edit_message(sid, data):
+    user_info = connected_users.get(sid)
+    if not user_info:
+        await sio.emit('error', {'message': 'User not authenticated'}, to=sid)
+        return
+    
+    room_id = data.get('room_id')
+    message_id = data.get('message_id')
+    content = data.get('content', '').strip()
+    if not room_id or not message_id or not content:
+        await sio.emit('error', {'message': 'Room ID, message ID and content required'}, to=sid)
+        return
+    
+    room = room_directory.rooms.get(room_id)
+    if not await allow_chat_event(sid, 'edit_message', user_info['user_id'], room_id, room['room_type'] if room else "custom"):
+        return
+    
+    # Only the sender may edit; the filter enforces it in the same round trip
+    updated_at = datetime.now(timezone.utc).isoformat()
+    result = await db.messages.update_one(
+        {"id": message_id, "room_id": room_id, "sender_id": user_info['user_id'], "is_deleted": False},
+        {"$set": {"content": content, "is_edited": True, "updated_at": updated_at}}
+    )
+    if result.matched_count == 0:
+        await sio.emit('error', {'message': 'Message not found or not editable'}, to=sid)
+        return
+    
+    room_history_cache.invalidate(room_id)
+    await broadcast_chat_event('message_patch', {
         'room_id': room_id,
-        'sender_id': user_info['user_id'],
-        'sender_name': user_info['user_name'],
+        'op': 'edit',
+        'id': message_id,
         'content': content,
-        'message_type': message_type,
-        'image_url': message.image_url,
-        'created_at': message.created_at.isoformat(),
-        'reply_to': message.reply_to
-    }
+        'updated_at': updated_at
+    }, room_id)
+
+@sio.event
+@instrumented('delete_message')
+async def delete_message(sid, data):
+    user_info = connected_users.get(sid)
+    if not user_info:
+        await sio.emit('error', {'message': 'User not authenticated'}, to=sid)
+        return
+    
+    room_id = data.get('room_id')
+    message_id = data.get('message_id')
+    if not room_id or not message_id:
+        await sio.emit('error', {'message': 'Room ID and message ID required'}, to=sid)
+        return
+    
+    # Senders delete their own messages; room admins can delete any
+    query = {"id": message_id, "room_id": room_id, "is_deleted": False}
+    room = await room_directory.get(room_id)
+    if not room or user_info['user_id'] not in room["admins"]:
+        query["sender_id"] = user_info['user_id']
+    
+    result = await db.messages.update_one(query, tombstone_update(user_info['user_id']))
+    if result.matched_count == 0:
+        await sio.emit('error', {'message': 'Message not found or not deletable'}, to=sid)
+        return
     
-    await sio.emit('new_message', message_data, room=room_id)
+    room_history_cache.invalidate(room_id)
+    await broadcast_chat_event('message_patch', {
+        'room_id': room_id,
+        'op': 'delete',
+        'ids': [message_id]
+    }, room_id)
+
+# Ephemeral events: in-memory only, ignored unless the socket has joined the room
+@sio.on('typing')
+@instrumented('typing')
+async def typing_event(sid, data):
+    user_info = connected_users.get(sid)
+    data = data or {}
+    room_id = data.get('room_id')
+    if not user_info or not room_id or room_id not in sio.rooms(sid):
+        return
+    ephemeral_hub.set_typing(room_id, user_info['user_id'], user_info['user_name'], bool(data.get('typing', True)))
+
+@sio.on('seen')
+@instrumented('seen')
+async def seen_event(sid, data):
+    user_info = connected_users.get(sid)
+    data = data or {}
+    room_id = data.get('room_id')
+    message_id = data.get('message_id')
+    if not user_info or not room_id or not message_id or room_id not in sio.rooms(sid):
+        return
+    ephemeral_hub.mark_seen(room_id, user_info['user_id'], message_id)
+
+@sio.event
+@instrumented('presence_heartbeat')
+async def presence_heartbeat(sid, data):
+    user_info = connected_users.get(sid)
+    status = (data or {}).get('status', 'online')
+    if not user_info or status not in ("online", "away"):
+        return
+    ephemeral_hub.heartbeat(user_info['user_id'], status)
 
 @sio.event
+@instrumented('send_direct_message')
 async def send_direct_message(sid, data):
     user_info = connected_users.get(sid)
     if not user_info:
@@ -1424,6 +4209,10 @@ async def send_direct_message(sid, data):
         await sio.emit('error', {'message': 'Receiver ID and content required'}, to=sid)
         return
     
+    dm_key = conversation_key(user_info['user_id'], receiver_id)
+    if not await allow_chat_event(sid, 'send_direct_message', user_info['user_id'], dm_key, "direct"):
+        return
+    
     # Get receiver info
     receiver = await db.users.find_one({"id": receiver_id})
     if not receiver:
@@ -1439,11 +4228,13 @@ async def send_direct_message(sid, data):
         message_type=message_type,
         content=content,
         image_url=data.get('image_url'),
-        file_url=data.get('file_url')
+        file_url=data.get('file_url'),
+        seq=await next_sequence(f"dm:{dm_key}")
     )
     
     # Save to database
     prepared_data = prepare_for_mongo(dm.dict())
+    prepared_data["conversation_key"] = dm_key
     await db.direct_messages.insert_one(prepared_data)
     
     # Send to both users if they're online
@@ -1456,16 +4247,89 @@ async def send_direct_message(sid, data):
         'content': content,
         'message_type': message_type,
         'image_url': dm.image_url,
+        'seq': dm.seq,
         'created_at': dm.created_at.isoformat()
     }
     
+    # Log for the receiver first, so a reconnect sync can replay it if the emit is missed
+    delivery_seq = await append_delivery_log(receiver_id, dm_data)
+    
     # Send to sender
-    await sio.emit('new_direct_message', dm_data, to=sid)
+    await emit_chat_event('new_direct_message', dm_data, sid)
     
     # Send to receiver if online
     if receiver_id in user_sessions:
         receiver_sid = user_sessions[receiver_id]
-        await sio.emit('new_direct_message', dm_data, to=receiver_sid)
+        await emit_chat_event('new_direct_message', dict(dm_data, delivery_seq=delivery_seq), receiver_sid)
+
+def message_event_payload(message):
+    """new_message payload from a stored room message document"""
+    return {
+        'id': message['id'],
+        'room_id': message['room_id'],
+        'sender_id': message['sender_id'],
+        'sender_name': message['sender_name'],
+        'content': message['content'],
+        'message_type': message.get('message_type', 'text'),
+        'image_url': message.get('image_url'),
+        'created_at': message['created_at'],
+        'reply_to': message.get('reply_to'),
+        'seq': message.get('seq')
+    }
+
+async def append_delivery_log(user_id, payload):
+    """Append a DM to the receiver's delivery log under the next per-user sequence number"""
+    seq = await next_sequence(f"delivery:{user_id}")
+    await db.delivery_log.insert_one({
+        "user_id": user_id,
+        "seq": seq,
+        "payload": payload,
+        "created_at": datetime.now(timezone.utc)
+    })
+    return seq
+
+async def send_sync_batch(sid, user_info, sync):
+    """Push everything missed since the client's last-seen positions in one `sync` event.
+
+    `sync` is {"seq": last delivery_seq seen, "rooms": {room_id: last room seq seen}}.
+    Rooms the user can't access are skipped. A key listed in `truncated` had more
+    than SYNC_MAX_MESSAGES missed messages; the client pages history for the rest.
+    """
+    user_id = user_info['user_id']
+    # Client input: malformed positions count as "nothing seen" rather than failing the join
+    last_seq = sync.get('seq') if isinstance(sync.get('seq'), int) else 0
+    rooms = sync.get('rooms') if isinstance(sync.get('rooms'), dict) else {}
+    fetch = SYNC_MAX_MESSAGES + 1
+    
+    queries = {
+        "dm": db.delivery_log.find(
+            {"user_id": user_id, "seq": {"$gt": last_seq}},
+            {"_id": 0, "seq": 1, "payload": 1}
+        ).sort("seq", 1).limit(fetch).to_list(fetch)
+    }
+    await room_directory.ensure_fresh()
+    for room_id, cursor in rooms.items():
+        room = room_directory.rooms.get(room_id)
+        if not room or not isinstance(cursor, int) or not can_access_room(user_info, room):
+            continue
+        queries[room_id] = db.messages.find(
+            {"room_id": room_id, "is_deleted": False, "seq": {"$gt": cursor}},
+            {"_id": 0}
+        ).sort("seq", 1).limit(fetch).to_list(fetch)
+    
+    results = dict(zip(queries, await asyncio.gather(*queries.values())))
+    truncated = [key for key, docs in results.items() if len(docs) > SYNC_MAX_MESSAGES]
+    
+    dm_entries = results.pop("dm")[:SYNC_MAX_MESSAGES]
+    await sio.emit('sync', {
+        'seq': dm_entries[-1]["seq"] if dm_entries else last_seq,
+        'direct_messages': [dict(entry["payload"], delivery_seq=entry["seq"]) for entry in dm_entries],
+        'rooms': {
+            room_id: [message_event_payload(msg) for msg in docs[:SYNC_MAX_MESSAGES]]
+            for room_id, docs in results.items()
+        },
+        'truncated': truncated
+    }, to=sid)
 
 async def auto_join_default_rooms(sid, user):
     """Auto-join user to cohort and program track rooms"""
@@ -1475,58 +4339,80 @@ async def auto_join_default_rooms(sid, user):
     # Join cohort room
     if cohort:
         cohort_room = await get_or_create_cohort_room(cohort)
-        await sio.enter_room(sid, cohort_room['id'])
+        await enter_chat_room(sid, cohort_room['id'])
     
     # Join program track room
     if program_track:
         track_room = await get_or_create_program_track_room(program_track)
-        await sio.enter_room(sid, track_room['id'])
+        await enter_chat_room(sid, track_room['id'])
+
+# In-flight room resolutions, keyed by ("cohort", value) / ("program_track", value)
+room_resolution_flights: Dict[tuple, asyncio.Task] = {}
+
+async def single_flight(key, factory):
+    """Run factory() at most once per key at a time; concurrent callers share its result"""
+    task = room_resolution_flights.get(key)
+    if task is None:
+        task = asyncio.ensure_future(factory())
+        room_resolution_flights[key] = task
+        task.add_done_callback(lambda _: room_resolution_flights.pop(key, None))
+    # Shield so one caller disconnecting doesn't cancel the lookup for everyone else
+    return await asyncio.shield(task)
+
+async def upsert_default_room(new_room, key):
+    """Fetch or atomically insert a cohort/program track room.
+
+    The unique partial indexes on (room_type, cohort) and (room_type,
+    program_track) make concurrent upserts from other workers converge on one
+    document; the loser of that race re-reads the winner's room.
+    """
+    query = {"room_type": new_room.room_type, **key, "is_active": True}
+    on_insert = {k: v for k, v in prepare_for_mongo(new_room.dict()).items() if k not in query}
+    try:
+        room = await db.chat_rooms.find_one_and_update(
+            query,
+            {"$setOnInsert": on_insert},
+            projection={"_id": 0},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+    except DuplicateKeyError:
+        room = await db.chat_rooms.find_one(query, {"_id": 0})
+    room_directory.put(room)
+    return room_directory.rooms[room["id"]]
 
 async def get_or_create_cohort_room(cohort):
     """Get or create a room for a specific cohort"""
-    room = await db.chat_rooms.find_one({
-        "room_type": "cohort",
-        "cohort": cohort,
-        "is_active": True
-    })
+    room_id = room_directory.cohort_rooms.get(cohort)
+    if room_id:
+        return room_directory.rooms[room_id]
     
-    if not room:
-        # Create new cohort room
-        new_room = ChatRoom(
-            name=f"Cohort {cohort}",
-            description=f"Chat room for {cohort} cohort alumni",
-            room_type="cohort",
-            cohort=cohort,
-            created_by="system"
-        )
-        prepared_data = prepare_for_mongo(new_room.dict())
-        await db.chat_rooms.insert_one(prepared_data)
-        room = new_room.dict()
-    
-    return room
+    new_room = ChatRoom(
+        name=f"Cohort {cohort}",
+        description=f"Chat room for {cohort} cohort alumni",
+        room_type="cohort",
+        cohort=cohort,
+        created_by="system"
+    )
+    return await single_flight(("cohort", cohort), lambda: upsert_default_room(new_room, {"cohort": cohort}))
 
 async def get_or_create_program_track_room(program_track):
     """Get or create a room for a specific program track"""
-    room = await db.chat_rooms.find_one({
-        "room_type": "program_track",
-        "program_track": program_track,
-        "is_active": True
-    })
+    room_id = room_directory.track_rooms.get(program_track)
+    if room_id:
+        return room_directory.rooms[room_id]
     
-    if not room:
-        # Create new program track room
-        new_room = ChatRoom(
-            name=f"{program_track} Alumni",
-            description=f"Chat room for {program_track} program alumni",
-            room_type="program_track",
-            program_track=program_track,
-            created_by="system"
-        )
-        prepared_data = prepare_for_mongo(new_room.dict())
-        await db.chat_rooms.insert_one(prepared_data)
-        room = new_room.dict()
-    
-    return room
+    new_room = ChatRoom(
+        name=f"{program_track} Alumni",
+        description=f"Chat room for {program_track} program alumni",
+        room_type="program_track",
+        program_track=program_track,
+        created_by="system"
+    )
+    return await single_flight(
+        ("program_track", program_track),
+        lambda: upsert_default_room(new_room, {"program_track": program_track})
+    )
 
 def can_access_room(user_info, room):
     """Check if user can access a specific room"""
@@ -1578,7 +4464,10 @@ async def create_checkout_session(request: CheckoutRequest, http_request: Reques
         member_dict = member_create.dict()
         member_obj = Member(**member_dict, payment_status="active")
         prepared_data = prepare_for_mongo(member_obj.dict())
-        await db.members.insert_one(prepared_data)
+        try:
+            await db.members.insert_one(prepared_data)
+        except DuplicateKeyError:
+            raise HTTPException(status_code=400, detail="Member with this email already exists")
         return {"message": "Free membership created successfully", "member_id": member_obj.id}
     
     # Create Stripe checkout session for paid memberships
@@ -1643,18 +4532,20 @@ async def get_checkout_status(session_id: str):
             )
             
             # Create member if payment successful and not already created
+            # (concurrent status polls race here; the unique email index settles it)
             if status.payment_status == "paid":
-                existing_member = await db.members.find_one({"email": transaction["user_email"]})
-                if not existing_member:
-                    member_create = MemberCreate(
-                        name=status.metadata.get("user_name", "Unknown"),
-                        email=transaction["user_email"],
-                        membership_tier=transaction["membership_tier"]
-                    )
-                    member_dict = member_create.dict()
-                    member_obj = Member(**member_dict, payment_status="active")
-                    prepared_data = prepare_for_mongo(member_obj.dict())
+                member_create = MemberCreate(
+                    name=status.metadata.get("user_name", "Unknown"),
+                    email=transaction["user_email"],
+                    membership_tier=transaction["membership_tier"]
+                )
+                member_dict = member_create.dict()
+                member_obj = Member(**member_dict, payment_status="active")
+                prepared_data = prepare_for_mongo(member_obj.dict())
+                try:
                     await db.members.insert_one(prepared_data)
+                except DuplicateKeyError:
+                    pass
         
         return {
             "status": status.status,
@@ -1691,9 +4582,30 @@ async def stripe_webhook(request: Request):
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Webhook error: {str(e)}")
 
+@fastapi_app.get("/metrics")
+async def get_metrics():
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    return Response(content="\n".join(lines) + "\n", media_type="text/plain; version=0.0.4")
+
+# Query shapes reveal the schema and access patterns: admins only
+@api_router.get("/debug/slow-queries")
+async def get_slow_queries(limit: int = 20, sort: str = "total_ms", user_info: Dict = Depends(admin_session)):
+    if sort not in ("total_ms", "max_ms", "count", "examined"):
+        raise HTTPException(status_code=400, detail="sort must be one of total_ms, max_ms, count, examined")
+    return mongo_profiler.report(min(limit, 200), sort)
+
+@api_router.delete("/debug/slow-queries")
+async def reset_slow_queries(user_info: Dict = Depends(admin_session)):
+    mongo_profiler.reset()
+    return {"message": "Query profile reset"}
+
 # Include the router in the main app
 fastapi_app.include_router(api_router)
 
+fastapi_app.add_middleware(RequestMetricsMiddleware)
+
 fastapi_app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
@@ -1702,16 +4614,141 @@ fastapi_app.add_middleware(
     allow_headers=["*"],
 )
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+# Configure logging: handlers only enqueue, a listener thread formats and writes.
+# Records carrying an `event` (or, at INFO and below, from the same logger) are
+# sampled and capped per second so reconnect storms cannot flood the output.
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()
+LOG_FORMAT = os.environ.get('LOG_FORMAT', 'json')  # "json" or "text"
+LOG_QUEUE_SIZE = 10000
+LOG_EVENT_RATE = int(os.environ.get('LOG_EVENT_RATE', '50'))  # records per event per second
+LOG_SAMPLE_RATES = {"sio.connect": 1.0, "sio.disconnect": 1.0}
+LOG_SAMPLE_RATES.update(json.loads(os.environ.get('LOG_SAMPLE_RATES', '{}')))
+LOG_RECORD_FIELDS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "operation"}
+
+class EventSampler(logging.Filter):
+    """Per-event sampling plus a per-second cap; suppressed counts ride on the next record"""
+    def __init__(self):
+        super().__init__()
+        self.windows = {}  # event -> [window second, emitted, suppressed]
+    
+    def filter(self, record):
+        event = getattr(record, "event", None)
+        if event is None:
+            if record.levelno > logging.INFO:
+                return True
+            event = record.name
+        
+        rate = LOG_SAMPLE_RATES.get(event, 1.0)
+        if rate < 1.0 and random.random() >= rate:
+            return False
+        
+        second = int(time.monotonic())
+        window = self.windows.get(event)
+        if window is None or window[0] != second:
+            suppressed = window[2] if window else 0
+            window = self.windows[event] = [second, 0, 0]
+            if suppressed:
+                record.suppressed = suppressed
+        if window[1] >= LOG_EVENT_RATE:
+            window[2] += 1
+            return False
+        window[1] += 1
+        
+        # Attach the request/socket event from the caller's context before the record changes threads
+        operation = current_operation.get()
+        if operation is not None:
+            record.operation = operation.label
+        return True
+
+class BoundedQueueHandler(logging.handlers.QueueHandler):
+    """Never blocks the event loop: records are dropped when the queue is full"""
+    dropped = 0
+    
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            BoundedQueueHandler.dropped += 1
+    
+    def prepare(self, record):
+        # Render message and traceback here, formatting happens on the listener thread
+        record = logging.makeLogRecord(record.__dict__)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.msg
+        }
+        if getattr(record, "operation", None):
+            entry["operation"] = record.operation
+        entry.update((key, value) for key, value in record.__dict__.items() if key not in LOG_RECORD_FIELDS)
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+def configure_logging():
+    stream_handler = logging.StreamHandler(sys.stdout)
+    if LOG_FORMAT == "json":
+        stream_handler.setFormatter(JsonFormatter())
+    else:
+        stream_handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+    
+    queue_handler = BoundedQueueHandler(queue.Queue(LOG_QUEUE_SIZE))
+    queue_handler.addFilter(EventSampler())
+    
+    root = logging.getLogger()
+    root.handlers = [queue_handler]
+    root.setLevel(LOG_LEVEL)
+    # Route uvicorn's error and access logs through the same pipeline
+    for name in ("uvicorn", "uvicorn.error", "uvicorn.access"):
+        logging.getLogger(name).handlers = []
+        logging.getLogger(name).propagate = True
+    
+    listener = logging.handlers.QueueListener(queue_handler.queue, stream_handler, respect_handler_level=True)
+    listener.start()
+    return listener
+
+log_listener = configure_logging()
 logger = logging.getLogger(__name__)
 
+@fastapi_app.on_event("startup")
+async def startup_build_indexes():
+    if not SESSION_SECRET:
+        raise RuntimeError("SESSION_SECRET is not set; set it, or APP_ENV=development for a per-process random secret")
+    if not os.environ.get('SESSION_SECRET'):
+        logger.warning("SESSION_SECRET is not set (APP_ENV=development); session tokens only verify "
+                       "in this process until it restarts")
+    if not UNSUBSCRIBE_SECRET:
+        logger.warning("UNSUBSCRIBE_SECRET is not set; newsletter sends are disabled")
+    await ensure_indexes()
+    await room_directory.load()
+    await build_search_index()
+    await resume_newsletter_send_jobs()
+    # Start explaining new query shapes once the startup migrations are done
+    mongo_profiler.loop = asyncio.get_running_loop()
+    sio.start_background_task(ephemeral_flush_loop)
+    sio.start_background_task(resume_file_processing)
+    if ARCHIVE_INTERVAL_HOURS > 0:
+        sio.start_background_task(archive_loop)
+    logger.info(f"Search index built with {len(search_index)} documents")
+
 @fastapi_app.on_event("shutdown")
 async def shutdown_db_client():
     client.close()
+    if file_processing_pool is not None:
+        file_processing_pool.shutdown(wait=False, cancel_futures=True)
+    if BoundedQueueHandler.dropped:
+        logger.warning(f"Dropped {BoundedQueueHandler.dropped} log records on a full queue")
+    log_listener.stop()
 
 # Export the combined app for uvicorn
 if __name__ == "__main__":
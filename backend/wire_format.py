@@ -0,0 +1,38 @@
+"""Compact chat wire format: MessagePack with short keys and epoch-ms timestamps.
+
+Kept free of app imports (no database, no settings) so wire_format_benchmark.py
+can load it on its own.
+"""
+from datetime import datetime
+
+try:
+    import msgpack
+except ImportError:  # compact chat wire format is optional; clients fall back to JSON
+    msgpack = None
+
+COMPACT_KEYS = {
+    'id': 'i',
+    'room_id': 'r',
+    'sender_id': 's',
+    'sender_name': 'n',
+    'receiver_id': 'R',
+    'receiver_name': 'N',
+    'content': 'c',
+    'message_type': 't',
+    'image_url': 'u',
+    'reply_to': 'p',
+    'seq': 'q',
+    'created_at': 'ts',
+    'updated_at': 'ut'
+}
+
+def encode_compact(payload):
+    """Pack a chat payload, dropping nulls and the default "text" message type"""
+    packed = {}
+    for key, value in payload.items():
+        if value is None or (key == 'message_type' and value == 'text'):
+            continue
+        if key in ('created_at', 'updated_at'):
+            value = int(datetime.fromisoformat(value).timestamp() * 1000)
+        packed[COMPACT_KEYS.get(key, key)] = value
+    return msgpack.packb(packed)
@@ -0,0 +1,394 @@
+"""Async, parallel backend tests with a contention mode.
+
+Tests declare the tests they depend on and run as soon as those pass, sharing
+one pooled HTTP client. Contention mode fires the same mutation concurrently
+and checks invariants the serial suite cannot catch (capacity overbooking,
+duplicate signups).
+
+    python backend_async_test.py [functional|contention|all] [--base-url URL] [--concurrency 16]
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+import uuid
+from datetime import datetime, timezone, timedelta
+
+import httpx
+
+VERIFIED_USER_ID = "54bee40c-826f-4aa5-b770-2242e397086f"  # John Smith (verified)
+CHAT_TEST_PASSWORD = "chat-test-password"
+
+TESTS = []
+
+def case(name, depends=(), suite="functional", known_failure=None):
+    """Register a test coroutine; it runs once every test in `depends` has passed.
+
+    `known_failure` names an open bug the test exposes: its failure is reported
+    but does not fail the run. Drop the marker once the bug is fixed.
+    """
+    def decorator(fn):
+        TESTS.append({"name": name, "fn": fn, "depends": tuple(depends), "suite": suite,
+                      "known_failure": known_failure})
+        return fn
+    return decorator
+
+class AsyncICAABackendTester:
+    def __init__(self, base_url="https://alumni-community.preview.emergentagent.com", concurrency=16):
+        self.base_url = base_url
+        self.api_url = f"{base_url}/api"
+        self.concurrency = concurrency
+        self.tests_run = 0
+        self.tests_passed = 0
+        self.tests_known_failures = 0
+        self.test_results = []
+        self.created_ids = {}
+        self.client = None
+
+    def log_test(self, name, success, status_code=None, error=None, duration=None, known_failure=None):
+        self.tests_run += 1
+        if success:
+            self.tests_passed += 1
+            print(f"✅ {name} - Status: {status_code} ({duration:.2f}s)")
+            if known_failure:
+                print(f"   passed despite known failure: {known_failure}")
+        elif known_failure:
+            self.tests_known_failures += 1
+            print(f"⚠️  {name} - Known failure ({known_failure}): {error}")
+        else:
+            print(f"❌ {name} - Status: {status_code}, Error: {error}")
+        self.test_results.append({
+            "test": name,
+            "success": success,
+            "status_code": status_code,
+            "error": error,
+            "duration": duration,
+            "known_failure": known_failure
+        })
+
+    async def get(self, path, **kwargs):
+        return await self.client.get(f"{self.api_url}{path}", **kwargs)
+
+    async def post(self, path, **kwargs):
+        return await self.client.post(f"{self.api_url}{path}", **kwargs)
+
+    async def put(self, path, **kwargs):
+        return await self.client.put(f"{self.api_url}{path}", **kwargs)
+
+    async def run(self, suites):
+        """Run the selected suites, starting each test as soon as its dependencies pass"""
+        selected = [test for test in TESTS if test["suite"] in suites]
+        names = {test["name"] for test in selected}
+        outcomes = {test["name"]: asyncio.get_running_loop().create_future() for test in selected}
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def execute(test):
+            for dependency in test["depends"]:
+                if dependency not in names or not await outcomes[dependency]:
+                    self.log_test(test["name"], False, error=f"skipped: dependency '{dependency}' did not pass")
+                    outcomes[test["name"]].set_result(False)
+                    return
+            async with semaphore:
+                start = time.perf_counter()
+                try:
+                    status_code = await test["fn"](self)
+                    success, error = True, None
+                except AssertionError as e:
+                    status_code, success, error = None, False, str(e)
+                except Exception as e:
+                    status_code, success, error = None, False, f"{type(e).__name__}: {e}"
+                self.log_test(test["name"], success, status_code, error, time.perf_counter() - start,
+                              test["known_failure"])
+                outcomes[test["name"]].set_result(success)
+
+        limits = httpx.Limits(max_connections=self.concurrency * 4, max_keepalive_connections=self.concurrency)
+        async with httpx.AsyncClient(limits=limits, timeout=30) as client:
+            self.client = client
+            start = time.perf_counter()
+            await asyncio.gather(*(execute(test) for test in selected))
+            elapsed = time.perf_counter() - start
+
+        print("\n" + "=" * 50)
+        known = f", {self.tests_known_failures} known failures" if self.tests_known_failures else ""
+        print(f"📊 Test Results: {self.tests_passed}/{self.tests_run} passed{known} in {elapsed:.1f}s")
+        return self.tests_passed + self.tests_known_failures == self.tests_run
+
+def expect(response, status=200):
+    assert response.status_code == status, f"expected {status}, got {response.status_code}: {response.text[:200]}"
+    return response.json()
+
+def unique_email(prefix):
+    return f"{prefix}-{uuid.uuid4().hex[:10]}@example.org"
+
+# Functional suite
+
+@case("Root API Endpoint")
+async def test_root_endpoint(t):
+    expect(await t.get("/"))
+    return 200
+
+@case("Create News Post", depends=["Root API Endpoint"])
+async def test_create_news_post(t):
+    data = expect(await t.post("/news", json={
+        "title": "Test News Article",
+        "excerpt": "This is a test news article excerpt",
+        "content": "This is the full content of the test news article.",
+        "author": "Test Author"
+    }))
+    t.created_ids["news_id"] = data["id"]
+    return 200
+
+@case("Get News Posts", depends=["Root API Endpoint"])
+async def test_get_news_posts(t):
+    assert isinstance(expect(await t.get("/news")), list), "news list is not a list"
+    return 200
+
+@case("Get Specific News Post", depends=["Create News Post"])
+async def test_get_specific_news_post(t):
+    data = expect(await t.get(f"/news/{t.created_ids['news_id']}"))
+    assert data["id"] == t.created_ids["news_id"], "wrong post returned"
+    return 200
+
+@case("Full-Text Search", depends=["Create News Post"])
+async def test_search(t):
+    data = expect(await t.get("/search", params={"q": "test arti", "types": "news"}))
+    assert t.created_ids["news_id"] in [hit["id"] for hit in data["results"]], "created post not found by prefix query"
+    return 200
+
+@case("Submit Contact Form", depends=["Root API Endpoint"])
+async def test_submit_contact_form(t):
+    expect(await t.post("/contact", json={
+        "name": "Test User", "email": unique_email("contact"), "subject": "Test Subject", "message": "Hello"
+    }))
+    return 200
+
+@case("Newsletter Subscription", depends=["Root API Endpoint"])
+async def test_newsletter_subscription(t):
+    email = unique_email("newsletter")
+    data = expect(await t.post("/newsletter/subscribe", json={"email": email}))
+    assert "Successfully" in data["message"], data["message"]
+    again = expect(await t.post("/newsletter/subscribe", json={"email": email}))
+    assert "Already" in again["message"], "resubscribing did not report already subscribed"
+    return 200
+
+@case("Create Free Member", depends=["Root API Endpoint"])
+async def test_create_free_member(t):
+    data = expect(await t.post("/members", json={
+        "name": "Test Member", "email": unique_email("member"), "membership_tier": "free"
+    }))
+    t.created_ids["member_id"] = data["id"]
+    return 200
+
+@case("Get Specific Member", depends=["Create Free Member"])
+async def test_get_specific_member(t):
+    data = expect(await t.get(f"/members/{t.created_ids['member_id']}"))
+    assert data["id"] == t.created_ids["member_id"], "wrong member returned"
+    return 200
+
+@case("Get Products", depends=["Root API Endpoint"])
+async def test_get_products(t):
+    products = expect(await t.get("/products"))
+    assert products, "no products"
+    t.created_ids["product_ids"] = [product["id"] for product in products]
+    return 200
+
+@case("Get Specific Product", depends=["Get Products"])
+async def test_get_specific_product(t):
+    product_id = t.created_ids["product_ids"][0]
+    assert expect(await t.get(f"/products/{product_id}"))["id"] == product_id, "wrong product returned"
+    return 200
+
+@case("Products Filtering", depends=["Get Products"])
+async def test_products_filtering(t):
+    apparel = expect(await t.get("/products", params={"category": "apparel"}))
+    assert all(product["category"] == "apparel" for product in apparel), "category filter leaked other products"
+    return 200
+
+@case("Create User", depends=["Root API Endpoint"])
+async def test_create_user(t):
+    data = expect(await t.post("/users", json={
+        "name": "Async Test User", "email": unique_email("user"), "bio": "Created by the async harness",
+        "interests": ["testing"], "cohort": "2024", "program_track": "Leadership"
+    }))
+    t.created_ids["new_user_id"] = data["id"]
+    return 200
+
+@case("Update User Profile", depends=["Create User"])
+async def test_update_user_profile(t):
+    data = expect(await t.put(f"/users/{t.created_ids['new_user_id']}", json={"bio": "Updated bio"}))
+    assert data["bio"] == "Updated bio", "bio not updated"
+    return 200
+
+@case("User Event History", depends=["Create User"])
+async def test_user_event_history(t):
+    assert isinstance(expect(await t.get(f"/users/{t.created_ids['new_user_id']}/events")), list)
+    return 200
+
+@case("Member Directory", depends=["Root API Endpoint"])
+async def test_user_directory(t):
+    data = expect(await t.get("/users/directory", params={"limit": 10}))
+    assert data["total"] >= len(data["results"]), "directory total smaller than page"
+    return 200
+
+@case("Chat Session Token", depends=["Root API Endpoint"])
+async def test_chat_session_token(t):
+    credentials = {"email": unique_email("chat"), "password": CHAT_TEST_PASSWORD}
+    user = expect(await t.post("/users", json={
+        "name": "Async Chat User", "cohort": "2023", "program_track": "Web Development", **credentials
+    }))
+    expect(await t.put(f"/users/{user['id']}", json={"is_verified_alumni": True}))
+    data = expect(await t.post("/chat/session", json=credentials))
+    t.created_ids["chat_headers"] = {"Authorization": f"Bearer {data['token']}"}
+    expect(await t.post("/chat/session", json={**credentials, "password": "not-the-password"}), 401)
+    expect(await t.get("/chat-rooms", headers={"Authorization": "Bearer not-a-token"}), 401)
+    expect(await t.get("/chat-rooms", params={"user_id": user["id"]}), 401)
+    return 200
+
+@case("Get User Chat Rooms", depends=["Chat Session Token"])
+async def test_get_user_chat_rooms(t):
+    assert isinstance(expect(await t.get("/chat-rooms", headers=t.created_ids["chat_headers"])), list)
+    return 200
+
+@case("Create Custom Chat Room", depends=["Chat Session Token"])
+async def test_create_custom_chat_room(t):
+    data = expect(await t.post("/chat-rooms", headers=t.created_ids["chat_headers"], json={
+        "name": "Async Harness Room", "description": "Test room", "room_type": "custom"
+    }))
+    t.created_ids["custom_room_id"] = data["id"]
+    return 200
+
+@case("Get Room Messages", depends=["Create Custom Chat Room"])
+async def test_get_room_messages(t):
+    room_id = t.created_ids["custom_room_id"]
+    assert isinstance(expect(await t.get(f"/chat-rooms/{room_id}/messages", headers=t.created_ids["chat_headers"])), list)
+    return 200
+
+@case("Search Room Messages", depends=["Create Custom Chat Room"])
+async def test_search_room_messages(t):
+    room_id = t.created_ids["custom_room_id"]
+    expect(await t.get(f"/chat-rooms/{room_id}/messages/search", params={"q": "hello"},
+                       headers=t.created_ids["chat_headers"]))
+    return 200
+
+@case("Get User Conversations", depends=["Chat Session Token"])
+async def test_get_user_conversations(t):
+    assert isinstance(expect(await t.get("/direct-messages/conversations", headers=t.created_ids["chat_headers"])), list)
+    return 200
+
+@case("User Online Status", depends=["Root API Endpoint"])
+async def test_user_online_status(t):
+    expect(await t.get(f"/users/{VERIFIED_USER_ID}/online-status"))
+    return 200
+
+# Contention suite: the same mutation fired concurrently, then invariants checked
+
+CONTENTION_WRITERS = 20
+
+async def burst(count, make_request):
+    return await asyncio.gather(*(make_request(i) for i in range(count)))
+
+@case("Event Capacity Race", suite="contention",
+      known_failure="register_for_event counts registered seats, then inserts")
+async def test_event_capacity_race(t):
+    capacity = 5
+    event = expect(await t.post("/events", json={
+        "title": "Contention Capacity Event", "description": "Capacity race check", "event_type": "other",
+        "date": (datetime.now(timezone.utc) + timedelta(days=30)).isoformat(), "location": "Test Hall",
+        "capacity": capacity
+    }))
+    responses = await burst(capacity * 4, lambda i: t.post(f"/events/{event['id']}/register", json={
+        "event_id": event["id"], "member_name": f"Racer {i}", "member_email": unique_email("racer")
+    }))
+    assert all(response.status_code == 200 for response in responses), "a registration failed"
+
+    registrations = expect(await t.get(f"/events/{event['id']}/registrations"))
+    registered = sum(1 for r in registrations if r["registration_status"] == "registered")
+    waitlisted = sum(1 for r in registrations if r["registration_status"] == "waitlisted")
+    event = expect(await t.get(f"/events/{event['id']}"))
+    assert registered <= capacity, f"{registered} registered for capacity {capacity}"
+    assert registered + waitlisted == len(responses), f"{registered + waitlisted} registrations for {len(responses)} requests"
+    assert event["current_registrations"] == registered, \
+        f"event counter {event['current_registrations']} != {registered} registrations"
+    assert event["waitlist_count"] == waitlisted, f"waitlist counter {event['waitlist_count']} != {waitlisted}"
+    return 200
+
+@case("Event Duplicate Registration Race", suite="contention",
+      known_failure="register_for_event checks for an existing registration, then inserts")
+async def test_event_duplicate_registration_race(t):
+    event = expect(await t.post("/events", json={
+        "title": "Contention Duplicate Event", "description": "Duplicate registration check", "event_type": "other",
+        "date": (datetime.now(timezone.utc) + timedelta(days=30)).isoformat(), "location": "Test Hall"
+    }))
+    email = unique_email("double")
+    responses = await burst(CONTENTION_WRITERS, lambda i: t.post(f"/events/{event['id']}/register", json={
+        "event_id": event["id"], "member_name": "Double Booker", "member_email": email
+    }))
+    accepted = [response for response in responses if response.status_code == 200]
+    registrations = [r for r in expect(await t.get(f"/events/{event['id']}/registrations")) if r["member_email"] == email]
+    assert len(accepted) == 1, f"{len(accepted)} concurrent registrations accepted for one email"
+    assert len(registrations) == 1, f"{len(registrations)} registrations stored for one email"
+    return 200
+
+@case("Create User Email Race", suite="contention")
+async def test_create_user_race(t):
+    email = unique_email("signup")
+    name = f"Contention {uuid.uuid4().hex[:8]}"
+    responses = await burst(CONTENTION_WRITERS, lambda i: t.post("/users", json={"name": name, "email": email}))
+    statuses = sorted(response.status_code for response in responses)
+    assert statuses.count(200) == 1, f"{statuses.count(200)} users created for one email"
+    assert set(statuses) <= {200, 400}, f"unexpected statuses {set(statuses)}"
+    directory = expect(await t.get("/users/directory", params={"q": name.lower()}))
+    assert directory["total"] == 1, f"{directory['total']} users stored for one email"
+    return 200
+
+@case("Create Member Email Race", suite="contention")
+async def test_create_member_race(t):
+    email = unique_email("member-race")
+    responses = await burst(CONTENTION_WRITERS, lambda i: t.post("/members", json={
+        "name": "Racing Member", "email": email, "membership_tier": "free"
+    }))
+    created = sum(1 for response in responses if response.status_code == 200)
+    stored = len(expect(await t.get("/members", params={"email": email})))
+    assert created == 1, f"{created} members created for one email"
+    assert stored == 1, f"{stored} members stored for one email"
+    return 200
+
+@case("Newsletter Subscribe Race", suite="contention")
+async def test_subscribe_newsletter_race(t):
+    email = unique_email("subscribe-race")
+    responses = await burst(CONTENTION_WRITERS, lambda i: t.post("/newsletter/subscribe", json={"email": email}))
+    messages = [expect(response)["message"] for response in responses]
+    subscribed = sum(1 for message in messages if message.startswith("Successfully"))
+    stored = len(expect(await t.get("/newsletter/subscribers", params={"email": email})))
+    assert subscribed == 1, f"{subscribed} requests reported a new subscription"
+    assert stored == 1, f"{stored} subscriber records for one email"
+    return 200
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("suite", nargs="?", default="functional", choices=["functional", "contention", "all"])
+    parser.add_argument("--base-url", default="https://alumni-community.preview.emergentagent.com")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--results", default="backend_async_test_results.json")
+    args = parser.parse_args()
+
+    suites = {"functional", "contention"} if args.suite == "all" else {args.suite}
+    tester = AsyncICAABackendTester(args.base_url, args.concurrency)
+    print(f"🚀 Running {args.suite} tests against {args.base_url}")
+    print("=" * 50)
+    success = asyncio.run(tester.run(suites))
+
+    with open(args.results, "w") as f:
+        json.dump({
+            "timestamp": datetime.now().isoformat(),
+            "suite": args.suite,
+            "total_tests": tester.tests_run,
+            "passed_tests": tester.tests_passed,
+            "known_failures": tester.tests_known_failures,
+            "test_results": tester.test_results
+        }, f, indent=2)
+    return 0 if success else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
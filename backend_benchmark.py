@@ -0,0 +1,533 @@
+"""Latency/throughput benchmark for every /api route.
+
+Seeds a throwaway database (a local MongoDB, or mongomock-motor with --fake)
+with configurable volumes, drives each api_router route in-process with
+concurrent async clients, prints a throughput/percentile table and writes a
+JSON baseline that later runs can be compared against.
+
+    python backend_benchmark.py [--users 2000] [--messages 50000] [--concurrency 32]
+    python backend_benchmark.py --baseline benchmark_baseline.json
+    python backend_benchmark.py --compare benchmark_baseline.json [--threshold 20]
+
+Routes that call Stripe, write to the uploads directory or delete seed data
+are listed as excluded rather than silently skipped. A route that answers any
+request with a 4xx/5xx fails the run: it would be timing error handling.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+import uuid
+from datetime import datetime, timezone, timedelta
+from pathlib import Path
+
+BENCHMARK_PASSWORD = "benchmark-password"
+COHORTS = [str(year) for year in range(2015, 2025)]
+TRACKS = ["Leadership", "Policy", "Entrepreneurship", "Nonprofit", "Technology"]
+INTERESTS = ["mentoring", "policy", "startups", "fundraising", "public speaking", "data", "arts", "health"]
+WORDS = ("alumni network policy mentoring cohort leadership reception panel workshop community "
+         "fundraising volunteer bylaws election newsletter gala career startup health education").split()
+
+EXCLUDED = {
+    ("POST", "/api/documents/{document_id}/upload"): "writes to the uploads directory",
+    ("GET", "/api/documents/{document_id}/file"): "needs an uploaded file",
+    ("GET", "/api/documents/{document_id}/versions/{version_number}/file"): "needs an uploaded file",
+    ("GET", "/api/documents/{document_id}/thumbnail"): "needs a processed upload",
+    ("GET", "/api/newsletters/{newsletter_id}/thumbnail"): "needs a processed upload",
+    ("POST", "/api/newsletters/{newsletter_id}/send"): "mails every seeded subscriber",
+    ("POST", "/api/newsletter-send-jobs/{job_id}/resume"): "changes send job state",
+    ("POST", "/api/newsletter-send-jobs/{job_id}/cancel"): "changes send job state",
+    ("POST", "/api/newsletters/{newsletter_id}/upload-pdf"): "writes to the uploads directory",
+    ("GET", "/api/newsletters/{newsletter_id}/pdf"): "needs an uploaded file",
+    ("POST", "/api/users/{user_id}/upload-photo"): "writes to the uploads directory",
+    ("POST", "/api/chat-images/upload"): "writes to the uploads directory",
+    ("POST", "/api/shop/checkout"): "calls Stripe",
+    ("POST", "/api/payments/create-checkout-session"): "calls Stripe",
+    ("GET", "/api/payments/checkout-status/{session_id}"): "calls Stripe",
+    ("POST", "/api/webhook/stripe"): "needs a signed Stripe payload",
+    ("DELETE", "/api/products/{product_id}"): "deletes seed data",
+    ("DELETE", "/api/events/{event_id}"): "deletes seed data",
+    ("DELETE", "/api/cart/{session_id}/item/{item_id}"): "deletes seed data",
+    ("DELETE", "/api/cart/{session_id}"): "deletes seed data",
+    ("DELETE", "/api/chat-rooms/{room_id}/participants/{participant_id}"): "deletes seed data",
+    ("POST", "/api/chat-rooms/{room_id}/moderation/delete"): "deletes seed data",
+    ("POST", "/api/chat-rooms/{room_id}/moderation/purge-user"): "deletes seed data",
+    ("POST", "/api/chat/archive/run"): "moves seed data to the archive",
+    ("POST", "/api/chat/archive/rehydrate"): "depends on an archive run",
+    ("DELETE", "/api/debug/slow-queries"): "resets profiler state",
+}
+
+def sentence(rng, words=12):
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize() + "."
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--mongo-url", default=os.environ.get("MONGO_URL", "mongodb://localhost:27017"))
+    parser.add_argument("--db", default="icaa_benchmark", help="dropped and re-seeded on every run")
+    parser.add_argument("--fake", action="store_true", help="use mongomock-motor instead of a MongoDB server")
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--events", type=int, default=200)
+    parser.add_argument("--news", type=int, default=500)
+    parser.add_argument("--products", type=int, default=100)
+    parser.add_argument("--messages", type=int, default=50000)
+    parser.add_argument("--direct-messages", type=int, default=10000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=200, help="requests per route")
+    parser.add_argument("--routes", default=None, help="only routes whose path contains this text")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--baseline", default=None, help="write results as a JSON baseline to this path")
+    parser.add_argument("--compare", default=None, help="compare p99 against this JSON baseline")
+    parser.add_argument("--threshold", type=float, default=20.0, help="p99 regression threshold in percent")
+    return parser.parse_args()
+
+def import_server(args):
+    """Import the app against the benchmark database, with request logging quiet"""
+    os.environ["MONGO_URL"] = args.mongo_url
+    os.environ["DB_NAME"] = args.db
+    os.environ.setdefault("LOG_LEVEL", "ERROR")
+    os.environ.setdefault("PROFILE_EXPLAIN", "0")
+    os.environ.setdefault("NEWSLETTER_TRANSPORT", "memory")
+    os.environ.setdefault("SESSION_SECRET", "benchmark-session-secret")
+    os.environ.setdefault("UNSUBSCRIBE_SECRET", "benchmark-unsubscribe-secret")
+    sys.path.insert(0, str(Path(__file__).parent / "backend"))
+    import server
+
+    if args.fake:
+        try:
+            import mongomock
+            from mongomock_motor import AsyncMongoMockClient
+        except ImportError:
+            sys.exit("--fake needs mongomock-motor (pip install mongomock-motor)")
+        # mongomock ignores partialFilterExpression, so a partial unique index would reject
+        # every seeded document outside its filter; keep those indexes non-unique
+        create_index = mongomock.collection.Collection.create_index
+
+        def create_index_without_partial_unique(self, keys, **kwargs):
+            if kwargs.pop("partialFilterExpression", None) is not None:
+                kwargs.pop("unique", None)
+            return create_index(self, keys, **kwargs)
+
+        mongomock.collection.Collection.create_index = create_index_without_partial_unique
+        server.client = AsyncMongoMockClient()
+        server.db = server.client[args.db]
+    return server
+
+async def insert_chunked(collection, documents, chunk=1000):
+    for start in range(0, len(documents), chunk):
+        await collection.insert_many(documents[start:start + chunk], ordered=False)
+
+async def seed(server, args, rng):
+    """Populate the database through the app's own models; returns ids the scenarios use"""
+    db = server.db
+    prepare = server.prepare_for_mongo
+    await server.client.drop_database(args.db)
+    now = datetime.now(timezone.utc)
+
+    users = []
+    for i in range(args.users):
+        users.append(server.User(
+            name=f"{rng.choice(['Ana', 'John', 'Sarah', 'Marcus', 'Priya', 'Wei', 'Fatima'])} Bench{i}",
+            email=f"bench{i}@example.org",
+            bio=sentence(rng),
+            interests=rng.sample(INTERESTS, 3),
+            cohort=rng.choice(COHORTS),
+            program_track=rng.choice(TRACKS),
+            is_verified_alumni=rng.random() < 0.8,
+            membership_tier=rng.choice(["free", "active_monthly", "active_yearly", "lifetime"])
+        ).dict())
+    user_docs = [prepare(dict(user)) for user in users]
+    # One shared hash: scrypt per seeded user would dominate the seeding time
+    password_hash = server.hash_password(BENCHMARK_PASSWORD)
+    for user in user_docs:
+        user["name_search"] = user["name"].lower()
+        user["password_hash"] = password_hash
+    await insert_chunked(db.users, user_docs)
+    verified = [user for user in users if user["is_verified_alumni"]]
+
+    rooms = [server.ChatRoom(name=f"Cohort {cohort}", room_type="cohort", cohort=cohort, created_by="system").dict()
+             for cohort in COHORTS]
+    rooms += [server.ChatRoom(name=f"{track} Track", room_type="program_track", program_track=track,
+                              created_by="system").dict() for track in TRACKS]
+    for i in range(20):
+        members = rng.sample(verified[:100], min(25, len(verified)))
+        rooms.append(server.ChatRoom(
+            name=f"Custom room {i}", room_type="custom", participants=[user["id"] for user in members],
+            admins=[members[0]["id"]], created_by=members[0]["id"]
+        ).dict())
+    await db.chat_rooms.insert_many([prepare(dict(room)) for room in rooms])
+
+    # Room messages: numbered per room the way send_message does, one minute apart
+    room_seq = {room["id"]: 0 for room in rooms}
+    messages = []
+    for i in range(args.messages):
+        room = rng.choice(rooms)
+        sender = rng.choice(verified)
+        room_seq[room["id"]] += 1
+        messages.append(prepare(server.Message(
+            room_id=room["id"], sender_id=sender["id"], sender_name=sender["name"], content=sentence(rng),
+            seq=room_seq[room["id"]], created_at=now - timedelta(minutes=args.messages - i)
+        ).dict()))
+    await insert_chunked(db.messages, messages)
+
+    dm_pairs = [tuple(rng.sample(verified[:50], 2)) for _ in range(100)] if len(verified) >= 50 else []
+    dm_seq = {}
+    direct_messages = []
+    for i in range(args.direct_messages if dm_pairs else 0):
+        sender, receiver = rng.choice(dm_pairs)
+        key = server.conversation_key(sender["id"], receiver["id"])
+        dm_seq[key] = dm_seq.get(key, 0) + 1
+        dm = prepare(server.DirectMessage(
+            sender_id=sender["id"], receiver_id=receiver["id"], sender_name=sender["name"],
+            receiver_name=receiver["name"], content=sentence(rng), seq=dm_seq[key],
+            created_at=now - timedelta(minutes=args.direct_messages - i)
+        ).dict())
+        dm["conversation_key"] = key
+        direct_messages.append(dm)
+    await insert_chunked(db.direct_messages, direct_messages)
+
+    counters = [{"_id": f"room:{room_id}", "seq": seq} for room_id, seq in room_seq.items()]
+    counters += [{"_id": f"dm:{key}", "seq": seq} for key, seq in dm_seq.items()]
+    counters += [{"_id": f"migration:{name}_seq", "done": True} for name in ("messages", "direct_messages")]
+    await db.counters.insert_many(counters)
+
+    events = [server.Event(
+        title=f"{rng.choice(['Third Thursday', 'Policy Panel', 'Mentoring Night', 'Gala'])} {i}",
+        description=sentence(rng, 30), event_type=rng.choice(["networking", "social", "third_thursday"]),
+        date=now + timedelta(days=rng.randint(-180, 180)), location="ICAA Hall",
+        capacity=rng.choice([None, 50, 100, 1000000])
+    ).dict() for i in range(args.events)]
+    await insert_chunked(db.events, [prepare(dict(event)) for event in events])
+
+    news = [server.NewsPost(title=sentence(rng, 6), content=sentence(rng, 200), excerpt=sentence(rng, 20),
+                            published_date=now - timedelta(days=i)).dict() for i in range(args.news)]
+    await insert_chunked(db.news_posts, [prepare(dict(post)) for post in news])
+
+    products = [server.Product(
+        name=f"ICAA {rng.choice(['Tee', 'Hoodie', 'Mug', 'Tote'])} {i}", description=sentence(rng, 20),
+        category=rng.choice(["apparel", "accessories", "other"]), price=round(rng.uniform(10, 80), 2),
+        sizes_available=["S", "M", "L"], stock_quantity=100
+    ).dict() for i in range(args.products)]
+    await insert_chunked(db.products, [prepare(dict(product)) for product in products])
+
+    documents = [server.Document(
+        title=f"{rng.choice(['Bylaws', 'Policy', 'Annual Report'])} {i}", description=sentence(rng),
+        category=rng.choice(["bylaws", "policies", "forms", "reports"]), version="1.0",
+        filename=f"doc{i}.pdf", file_url=f"/uploads/documents/doc{i}.pdf",
+        access_level=rng.choice(["public", "members", "admin"])
+    ).dict() for i in range(50)]
+    await db.documents.insert_many([prepare(dict(document)) for document in documents])
+
+    newsletters = [server.Newsletter(title=f"Newsletter {i}", description=sentence(rng), month=f"2024-{i % 12 + 1:02d}").dict()
+                   for i in range(24)]
+    await db.newsletters.insert_many([prepare(dict(newsletter)) for newsletter in newsletters])
+
+    await insert_chunked(db.members, [prepare(server.Member(
+        name=user["name"], email=user["email"], membership_tier=user["membership_tier"]
+    ).dict()) for user in users[:args.users // 2]])
+    subscriber_emails = [f"subscriber{i}@example.org" for i in range(args.users)]
+    await insert_chunked(db.newsletter_subscribers, [prepare(server.NewsletterSubscriber(
+        email=email
+    ).dict()) for email in subscriber_emails])
+    send_jobs = [server.NewsletterSendJob(
+        newsletter_id=newsletter["id"], status="completed", sent=args.users, completed_at=now
+    ).dict() for newsletter in newsletters[:12]]
+    await db.newsletter_send_jobs.insert_many([dict(prepare(dict(job)), active=False) for job in send_jobs])
+
+    # Same startup work the app does, minus the background tasks
+    await server.ensure_indexes()
+    await server.room_directory.load()
+    await server.build_search_index()
+
+    tokens = {user["id"]: server.issue_session_token(user)[0] for user in verified[:100]}
+    server.ADMIN_USER_IDS.add(verified[0]["id"])  # for the admin-only routes
+    return {
+        "users": users, "verified": verified[:100], "rooms": rooms, "custom_rooms": rooms[-20:],
+        "dm_pairs": dm_pairs, "events": events, "news": news, "products": products,
+        "documents": documents, "newsletters": newsletters, "send_jobs": send_jobs, "tokens": tokens,
+        "unsubscribe_links": [(email, server.unsubscribe_token(email)) for email in subscriber_emails]
+    }
+
+def build_scenarios(data):
+    """(method, route path) -> fn(rng) returning the request to send"""
+    admin_headers = {"Authorization": f"Bearer {data['tokens'][data['verified'][0]['id']]}"}
+
+    def chat_user(rng):
+        user = rng.choice(data["verified"])
+        return user, {"Authorization": f"Bearer {data['tokens'][user['id']]}"}
+
+    def room_for(rng):
+        room = rng.choice(data["custom_rooms"])
+        user_id = rng.choice(room["participants"])
+        return room, {"Authorization": f"Bearer {data['tokens'].get(user_id) or data['tokens'][room['admins'][0]]}"}
+
+    def room_request(path_suffix, params=None):
+        def build(rng):
+            room, headers = room_for(rng)
+            return {"url": f"/api/chat-rooms/{room['id']}{path_suffix}", "headers": headers, "params": params or {}}
+        return build
+
+    def dm_request(path, extra=None):
+        def build(rng):
+            sender, receiver = rng.choice(data["dm_pairs"])
+            headers = {"Authorization": f"Bearer {data['tokens'][sender['id']]}"}
+            return {"url": path, "headers": headers, "params": dict(other_user_id=receiver["id"], **(extra or {}))}
+        return build
+
+    def unique_email(prefix):
+        return f"{prefix}-{uuid.uuid4().hex[:12]}@example.org"
+
+    def unsubscribe_link(rng):
+        email, token = rng.choice(data["unsubscribe_links"])
+        return {"url": "/api/newsletter/unsubscribe", "params": {"email": email, "token": token}}
+
+    def subscriber_csv(rng):
+        rows = "\n".join(unique_email("import") for _ in range(100))
+        return {"url": "/api/newsletter/subscribers/import",
+                "files": {"file": ("subscribers.csv", f"email\n{rows}\n".encode(), "text/csv")}}
+
+    public_documents = [document for document in data["documents"] if document["access_level"] == "public"]
+
+    return {
+        ("GET", "/api/"): lambda rng: {"url": "/api/"},
+        ("POST", "/api/documents"): lambda rng: {"url": "/api/documents", "json": {
+            "title": sentence(rng, 4), "description": sentence(rng), "category": "forms", "version": "1.0"}},
+        ("GET", "/api/documents"): lambda rng: {"url": "/api/documents",
+                                                "params": rng.choice([{}, {"category": "bylaws"}]),
+                                                "headers": rng.choice([{}, chat_user(rng)[1], admin_headers])},
+        ("GET", "/api/documents/{document_id}/versions"): lambda rng: {
+            "url": f"/api/documents/{rng.choice(public_documents)['id']}/versions"},
+        ("POST", "/api/products"): lambda rng: {"url": "/api/products", "json": {
+            "name": sentence(rng, 3), "description": sentence(rng), "category": "other", "price": 12.5}},
+        ("GET", "/api/products"): lambda rng: {"url": "/api/products",
+                                               "params": rng.choice([{}, {"category": "apparel"}])},
+        ("GET", "/api/products/{product_id}"): lambda rng: {
+            "url": f"/api/products/{rng.choice(data['products'])['id']}"},
+        ("PUT", "/api/products/{product_id}"): lambda rng: (lambda product: {
+            "url": f"/api/products/{product['id']}",
+            "json": {"name": product["name"], "description": product["description"], "category": product["category"],
+                     "price": product["price"], "stock_quantity": rng.randint(1, 99)}})(rng.choice(data["products"])),
+        ("POST", "/api/cart/add"): lambda rng: {"url": "/api/cart/add", "json": {
+            "session_id": f"bench-{rng.randint(1, 500)}", "product_id": rng.choice(data["products"])["id"],
+            "quantity": rng.randint(1, 3), "size": "M"}},
+        ("GET", "/api/cart/{session_id}"): lambda rng: {"url": f"/api/cart/bench-{rng.randint(1, 500)}"},
+        ("POST", "/api/events"): lambda rng: {"url": "/api/events", "json": {
+            "title": sentence(rng, 4), "description": sentence(rng), "event_type": "social",
+            "date": datetime.now(timezone.utc).isoformat(), "location": "ICAA Hall", "capacity": 100}},
+        ("GET", "/api/events"): lambda rng: {"url": "/api/events"},
+        ("GET", "/api/events/{event_id}"): lambda rng: {"url": f"/api/events/{rng.choice(data['events'])['id']}"},
+        ("POST", "/api/events/{event_id}/register"): lambda rng: (lambda event: {
+            "url": f"/api/events/{event['id']}/register", "json": {
+                "event_id": event["id"], "member_name": "Bench Member", "member_email": unique_email("register")}}
+        )(rng.choice(data["events"])),
+        ("GET", "/api/events/{event_id}/registrations"): lambda rng: {
+            "url": f"/api/events/{rng.choice(data['events'])['id']}/registrations"},
+        ("POST", "/api/news"): lambda rng: {"url": "/api/news", "json": {
+            "title": sentence(rng, 6), "content": sentence(rng, 100), "excerpt": sentence(rng)}},
+        ("GET", "/api/news"): lambda rng: {"url": "/api/news"},
+        ("GET", "/api/news/{post_id}"): lambda rng: {"url": f"/api/news/{rng.choice(data['news'])['id']}"},
+        ("POST", "/api/newsletters"): lambda rng: {"url": "/api/newsletters", "json": {
+            "title": sentence(rng, 4), "description": sentence(rng), "month": "2025-01"}},
+        ("GET", "/api/newsletters"): lambda rng: {"url": "/api/newsletters"},
+        ("GET", "/api/search"): lambda rng: {"url": "/api/search", "params": {
+            "q": " ".join(rng.sample(WORDS, 2))[:-2]}},
+        ("POST", "/api/contact"): lambda rng: {"url": "/api/contact", "json": {
+            "name": "Bench", "email": unique_email("contact"), "subject": sentence(rng, 4), "message": sentence(rng)}},
+        ("GET", "/api/contact"): lambda rng: {"url": "/api/contact"},
+        ("POST", "/api/newsletter/subscribe"): lambda rng: {"url": "/api/newsletter/subscribe",
+                                                            "json": {"email": unique_email("subscribe")}},
+        ("GET", "/api/newsletter/subscribers"): lambda rng: {"url": "/api/newsletter/subscribers"},
+        ("GET", "/api/newsletter/subscribers/export"): lambda rng: {"url": "/api/newsletter/subscribers/export"},
+        ("POST", "/api/newsletter/subscribers/import"): subscriber_csv,
+        ("GET", "/api/newsletter/unsubscribe"): unsubscribe_link,
+        ("POST", "/api/newsletter/unsubscribe"): unsubscribe_link,
+        ("GET", "/api/newsletter-send-jobs/{job_id}"): lambda rng: {
+            "url": f"/api/newsletter-send-jobs/{rng.choice(data['send_jobs'])['id']}"},
+        ("POST", "/api/members"): lambda rng: {"url": "/api/members", "json": {
+            "name": "Bench Member", "email": unique_email("member"), "membership_tier": "free"}},
+        ("GET", "/api/members"): lambda rng: {"url": "/api/members"},
+        ("GET", "/api/members/{member_id}"): None,  # filled in from a created member below
+        ("POST", "/api/users"): lambda rng: {"url": "/api/users", "json": {
+            "name": "Bench User", "email": unique_email("user"), "cohort": rng.choice(COHORTS)}},
+        ("GET", "/api/users"): lambda rng: {"url": "/api/users"},
+        ("GET", "/api/users/directory"): lambda rng: {"url": "/api/users/directory", "params": rng.choice([
+            {}, {"cohort": rng.choice(COHORTS)}, {"q": "bench1"}, {"interest": rng.choice(INTERESTS)},
+            {"program_track": rng.choice(TRACKS), "verified": "true"}])},
+        ("GET", "/api/users/{user_id}"): lambda rng: {"url": f"/api/users/{rng.choice(data['users'])['id']}"},
+        ("PUT", "/api/users/{user_id}"): lambda rng: {"url": f"/api/users/{rng.choice(data['users'])['id']}",
+                                                      "json": {"bio": sentence(rng)}},
+        ("GET", "/api/users/{user_id}/events"): lambda rng: {
+            "url": f"/api/users/{rng.choice(data['users'])['id']}/events"},
+        ("POST", "/api/chat/session"): lambda rng: {"url": "/api/chat/session",
+                                                    "json": {"email": rng.choice(data["verified"])["email"],
+                                                             "password": BENCHMARK_PASSWORD}},
+        ("GET", "/api/chat-rooms"): lambda rng: {"url": "/api/chat-rooms", "headers": chat_user(rng)[1]},
+        ("POST", "/api/chat-rooms"): lambda rng: {"url": "/api/chat-rooms", "headers": chat_user(rng)[1],
+                                                  "json": {"name": sentence(rng, 3), "room_type": "custom"}},
+        ("POST", "/api/chat-rooms/{room_id}/participants"): lambda rng: (lambda room: {
+            "url": f"/api/chat-rooms/{room['id']}/participants",
+            "headers": {"Authorization": f"Bearer {data['tokens'][room['admins'][0]]}"},
+            "json": {"user_ids": [rng.choice(data["verified"])["id"]]}})(rng.choice(data["custom_rooms"])),
+        ("GET", "/api/chat-rooms/{room_id}/messages"): lambda rng: room_request("/messages", rng.choice([
+            {}, {"skip": 50}, {"skip": 500}]))(rng),
+        ("GET", "/api/direct-messages"): dm_request("/api/direct-messages"),
+        ("GET", "/api/chat-rooms/{room_id}/messages/search"): lambda rng: room_request(
+            "/messages/search", {"q": rng.choice(WORDS)})(rng),
+        ("GET", "/api/direct-messages/search"): lambda rng: dm_request(
+            "/api/direct-messages/search", {"q": rng.choice(WORDS)})(rng),
+        ("GET", "/api/direct-messages/conversations"): lambda rng: {
+            "url": "/api/direct-messages/conversations", "headers": chat_user(rng)[1]},
+        ("GET", "/api/chat/archive/stats"): lambda rng: {"url": "/api/chat/archive/stats", "headers": admin_headers},
+        ("GET", "/api/users/{user_id}/online-status"): lambda rng: {
+            "url": f"/api/users/{rng.choice(data['users'])['id']}/online-status"},
+        ("GET", "/api/chat/throttle-stats"): lambda rng: {"url": "/api/chat/throttle-stats"},
+        ("GET", "/api/debug/slow-queries"): lambda rng: {"url": "/api/debug/slow-queries", "headers": admin_headers},
+    }
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+async def drive(http, method, build, args, rng):
+    """Send args.requests requests from args.concurrency concurrent workers"""
+    requests = [build(rng) for _ in range(args.requests)]
+    latencies, statuses = [], {}
+    position = 0
+
+    async def worker():
+        nonlocal position
+        while position < len(requests):
+            request = requests[position]
+            position += 1
+            start = time.perf_counter()
+            response = await http.request(method, request["url"], params=request.get("params"),
+                                          json=request.get("json"), files=request.get("files"),
+                                          headers=request.get("headers"))
+            latencies.append((time.perf_counter() - start) * 1000)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+    wall = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "rps": round(len(latencies) / wall, 1),
+        "p50_ms": round(percentile(latencies, 0.50), 2),
+        "p95_ms": round(percentile(latencies, 0.95), 2),
+        "p99_ms": round(percentile(latencies, 0.99), 2),
+        "max_ms": round(latencies[-1], 2) if latencies else 0.0,
+        "errors": sum(count for status, count in statuses.items() if status >= 400),
+        "statuses": {str(status): count for status, count in sorted(statuses.items())}
+    }
+
+def print_table(results, excluded):
+    header = f"{'route':<58} {'rps':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>8} {'err':>5}"
+    print(header)
+    print("-" * len(header))
+    for route, row in results.items():
+        print(f"{route:<58} {row['rps']:>8} {row['p50_ms']:>8} {row['p95_ms']:>8} "
+              f"{row['p99_ms']:>8} {row['max_ms']:>8} {row['errors']:>5}")
+    if excluded:
+        print("\nNot benchmarked:")
+        for route, reason in excluded.items():
+            print(f"  {route}: {reason}")
+
+def compare(results, baseline_path, threshold):
+    """Print p99 changes against a baseline; returns the routes that regressed"""
+    baseline = json.loads(Path(baseline_path).read_text())["routes"]
+    regressions = []
+    print(f"\np99 vs {baseline_path} (regression threshold {threshold:.0f}%):")
+    for route, row in results.items():
+        before = baseline.get(route)
+        if not before or not before["p99_ms"]:
+            print(f"  {route:<58} new")
+            continue
+        change = (row["p99_ms"] - before["p99_ms"]) / before["p99_ms"] * 100
+        flag = "  REGRESSION" if change > threshold else ""
+        print(f"  {route:<58} {before['p99_ms']:>8} -> {row['p99_ms']:>8} ms ({change:+.0f}%){flag}")
+        if flag:
+            regressions.append(route)
+    return regressions
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=Path(__file__).parent).stdout.strip() or None
+    except OSError:
+        return None
+
+async def main():
+    args = parse_args()
+    server = import_server(args)
+    import httpx
+
+    rng = random.Random(args.seed)
+    print(f"Seeding {args.db} ({'mongomock' if args.fake else args.mongo_url}) ...")
+    start = time.perf_counter()
+    data = await seed(server, args, rng)
+    print(f"Seeded in {time.perf_counter() - start:.1f}s\n")
+
+    scenarios = build_scenarios(data)
+    # A 500 is reported with the route's other errors instead of aborting the run
+    transport = httpx.ASGITransport(app=server.fastapi_app, raise_app_exceptions=False)
+    results, excluded = {}, {}
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=60) as http:
+        # Member lookups need ids created through the API
+        created = await http.post("/api/members", json={
+            "name": "Bench Lookup", "email": "lookup@example.org", "membership_tier": "free"})
+        member_id = created.json()["id"]
+        scenarios[("GET", "/api/members/{member_id}")] = lambda rng: {"url": f"/api/members/{member_id}"}
+
+        for route in server.api_router.routes:
+            for method in sorted(route.methods):
+                key = (method, route.path)
+                label = f"{method} {route.path}"
+                if args.routes and args.routes not in route.path:
+                    continue
+                if key in EXCLUDED:
+                    excluded[label] = EXCLUDED[key]
+                    continue
+                if scenarios.get(key) is None:
+                    excluded[label] = "no scenario (add one to build_scenarios)"
+                    continue
+                results[label] = await drive(http, method, scenarios[key], args, rng)
+
+    print_table(results, excluded)
+
+    failed = [route for route, row in results.items() if row["errors"]]
+    if failed:
+        print(f"\n{len(failed)} route(s) answered with errors, their timings are not meaningful:")
+        for route in failed:
+            print(f"  {route}: {results[route]['statuses']}")
+
+    if args.baseline:
+        Path(args.baseline).write_text(json.dumps({
+            "meta": {
+                "created_at": datetime.now(timezone.utc).isoformat(),
+                "git_revision": git_revision(),
+                "backend": "mongomock" if args.fake else "mongodb",
+                "volumes": {name: getattr(args, name) for name in
+                            ("users", "events", "news", "products", "messages", "direct_messages")},
+                "concurrency": args.concurrency,
+                "requests_per_route": args.requests
+            },
+            "routes": results
+        }, indent=2))
+        print(f"\nBaseline written to {args.baseline}")
+
+    if args.compare:
+        regressions = compare(results, args.compare, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} route(s) regressed")
+            return 1
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
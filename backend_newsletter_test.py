@@ -0,0 +1,158 @@
+"""Newsletter send job tests: exactly-once delivery across a crash and resume.
+
+Runs send jobs in-process against a throwaway database (a local MongoDB, or
+mongomock-motor with --fake) through the memory mail transport: one job is
+killed part-way through a batch and resumed the way startup resumes it, another
+runs into a mail outage and is resumed once the transport recovers.
+
+    python backend_newsletter_test.py [--subscribers 450] [--fake]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import uuid
+from collections import Counter
+from datetime import datetime, timezone, timedelta
+from pathlib import Path
+
+class HangingTransport:
+    """Memory transport that hangs forever after `limit` messages, like a worker that died mid-batch"""
+    def __init__(self, memory, limit):
+        self.memory = memory
+        self.limit = limit
+
+    async def send(self, message):
+        if len(self.memory.sent) >= self.limit:
+            await asyncio.Event().wait()
+        await self.memory.send(message)
+
+class DownTransport:
+    """Every send fails, like an unreachable SMTP server"""
+    async def send(self, message):
+        raise ConnectionRefusedError("SMTP server unreachable")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--mongo-url", default=os.environ.get("MONGO_URL", "mongodb://localhost:27017"))
+    parser.add_argument("--db", default="icaa_newsletter_test", help="dropped on every run")
+    parser.add_argument("--fake", action="store_true", help="use mongomock-motor instead of a MongoDB server")
+    parser.add_argument("--subscribers", type=int, default=450)
+    return parser.parse_args()
+
+def import_server(args):
+    os.environ["MONGO_URL"] = args.mongo_url
+    os.environ["DB_NAME"] = args.db
+    os.environ["NEWSLETTER_TRANSPORT"] = "memory"
+    os.environ.setdefault("UNSUBSCRIBE_SECRET", "newsletter-test-secret")
+    os.environ.setdefault("LOG_LEVEL", "ERROR")
+    os.environ.setdefault("PROFILE_EXPLAIN", "0")
+    sys.path.insert(0, str(Path(__file__).parent / "backend"))
+    import server
+
+    if args.fake:
+        try:
+            from mongomock_motor import AsyncMongoMockClient
+        except ImportError:
+            sys.exit("--fake needs mongomock-motor (pip install mongomock-motor)")
+        server.client = AsyncMongoMockClient()
+        server.db = server.client[args.db]
+    return server
+
+async def create_newsletter(server, title):
+    newsletter = server.Newsletter(title=title, description="Send job test", month="2024-01")
+    await server.db.newsletters.insert_one(server.prepare_for_mongo(newsletter.dict()))
+    return newsletter.id
+
+async def simulate_restart(server):
+    """A new process with a new worker id, after the dead worker's lease ran out"""
+    server.WORKER_ID = str(uuid.uuid4())
+    expired = (datetime.now(timezone.utc) - timedelta(seconds=1)).isoformat()
+    await server.db.newsletter_send_jobs.update_many({"status": "running"}, {"$set": {"lease_until": expired}})
+
+async def wait_for_job(server, job_id):
+    while job_id in server.newsletter_send_tasks:
+        await asyncio.sleep(0.01)
+    return await server.get_newsletter_send_job(job_id)
+
+def recipients(*transports):
+    return Counter(message["To"] for transport in transports for message in transport.sent)
+
+async def test_resume_after_crash(server, emails):
+    """Kill a job part-way through its second batch, resume it, and check nobody got two copies"""
+    first_run = server.MemoryTransport()
+    crash_after = server.NEWSLETTER_BATCH_SIZE + len(emails) // 10
+    server.mail_transport = HangingTransport(first_run, crash_after)
+    newsletter_id = await create_newsletter(server, "Crash test")
+    job = await server.send_newsletter(newsletter_id)
+
+    # Let every delivery that got through be recorded, then kill the worker
+    while await server.db.newsletter_deliveries.count_documents({"job_id": job.id}) < crash_after:
+        await asyncio.sleep(0.01)
+    task = server.newsletter_send_tasks[job.id]
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+    assert len(first_run.sent) == crash_after, f"{len(first_run.sent)} sent before the crash, expected {crash_after}"
+
+    second_run = server.MemoryTransport()
+    server.mail_transport = second_run
+    await simulate_restart(server)
+    await server.resume_newsletter_send_jobs()
+    job = await wait_for_job(server, job.id)
+
+    received = recipients(first_run, second_run)
+    assert job.status == "completed", f"job ended as {job.status}: {job.last_error}"
+    assert set(received) == set(emails), f"{len(set(emails) - set(received))} subscribers never received it"
+    assert max(received.values()) == 1, f"{sum(1 for n in received.values() if n > 1)} subscribers got duplicates"
+    assert job.failed == 0, f"{job.failed} deliveries failed"
+    # The killed batch is re-read on resume: what it already sent is skipped, not resent
+    assert job.skipped == crash_after - server.NEWSLETTER_BATCH_SIZE, f"skipped {job.skipped}"
+    assert job.sent + job.skipped == len(emails), f"sent {job.sent} + skipped {job.skipped} != {len(emails)}"
+
+async def test_resume_after_outage(server, emails):
+    """A job that hits a mail outage stops instead of completing, and a resume reaches everyone"""
+    server.mail_transport = DownTransport()
+    max_attempts, server.NEWSLETTER_MAX_ATTEMPTS = server.NEWSLETTER_MAX_ATTEMPTS, 1
+    try:
+        newsletter_id = await create_newsletter(server, "Outage test")
+        job = await wait_for_job(server, (await server.send_newsletter(newsletter_id)).id)
+    finally:
+        server.NEWSLETTER_MAX_ATTEMPTS = max_attempts
+    assert job.status == "failed", f"job ended as {job.status} during the outage"
+    assert job.sent == 0, f"{job.sent} counted as sent during the outage"
+
+    recovered = server.MemoryTransport()
+    server.mail_transport = recovered
+    await server.resume_newsletter_send_job(job.id)
+    job = await wait_for_job(server, job.id)
+
+    received = recipients(recovered)
+    assert job.status == "completed", f"job ended as {job.status}: {job.last_error}"
+    assert set(received) == set(emails) and max(received.values()) == 1, "resume did not deliver exactly once"
+    assert (job.sent, job.failed, job.skipped) == (len(emails), 0, 0), \
+        f"counters sent={job.sent} failed={job.failed} skipped={job.skipped}"
+
+async def main():
+    args = parse_args()
+    server = import_server(args)
+    await server.client.drop_database(args.db)
+    await server.ensure_indexes()
+
+    emails = [f"reader{i}@example.org" for i in range(args.subscribers)]
+    await server.db.newsletter_subscribers.insert_many([
+        server.prepare_for_mongo(server.NewsletterSubscriber(email=email).dict()) for email in emails
+    ])
+
+    failures = 0
+    for test in (test_resume_after_crash, test_resume_after_outage):
+        try:
+            await test(server, emails)
+            print(f"✅ {test.__doc__}")
+        except AssertionError as e:
+            failures += 1
+            print(f"❌ {test.__doc__}: {e}")
+    await server.client.drop_database(args.db)
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
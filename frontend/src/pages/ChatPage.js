@@ -12,6 +12,13 @@ import axios from 'axios';
 
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
 const API = `${BACKEND_URL}/api`;
+const SESSION_STORAGE_KEY = 'icaaChatSession';
+
+// Chat session from a previous sign-in in this tab, unless it has expired
+const loadStoredSession = () => {
+  const stored = JSON.parse(sessionStorage.getItem(SESSION_STORAGE_KEY) || 'null');
+  return stored && new Date(stored.expires_at) > new Date() ? stored : null;
+};
 
 const ChatPage = () => {
   const navigate = useNavigate();
@@ -27,15 +34,21 @@ const ChatPage = () => {
   const [onlineUsers, setOnlineUsers] = useState({});
   const [isConnected, setIsConnected] = useState(false);
   const [activeTab, setActiveTab] = useState('rooms'); // 'rooms' or 'direct'
+  const [session, setSession] = useState(loadStoredSession);
+  const [credentials, setCredentials] = useState({ email: '', password: '' });
+  const [signInError, setSignInError] = useState('');
   
   const messagesEndRef = useRef(null);
   const fileInputRef = useRef(null);
+  const tokenRef = useRef(null);
 
-  // For demo purposes, using John Smith's ID. In real app, this would come from auth context
-  const DEMO_USER_ID = '54bee40c-826f-4aa5-b770-2242e397086f';
+  // Every chat API call is authenticated by the session token, never by a user id
+  const authConfig = () => ({ headers: { Authorization: `Bearer ${tokenRef.current}` } });
 
   useEffect(() => {
-    initializeChat();
+    if (session) {
+      initializeChat(session);
+    }
     return () => {
       if (socket) {
         socket.off('connect');
@@ -58,10 +71,42 @@ const ChatPage = () => {
     messagesEndRef.current?.scrollIntoView({ behavior: 'smooth' });
   };
 
-  const initializeChat = async () => {
+  const signIn = async (e) => {
+    e.preventDefault();
+    setSignInError('');
+    try {
+      const response = await axios.post(`${API}/chat/session`, credentials);
+      sessionStorage.setItem(SESSION_STORAGE_KEY, JSON.stringify(response.data));
+      setSession(response.data);
+      setCredentials({ email: '', password: '' });
+      initializeChat(response.data);
+    } catch (err) {
+      if (err.response?.status === 403) {
+        setSignInError('Access denied. Verified alumni only.');
+      } else if (err.response?.status === 401) {
+        setSignInError('Invalid email or password.');
+      } else {
+        setSignInError('Sign-in failed. Please try again.');
+      }
+    }
+  };
+
+  const signOut = () => {
+    sessionStorage.removeItem(SESSION_STORAGE_KEY);
+    tokenRef.current = null;
+    if (socket) {
+      socket.disconnect();
+    }
+    setSocket(null);
+    setCurrentUser(null);
+    setSession(null);
+  };
+
+  const initializeChat = async (chatSession) => {
+    tokenRef.current = chatSession.token;
     try {
       // Get current user data
-      const userResponse = await axios.get(`${API}/users/${DEMO_USER_ID}`);
+      const userResponse = await axios.get(`${API}/users/${chatSession.user_id}`);
       const userData = userResponse.data;
       
       if (!userData.is_verified_alumni) {
@@ -82,7 +127,8 @@ const ChatPage = () => {
       const newSocket = io(socketURL, {
         transports: ['websocket', 'polling'],
         timeout: 20000,
-        forceNew: true
+        forceNew: true,
+        auth: { token: chatSession.token }
       });
       setSocket(newSocket);
 
@@ -91,11 +137,8 @@ const ChatPage = () => {
         console.log('✅ Connected to chat server');
         setIsConnected(true);
         
-        // Join user to chat system
-        newSocket.emit('join_user', {
-          user_id: userData.id,
-          user_name: userData.name
-        });
+        // Join user to chat system (identified by the session token sent on connect)
+        newSocket.emit('join_user', {});
       });
 
       newSocket.on('disconnect', (reason) => {
@@ -141,7 +184,7 @@ const ChatPage = () => {
       });
 
       // Fetch initial data
-      await fetchChatRooms(userData.id);
+      await fetchChatRooms();
       await fetchConversations();
 
     } catch (err) {
@@ -150,18 +193,22 @@ const ChatPage = () => {
     }
   };
 
-  const fetchChatRooms = async (userId) => {
+  const fetchChatRooms = async () => {
     try {
-      const response = await axios.get(`${API}/chat-rooms?user_id=${userId}`);
+      const response = await axios.get(`${API}/chat-rooms`, authConfig());
       setChatRooms(response.data);
     } catch (err) {
       console.error('Error fetching chat rooms:', err);
+      if (err.response?.status === 401) {
+        // Session expired: sign in again
+        signOut();
+      }
     }
   };
 
   const fetchConversations = async () => {
     try {
-      const response = await axios.get(`${API}/direct-messages/conversations?user_id=${DEMO_USER_ID}`);
+      const response = await axios.get(`${API}/direct-messages/conversations`, authConfig());
       setConversations(response.data);
     } catch (err) {
       console.error('Error fetching conversations:', err);
@@ -178,7 +225,7 @@ const ChatPage = () => {
       
       // Fetch room messages
       try {
-        const response = await axios.get(`${API}/chat-rooms/${room.id}/messages?user_id=${DEMO_USER_ID}`);
+        const response = await axios.get(`${API}/chat-rooms/${room.id}/messages`, authConfig());
         setMessages(response.data);
       } catch (err) {
         console.error('Error fetching messages:', err);
@@ -193,7 +240,7 @@ const ChatPage = () => {
     
     // Fetch direct messages
     try {
-      const response = await axios.get(`${API}/direct-messages?user_id=${DEMO_USER_ID}&other_user_id=${conversation.other_user_id}`);
+      const response = await axios.get(`${API}/direct-messages?other_user_id=${conversation.other_user_id}`, authConfig());
       setDirectMessages(response.data);
     } catch (err) {
       console.error('Error fetching direct messages:', err);
@@ -237,8 +284,9 @@ const ChatPage = () => {
     formData.append('file', file);
 
     try {
-      const response = await axios.post(`${API}/chat-images/upload?user_id=${currentUser.id}`, formData, {
+      const response = await axios.post(`${API}/chat-images/upload`, formData, {
         headers: {
+          ...authConfig().headers,
           'Content-Type': 'multipart/form-data'
         }
       });
@@ -281,6 +329,40 @@ const ChatPage = () => {
     }
   };
 
+  if (!session) {
+    return (
+      <div className="min-h-screen bg-gray-50 flex items-center justify-center">
+        <Card className="w-full max-w-sm">
+          <CardHeader>
+            <CardTitle>Sign in to ICAA Chat</CardTitle>
+          </CardHeader>
+          <CardContent>
+            <form onSubmit={signIn} className="space-y-4">
+              <Input
+                type="email"
+                placeholder="Email"
+                value={credentials.email}
+                onChange={(e) => setCredentials({ ...credentials, email: e.target.value })}
+                required
+              />
+              <Input
+                type="password"
+                placeholder="Password"
+                value={credentials.password}
+                onChange={(e) => setCredentials({ ...credentials, password: e.target.value })}
+                required
+              />
+              {signInError && <p className="text-sm text-red-600">{signInError}</p>}
+              <Button type="submit" className="w-full bg-red-600 hover:bg-red-700">
+                Sign in
+              </Button>
+            </form>
+          </CardContent>
+        </Card>
+      </div>
+    );
+  }
+
   if (!currentUser) {
     return (
       <div className="min-h-screen bg-gray-50 flex items-center justify-center">
@@ -303,6 +385,9 @@ const ChatPage = () => {
             <div className="flex items-center gap-2">
               <div className={`w-2 h-2 rounded-full ${isConnected ? 'bg-green-500' : 'bg-red-500'}`}></div>
               <span className="text-xs text-gray-600">{isConnected ? 'Connected' : 'Disconnected'}</span>
+              <Button variant="ghost" size="sm" onClick={signOut} title="Sign out">
+                <LogOut className="w-4 h-4" />
+              </Button>
             </div>
           </div>
           
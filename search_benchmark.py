@@ -0,0 +1,116 @@
+"""Measure /api/search ranking latency against the 10 ms target.
+
+Indexes a synthetic corpus (100k documents by default) whose word
+frequencies follow a Zipf curve, so the domain words used in the queries
+appear in a large share of documents, then times SearchIndex.search for
+common, multi-term, prefix, filtered and paged queries. Exits non-zero if
+any query's p99 is over the target.
+
+    python search_benchmark.py [--docs 100000] [--rounds 50] [--target-ms 10]
+"""
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent / "backend"))
+from search_index import SearchIndex  # noqa: E402
+
+DOMAIN_WORDS = ("alumni network policy mentoring cohort leadership reception panel workshop community "
+                "fundraising volunteer bylaws election newsletter gala career startup health education").split()
+
+# (doc_type, share of the corpus, [(field weight, words in field)]) as the server's indexers weight them
+DOC_SHAPES = [
+    ("news", 0.30, [(3, 8), (2, 30), (1, 250)]),
+    ("event", 0.10, [(3, 6), (1, 60)]),
+    ("document", 0.35, [(3, 6), (1, 30), (1, 400)]),
+    ("product", 0.05, [(3, 4), (1, 40)]),
+    ("newsletter", 0.20, [(3, 6), (1, 80)]),
+]
+
+QUERIES = [
+    ("common term", {"query": "alumni"}),
+    ("two common terms", {"query": "alumni network"}),
+    ("three common terms", {"query": "policy mentoring cohort"}),
+    ("prefix", {"query": "alum"}),
+    ("short prefix", {"query": "ne"}),
+    ("common + prefix", {"query": "leadership work"}),
+    ("common + rare", {"query": "community {rare}"}),
+    ("rare term", {"query": "{rare}"}),
+    ("filtered common term", {"query": "policy", "doc_types": {"document"}}),
+    ("filtered to a small type", {"query": "alumni network", "doc_types": {"product"}}),
+    ("page 5", {"query": "career startup", "skip": 80}),
+]
+
+def build_vocabulary(rng, size):
+    """Domain words first (the most frequent), then pronounceable filler words"""
+    words = list(DOMAIN_WORDS)
+    seen = set(words)
+    while len(words) < size:
+        word = "".join(rng.choice("bcdfghklmnprstvz") + rng.choice("aeiou") for _ in range(rng.randint(2, 4)))
+        if word not in seen:
+            seen.add(word)
+            words.append(word)
+    return words
+
+def build_index(docs, vocabulary, rng):
+    # Zipf weights: rank r is drawn with probability proportional to 1/r
+    cumulative, total = [], 0.0
+    for rank in range(1, len(vocabulary) + 1):
+        total += 1 / rank
+        cumulative.append(total)
+
+    index = SearchIndex()
+    for doc_type, share, fields in DOC_SHAPES:
+        for i in range(int(docs * share)):
+            texts = [(" ".join(rng.choices(vocabulary, cum_weights=cumulative, k=length)), weight)
+                     for weight, length in fields]
+            index.add(doc_type, f"{doc_type}-{i}", texts, texts[0][0], texts[1][0])
+    return index
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=100000)
+    parser.add_argument("--vocabulary", type=int, default=20000)
+    parser.add_argument("--rounds", type=int, default=50)
+    parser.add_argument("--target-ms", type=float, default=10.0)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    vocabulary = build_vocabulary(rng, args.vocabulary)
+    start = time.perf_counter()
+    index = build_index(args.docs, vocabulary, rng)
+    print(f"Indexed {len(index)} documents, {len(index.postings)} terms in {time.perf_counter() - start:.1f} s")
+    start = time.perf_counter()
+    index.rank_common_terms()  # as build_search_index does on startup
+    print(f"Ranked common terms' postings in {time.perf_counter() - start:.1f} s")
+
+    rare = vocabulary[-1]
+    print(f"{'query':<28}{'total':>9}{'p50 ms':>9}{'p99 ms':>9}{'max ms':>9}")
+    failures = []
+    for name, params in QUERIES:
+        params = dict(params, query=params["query"].format(rare=rare))
+        samples = []
+        for _ in range(args.rounds):
+            started = time.perf_counter()
+            total, total_exact, _ = index.search(**params)
+            samples.append((time.perf_counter() - started) * 1000)
+        p50, p99 = percentile(samples, 50), percentile(samples, 99)
+        print(f"{name:<28}{total:>8}{'' if total_exact else '+':1}{p50:>9.2f}{p99:>9.2f}{max(samples):>9.2f}")
+        if p99 > args.target_ms:
+            failures.append(name)
+
+    if failures:
+        print(f"p99 over {args.target_ms:g} ms: {', '.join(failures)}")
+        return 1
+    print(f"All queries within {args.target_ms:g} ms at p99")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,88 @@
+"""Compare the JSON and compact (MessagePack) chat wire formats.
+
+Reports bytes on the wire and server-side encode CPU per 1,000 `new_message`
+payloads, using the same encoder the Socket.IO handlers use.
+
+    python wire_format_benchmark.py [--messages 1000] [--rounds 20]
+"""
+import argparse
+import json
+import sys
+import time
+import uuid
+from datetime import datetime, timezone, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent / "backend"))
+from wire_format import encode_compact, msgpack  # noqa: E402
+
+SAMPLE_CONTENT = [
+    "See everyone at Third Thursday!",
+    "Does anyone have the slides from last week's networking session?",
+    "Congrats to the 2023 cohort on the new mentorship program 🎉",
+    "ok",
+    "Reminder: the bylaws vote closes Friday at 5pm. Please read the updated draft in the documents section before voting.",
+]
+
+def build_messages(count):
+    """Realistic cohort-room traffic: a handful of senders, mostly short text"""
+    room_id = str(uuid.uuid4())
+    senders = [(str(uuid.uuid4()), name) for name in ("John Smith", "Sarah Johnson", "Marcus Williams", "Ana Lopez")]
+    start = datetime.now(timezone.utc)
+    messages = []
+    for i in range(count):
+        sender_id, sender_name = senders[i % len(senders)]
+        messages.append({
+            'id': str(uuid.uuid4()),
+            'room_id': room_id,
+            'sender_id': sender_id,
+            'sender_name': sender_name,
+            'content': SAMPLE_CONTENT[i % len(SAMPLE_CONTENT)],
+            'message_type': 'image' if i % 20 == 0 else 'text',
+            'image_url': f"/uploads/chat_images/{sender_id}_{uuid.uuid4()}.png" if i % 20 == 0 else None,
+            'created_at': (start + timedelta(seconds=i)).isoformat(),
+            'reply_to': None
+        })
+    return messages
+
+def encode_json(payload):
+    # Socket.IO serialises event arguments with the stdlib json module
+    return json.dumps(payload, separators=(',', ':')).encode()
+
+def measure(encoder, messages, rounds):
+    encoded = [encoder(message) for message in messages]
+    total_bytes = sum(len(frame) for frame in encoded)
+
+    start = time.process_time()
+    for _ in range(rounds):
+        for message in messages:
+            encoder(message)
+    cpu_ms = (time.process_time() - start) * 1000 / rounds
+    return total_bytes, cpu_ms
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=1000)
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    if msgpack is None:
+        print("msgpack is not installed; the compact wire format is unavailable")
+        return 1
+
+    messages = build_messages(args.messages)
+    results = {
+        "json": measure(encode_json, messages, args.rounds),
+        "msgpack": measure(encode_compact, messages, args.rounds),
+    }
+
+    scale = 1000 / args.messages
+    json_bytes = results["json"][0]
+    print(f"Per 1,000 new_message payloads ({args.messages} messages x {args.rounds} rounds)")
+    print(f"{'format':<10}{'bytes':>12}{'vs json':>10}{'encode CPU ms':>16}")
+    for name, (total_bytes, cpu_ms) in results.items():
+        print(f"{name:<10}{int(total_bytes * scale):>12}{total_bytes / json_bytes:>9.0%}{cpu_ms * scale:>16.2f}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())